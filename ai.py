@@ -1,8 +1,11 @@
 # ai.py
 import json
+import base64
+import asyncio
+import hashlib
 import dotenv
 import os
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 import openai
 from utils import (
     assistant,
@@ -15,25 +18,42 @@ from utils import (
     set_greenway_assistant,
     get_checker_assistant,
     model,
+    analysis_backend,
+    analysis_prompt_version,
+    openai_requests_per_minute,
+    openai_tokens_per_minute,
+    rate_limit_headroom,
+    estimate_image_tokens,
     instructions,
+    checker_instructions,
     batch_response_format,
+    resp_api_batch_format,
+    responses_text_format,
     response_format,
     greenway_instructions,
     greenway_response_format,
     greenway_user_message,
 )
 from logging_config import logger
+from analysis_cache import AnalysisCache
+from request_scheduler import RequestScheduler, RetryableError, TokenUsageEstimator
+from batch_jobs import BatchJobStore
+from batch_sizing import AdaptiveBatchSizer
 import logging
-from concurrent.futures import ThreadPoolExecutor
 
 
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from openai.types import FileDeleted
 
 dotenv.load_dotenv()
 
 AI_LOG_FILE = "logs/ai.log"
+ANALYSIS_BACKENDS = ("assistants", "responses")
+BATCH_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+BATCH_INPUT_FILE_MAX_BYTES = 190 * 1024 * 1024  # Batch API caps input files at 200 MB
+DEFERRED_MAX_SUBMISSIONS = 3  # Frames a deferred job returned no result for are resubmitted
 TOKEN_USAGE_LOG_FILE = "logs/token_usage.log"
 
 # Create a new handler for AI logs
@@ -56,20 +76,84 @@ ai_file_handler.addFilter(AIFilter())  # Apply filter
 logger.addHandler(ai_file_handler)
 
 
+def _read_file(filepath) -> bytes:
+    with open(filepath, "rb") as image_file:
+        return image_file.read()
+
+
+def _split_by_size(lines: list, max_bytes: int) -> list:
+    """Group JSONL lines into chunks whose joined size stays under ``max_bytes``."""
+    chunks = []
+    chunk_bytes = 0
+    for line in lines:
+        line_bytes = len(line.encode()) + 1  # newline
+        if not chunks or chunk_bytes + line_bytes > max_bytes:
+            chunks.append([])
+            chunk_bytes = 0
+        chunks[-1].append(line)
+        chunk_bytes += line_bytes
+    return chunks
+
+
+def _image_data_url(telemetry_object) -> str:
+    """The frame's JPEG as a base64 data URL, for inline submission."""
+    encoded = base64.b64encode(telemetry_object.read_image_bytes()).decode("ascii")
+    telemetry_object.release_image_bytes()
+    return f"data:image/jpeg;base64,{encoded}"
+
+
+def _job_batch_ids(job: dict) -> list:
+    """Batch IDs of a stored deferred job; records from before split jobs hold one ``batch_id``."""
+    return job["batch_ids"] if "batch_ids" in job else [job["batch_id"]]
+
+
+def _job_filenames(job: dict) -> set:
+    """Every frame a stored deferred job's request lines cover."""
+    return {filename for filenames in job["requests"].values() for filename in filenames}
+
+
 class AI:
-    def __init__(self, api_key):
+    def __init__(self, api_key, base_url: str = None):
         self.api_key = api_key
         openai.api_key = self.api_key
-        self.client = OpenAI()
+        # Point at a local fake server (or proxy) with base_url / OPENAI_BASE_URL
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        # Assistant and file-listing management calls
+        self.client = OpenAI(base_url=self.base_url)
+        # Uploads, runs and deletes, on self.scheduler's loop. The scheduler owns retries
+        # (Retry-After, jittered backoff), so the SDK's own retries are turned off.
+        self.async_client = AsyncOpenAI(base_url=self.base_url, max_retries=0)
+        self.scheduler = RequestScheduler(
+            requests_per_minute=openai_requests_per_minute * rate_limit_headroom,
+            tokens_per_minute=openai_tokens_per_minute * rate_limit_headroom,
+            retryable_errors=(
+                openai.RateLimitError,
+                openai.APITimeoutError,
+                openai.APIConnectionError,
+                openai.InternalServerError,
+            ),
+        )
+        self.token_usage = TokenUsageEstimator(estimate_image_tokens(1920, 1080, model))
+        self.token_usage.seed_from_log(TOKEN_USAGE_LOG_FILE)
         self.assistant = assistant
         self.batch_assistant = None
         self.assistant_id = get_assistant()
         self.batch_assistant_id = get_batch_assistant()
         self.model = model
+        self.analysis_backend = analysis_backend  # One of ANALYSIS_BACKENDS
         self.instructions = instructions
         self.batch_instructions = instructions
         self.current_assistant_id = None
+        self.current_assistant = None
         self.checker_assistant_id = get_checker_assistant()
+        self.analysis_cache = AnalysisCache()  # Set to None to always re-analyze
+        self.batch_jobs = BatchJobStore()  # Submitted deferred (Batch API) jobs
+        self.batch_sizers = {}  # Assistant type -> AdaptiveBatchSizer
+        self.missing_frame_retries = 2  # Follow-up batches for frames a response skipped
+        # Builds request bodies (reading and base64-encoding inline frames) off the request loop
+        self.encode_pool = ThreadPoolExecutor(
+            max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="image-encode"
+        )
 
         self.response_format = response_format
         self.batch_response_format = batch_response_format
@@ -141,188 +225,444 @@ class AI:
 
             return self.greenway_assistant, self.greenway_assistant_id
 
-    def upload_image(self, filepath: str):
+    def upload_image(self, filepath: str, image_bytes: bytes = None):
         """
         Upload a single image to OpenAI and return its file ID.
 
         Args:
             filepath (str): Path to the image file.
+            image_bytes (bytes): In-memory JPEG to upload instead of reading ``filepath``.
 
         Returns:
             str: OpenAI file ID.
         """
-        # Upload file to OpenAI
-        file = self.client.files.create(file=open(filepath, "rb"), purpose="vision")
+        return self.scheduler.run_sync(self._upload_image(filepath, image_bytes))
+
+    async def upload_image_async(self, filepath: str, image_bytes: bytes = None):
+        """Awaitable ``upload_image`` for callers on another event loop."""
+        return await self.scheduler.run(self._upload_image(filepath, image_bytes))
 
-        return file
+    async def _upload_image(self, filepath: str, image_bytes: bytes = None):
+        if image_bytes is None:
+            image_bytes = await asyncio.to_thread(_read_file, filepath)
+        upload = (os.path.basename(filepath), image_bytes, "image/jpeg")
 
-    def get_n_analyses_from_openai(self, telemetry_objects: list):
+        async def _attempt():
+            async with self.scheduler.limit("upload"):
+                return await self.async_client.files.create(file=upload, purpose="vision")
+
+        return await self.scheduler.with_retries(_attempt, f"Upload of {upload[0]}")
+
+    def _build_thread_message(self, telemetry_objects: list) -> dict:
         """
-        Analyze a batch of telemetry objects using OpenAI and return the populated objects.
+        Build the user message that references each frame's uploaded file, in order.
 
         Args:
             telemetry_objects (list): List of telemetry objects.
 
         Returns:
-            list: Telemetry objects with analysis results populated.
+            dict: Message for ``threads.create``.
         """
+        # Extract filenames in order
+        filenames = [obj.filename for obj in telemetry_objects]
+
+        # Construct the user message content
+        filenames_message = ", ".join([f'"{filename}"' for filename in filenames])
+        intro_message = (
+            f"In order of appearance, you will review {filenames_message}. "
+            f"Refer to the files with these file_ids when responding."
+        )
 
-        def _create_thread(telemetry_objects: list) -> str:
-            """
-            Create a thread with the prompt message referencing telemetry objects.
+        user_message_content = [{"type": "text", "text": intro_message}]
 
-            Args:
-                telemetry_objects (list): List of telemetry objects.
+        # Add file references to the message
+        for obj in telemetry_objects:
+            user_message_content.append(
+                {
+                    "type": "image_file",
+                    "image_file": {"file_id": obj.openai_file_id},
+                }
+            )
+
+        return {"role": "user", "content": user_message_content}
 
-            Returns:
-                str: Thread ID if successful, None otherwise.
-            """
-            # Extract filenames in order
-            filenames = [obj.filename for obj in telemetry_objects]
+    def _build_response_input(self, telemetry_objects: list, inline: bool = False) -> list:
+        """
+        The thread message in Responses API form: ``input_text`` and ``input_image`` parts.
+
+        Args:
+            telemetry_objects (list): List of telemetry objects.
+            inline (bool): Embed each frame as a base64 data URL instead of referencing its
+                uploaded file. Reads and encodes every frame, so call it off the request loop.
 
-            # Construct the user message content
-            filenames_message = ", ".join([f'"{filename}"' for filename in filenames])
-            intro_message = (
-                f"In order of appearance, you will review {filenames_message}. "
-                f"Refer to the files with these file_ids when responding."
+        Returns:
+            list: ``input`` for ``responses.create``.
+        """
+        message = self._build_thread_message(telemetry_objects)
+        content = [{"type": "input_text", "text": message["content"][0]["text"]}]
+        for obj in telemetry_objects:
+            if inline:
+                content.append({"type": "input_image", "image_url": _image_data_url(obj)})
+            else:
+                content.append({"type": "input_image", "file_id": obj.openai_file_id})
+        return [{"role": "user", "content": content}]
+
+    def use_inline_images(self, inline_images: bool) -> bool:
+        """Inline frames need the Responses backend; Assistants threads only take file IDs."""
+        if inline_images and self.analysis_backend != "responses":
+            logger.warning(
+                "Inline image submission needs analysis_backend='responses'; uploading frames instead."
             )
+            return False
+        return inline_images
 
-            user_message_content = [{"type": "text", "text": intro_message}]
+    def _apply_analysis_texts(
+        self, analysis_texts: list, telemetry_objects: list, assistant: str, source_id: str = None
+    ) -> list:
+        """
+        Match the model's analyses back to telemetry objects and cache them.
 
-            # Add file references to the message
-            for obj in telemetry_objects:
-                user_message_content.append(
-                    {
-                        "type": "image_file",
-                        "image_file": {"file_id": obj.openai_file_id},
-                    }
+        Args:
+            analysis_texts (list): JSON strings in the batch response format.
+            telemetry_objects (list): List of telemetry objects to populate with results.
+            assistant (str): Assistant type that produced them.
+            source_id (str): Cache source to store them under; defaults to
+                ``analysis_source_id(assistant)``.
+
+        Returns:
+            list: The telemetry objects.
+        """
+        analyzed_objects = []
+        frames_by_key = self._frame_index(telemetry_objects)
+
+        for analysis_text in analysis_texts:
+            analysis_data = json.loads(analysis_text)  # Parse the JSON
+
+            # Iterate over each analysis in the 'analyses' list
+            for analysis in analysis_data.get("analyses", []):
+                file_id = str(analysis.get("file_id", ""))
+                obj = frames_by_key.get(file_id) or frames_by_key.get(
+                    self._frame_key(file_id)
                 )
+                if obj is None:
+                    logger.ai(f"Analysis for unknown frame {file_id!r} ignored.")
+                    continue
+                analysis["file_id"] = obj.filename
+                obj.analysis_results = analysis
+                analyzed_objects.append(obj)
+
+        self.cache_analyses(analyzed_objects, assistant, source_id)
+        return telemetry_objects
 
-            user_message = {"role": "user", "content": user_message_content}
+    @staticmethod
+    def _frame_key(name: str) -> str:
+        """Loose key for a frame name: no folder, extension, quotes or case."""
+        base_name = os.path.basename(name.strip().strip("\"'"))
+        return os.path.splitext(base_name)[0].lower()
+
+    def _frame_index(self, telemetry_objects: list) -> dict:
+        """Every name the model may use for a frame (filename, path, file ID, loose key)."""
+        frames_by_key = {}
+        for obj in telemetry_objects:
+            for key in (obj.filename, obj.filepath, obj.openai_file_id):
+                if key:
+                    frames_by_key[key] = obj
+            if obj.filename:
+                frames_by_key.setdefault(self._frame_key(obj.filename), obj)
+        return frames_by_key
+
+    def get_n_analyses_from_openai(self, telemetry_objects: list, inline_images: bool = False):
+        """
+        Analyze a batch of telemetry objects using OpenAI and return the populated objects.
 
-            try:
-                thread = self.client.beta.threads.create(messages=[user_message])
-                return thread.id
-            except Exception as e:
-                logger.ai(f"Failed to create thread: {e}")
-                return None
+        Args:
+            telemetry_objects (list): List of telemetry objects.
+            inline_images (bool): Send frames as data URLs instead of uploaded file IDs.
+
+        Returns:
+            list: Telemetry objects with analysis results populated.
+        """
+        return self.scheduler.run_sync(
+            self._get_n_analyses(
+                telemetry_objects,
+                self.current_assistant or "batch",
+                self.use_inline_images(inline_images),
+            )
+        )
+
+    async def get_n_analyses_async(
+        self, telemetry_objects: list, assistant: str = "batch", inline_images: bool = False
+    ):
+        """Awaitable ``get_n_analyses_from_openai`` for callers on another event loop."""
+        await asyncio.to_thread(self.analysis_source_id, assistant)
+        return await self.scheduler.run(
+            self._get_n_analyses(
+                telemetry_objects, assistant, self.use_inline_images(inline_images)
+            )
+        )
+
+    @staticmethod
+    def _run_limit(assistant: str) -> str:
+        """Scheduler limit a batch for this assistant type runs under."""
+        return "checker" if assistant == "checker" else "run"
+
+    async def _run_batch_once(
+        self, telemetry_objects: list, assistant_id: str, limit_kind: str = "run"
+    ):
+        """
+        One attempt at a batch: wait for rate-limit budget, then create, run and read a thread.
 
-        def _create_and_poll_run(thread_id: str):
-            """
-            Create and poll a run on the specified thread.
+        Returns:
+            tuple: JSON analysis texts from the assistant's messages, and tokens used.
 
-            Args:
-                thread_id (str): ID of the thread to run.
+        Raises:
+            RetryableError: The run ended on a rate limit or a server error.
+        """
+        reserved_tokens = self.token_usage.estimate(len(telemetry_objects))
+        await self.scheduler.throttle(reserved_tokens)
 
-            Returns:
-                Run object if successful, None otherwise.
-            """
+        # One run slot covers the whole thread: create, poll and read back
+        async with self.scheduler.limit(limit_kind):
             try:
-                run = self.client.beta.threads.runs.create_and_poll(
-                    thread_id=thread_id, assistant_id=self.current_assistant_id
+                # Step 1: Create a thread with the prompt message
+                thread = await self.async_client.beta.threads.create(
+                    messages=[self._build_thread_message(telemetry_objects)]
                 )
-                # Extract token usage if available
-                total_tokens = run.usage.total_tokens if run.usage else 0
 
-                # Log thread ID and token usage
-                with open(TOKEN_USAGE_LOG_FILE, "a") as f:
-                    f.write(
-                        f"{datetime.now(timezone.utc)} - Thread ID: {thread_id}, Tokens Used: {total_tokens}\n"
-                    )
+                # Step 2: Run the analysis and poll until completion
+                run = await self.async_client.beta.threads.runs.create_and_poll(
+                    thread_id=thread.id, assistant_id=assistant_id
+                )
+            except BaseException:
+                # No usage to settle against; give the reserved budget back before a retry
+                self.scheduler.refund(reserved_tokens)
+                raise
+            # Extract token usage if available
+            total_tokens = run.usage.total_tokens if run.usage else 0
+            self.scheduler.settle(reserved_tokens, total_tokens)
+            self.token_usage.record(total_tokens, len(telemetry_objects))
+
+            # Log thread ID and token usage
+            with open(TOKEN_USAGE_LOG_FILE, "a") as f:
+                f.write(
+                    f"{datetime.now(timezone.utc)} - Thread ID: {thread.id}, Tokens Used: {total_tokens}, Images: {len(telemetry_objects)}\n"
+                )
 
-                return run
-            except Exception as e:
-                logger.ai(f"Failed to create and poll run: {e}")
-                return None
+            if run.status != "completed":
+                last_error = run.last_error
+                if last_error and last_error.code in ("rate_limit_exceeded", "server_error"):
+                    raise RetryableError(f"Run {run.id} failed: {last_error.message}")
+                raise RuntimeError(
+                    f"Run did not complete successfully. Status: {run.status}"
+                    + (f" ({last_error.code}: {last_error.message})" if last_error else "")
+                )
 
-        def _process_analysis_results(thread_id: str, telemetry_objects: list):
-            """
-            Retrieve and match analysis results to telemetry objects.
+            # Step 3: Retrieve the analysis results
+            messages = await self.async_client.beta.threads.messages.list(
+                thread_id=thread.id
+            )
+        analysis_texts = [
+            content_block.text.value
+            for message in messages.data
+            if message.role == "assistant"
+            for content_block in message.content
+            if content_block.type == "text"
+        ]
+        return analysis_texts, total_tokens
+
+    def _response_prompt(self, assistant: str) -> tuple:
+        """Model, instructions and ``text`` format the Responses backend uses per assistant type."""
+        if assistant == "greenway":
+            return (
+                self.model,
+                self.greenway_instructions,
+                responses_text_format(self.greenway_response_format),
+            )
+        if assistant == "checker":
+            return checker_model, checker_instructions, resp_api_batch_format
+        return self.model, self.instructions, resp_api_batch_format
+
+    def _response_request_body(
+        self, telemetry_objects: list, assistant: str, inline: bool = False
+    ) -> dict:
+        """Keyword arguments for ``responses.create``; also the body of a Batch API line."""
+        model_name, instructions_text, text_format = self._response_prompt(assistant)
+        return {
+            "model": model_name,
+            "instructions": instructions_text,
+            "input": self._build_response_input(telemetry_objects, inline),
+            "text": text_format,
+            "store": False,
+        }
+
+    async def _respond_batch_once(
+        self, telemetry_objects: list, assistant: str, inline: bool = False
+    ):
+        """
+        One attempt at a batch as a single Responses API call with structured output.
 
-            Args:
-                thread_id (str): ID of the thread containing results.
-                telemetry_objects (list): List of telemetry objects to populate with results.
+        Returns:
+            tuple: The JSON analysis text (as a one-item list), and tokens used.
 
-            Returns:
-                None
-            """
-            try:
-                # Fetch all messages from the thread
-                messages = self.client.beta.threads.messages.list(thread_id=thread_id)
-
-                # Find the assistant message containing the analysis results
-                for message in messages.data:
-                    if message.role == "assistant":
-                        # Extract JSON string from the content
-                        for content_block in message.content:
-                            if content_block.type == "text":
-                                analysis_data = json.loads(
-                                    content_block.text.value
-                                )  # Parse the JSON
-
-                                # Iterate over each analysis in the 'analyses' list
-                                for analysis in analysis_data.get("analyses", []):
-                                    file_id = analysis.get("file_id")
-                                    # Match and populate telemetry objects based on file_id
-                                    for obj in telemetry_objects:
-                                        if (
-                                            obj.filepath == file_id
-                                            or obj.filename == file_id
-                                        ):
-                                            obj.analysis_results = analysis
-
-                return telemetry_objects
-            except Exception as e:
-                logger.ai(f"Failed to retrieve or process messages: {e}")
-                return []
+        Raises:
+            RetryableError: The response failed on a server error.
+        """
+        reserved_tokens = self.token_usage.estimate(len(telemetry_objects))
+        await self.scheduler.throttle(reserved_tokens)
+        try:
+            request_body = await asyncio.get_running_loop().run_in_executor(
+                self.encode_pool,
+                self._response_request_body,
+                telemetry_objects,
+                assistant,
+                inline,
+            )
 
-        # Step 1: Create a thread with the prompt message
-        thread_id = _create_thread(telemetry_objects)
-        if not thread_id:
-            return telemetry_objects  # Return as is, without analysis
+            async with self.scheduler.limit(self._run_limit(assistant)):
+                response = await self.async_client.responses.create(**request_body)
+        except BaseException:
+            # No usage to settle against; give the reserved budget back before a retry
+            self.scheduler.refund(reserved_tokens)
+            raise
+
+        total_tokens = response.usage.total_tokens if response.usage else 0
+        self.scheduler.settle(reserved_tokens, total_tokens)
+        self.token_usage.record(total_tokens, len(telemetry_objects))
+        with open(TOKEN_USAGE_LOG_FILE, "a") as f:
+            f.write(
+                f"{datetime.now(timezone.utc)} - Response ID: {response.id}, Tokens Used: {total_tokens}, Images: {len(telemetry_objects)}\n"
+            )
 
-        # Step 2: Run the analysis and poll until completion
-        run = _create_and_poll_run(thread_id)
-        if not run or run.status != "completed":
-            logger.ai(
-                f"Run did not complete successfully. Status: {run.status if run else 'unknown'}"
+        if response.status != "completed":
+            error = response.error
+            if error and error.code == "server_error":
+                raise RetryableError(f"Response {response.id} failed: {error.message}")
+            details = response.incomplete_details or error
+            raise RuntimeError(
+                f"Response did not complete. Status: {response.status} ({details})"
             )
+        return [response.output_text], total_tokens
+
+    async def _get_n_analyses(
+        self,
+        telemetry_objects: list,
+        assistant: str = "batch",
+        inline: bool = False,
+        retries_left: int = None,
+    ):
+        if self.analysis_backend == "responses":
+            attempt = lambda: self._respond_batch_once(telemetry_objects, assistant, inline)
+        else:
+            assistant_id = self.get_assistant_id(assistant)
+            attempt = lambda: self._run_batch_once(
+                telemetry_objects, assistant_id, self._run_limit(assistant)
+            )
+        sizer = self.batch_sizer(assistant)
+        previous_results = [obj.analysis_results for obj in telemetry_objects]
+        start_time = time.time()
+        try:
+            analysis_texts, total_tokens = await self.scheduler.with_retries(
+                attempt, f"Analysis of {len(telemetry_objects)} frames"
+            )
+        except Exception as e:
+            filenames = ", ".join(obj.filename for obj in telemetry_objects)
+            logger.ai(f"Batch got no analysis ({e}): {filenames}")
+            logger.error(f"{len(telemetry_objects)} frames got no analysis: {e}")
+            sizer.record(len(telemetry_objects), time.time() - start_time, 0, 0)
             return telemetry_objects  # Return as is, without analysis
+        seconds = time.time() - start_time
 
-        # Step 3: Retrieve and process the analysis results
-        telemetry_objects = _process_analysis_results(thread_id, telemetry_objects)
+        try:
+            await asyncio.to_thread(
+                self._apply_analysis_texts, analysis_texts, telemetry_objects, assistant
+            )
+        except Exception as e:
+            logger.ai(f"Failed to retrieve or process messages: {e}")
+
+        unmatched = [
+            obj
+            for obj, previous in zip(telemetry_objects, previous_results)
+            if obj.analysis_results is previous
+        ]
+        sizer.record(
+            len(telemetry_objects),
+            seconds,
+            total_tokens,
+            len(telemetry_objects) - len(unmatched),
+        )
 
+        if retries_left is None:
+            retries_left = self.missing_frame_retries
+        if unmatched and retries_left > 0:
+            # Only the skipped or mislabelled frames go again, as a smaller batch
+            logger.ai(
+                f"{len(unmatched)} of {len(telemetry_objects)} frames came back without an "
+                f"analysis; retrying them: {', '.join(obj.filename for obj in unmatched)}"
+            )
+            await self._get_n_analyses(unmatched, assistant, inline, retries_left - 1)
+        elif unmatched:
+            logger.ai(
+                f"No analysis after retries for: {', '.join(obj.filename for obj in unmatched)}"
+            )
         return telemetry_objects
 
-    def upload_files_to_openai(self, telemetry_objects: list, multithreaded: bool):
+    def batch_sizer(self, assistant: str = "batch") -> AdaptiveBatchSizer:
+        """The adaptive batch sizer for an assistant type; each learns from its own batches."""
+        if assistant not in self.batch_sizers:
+            self.batch_sizers[assistant] = AdaptiveBatchSizer(name=assistant)
+        return self.batch_sizers[assistant]
+
+    def upload_files_to_openai(self, telemetry_objects, multithreaded: bool) -> list:
         """
-        Upload files to OpenAI and return a mapping of filenames to file IDs.
+        Upload files to OpenAI, recording each file ID on its telemetry object.
 
         Args:
-            telemetry_objects (list): List of telemetry objects.
-            multithreaded (bool): Whether to use multithreading.
+            telemetry_objects (iterable): Telemetry objects. May be a generator (e.g. streamed
+                frames), in which case uploads start as soon as each frame is produced.
+            multithreaded (bool): Upload concurrently (up to the scheduler's upload limit)
+                instead of one at a time.
 
         Returns:
-            dict: Mapping of filenames to OpenAI file IDs.
+            list: The telemetry objects, in the order they were received.
         """
+        return self.scheduler.run_sync(
+            self._upload_files(telemetry_objects, multithreaded)
+        )
 
-        def _upload_file_to_openai(telemetry_object):
-            try:
-                file = self.upload_image(telemetry_object.filepath)
-                telemetry_object.openai_file_id = file.id
-                return telemetry_object.filepath, file.id
-            except Exception as e:
-                logger.ai(f"Failed to upload {telemetry_object.filepath}: {e}")
-                return telemetry_object.filepath, None
-
-        if multithreaded:
-            from concurrent.futures import ThreadPoolExecutor
-
-            with ThreadPoolExecutor(max_workers=20) as executor:
-                executor.map(_upload_file_to_openai, telemetry_objects)
-        else:
-            for telemetry_object in telemetry_objects:
-                _upload_file_to_openai(telemetry_object)
+    async def _upload_file(self, telemetry_object):
+        try:
+            file = await self._upload_image(
+                telemetry_object.filepath, telemetry_object.image_bytes
+            )
+            telemetry_object.openai_file_id = file.id
+            telemetry_object.release_image_bytes()
+            return telemetry_object.filepath, file.id
+        except Exception as e:
+            logger.ai(f"Failed to upload {telemetry_object.filepath}: {e}")
+            return telemetry_object.filepath, None
+
+    async def _upload_files(self, telemetry_objects, concurrent: bool = True) -> list:
+        uploaded_objects = []
+        uploads = []
+
+        # Generators (streamed frames, cache filtering) do blocking work per item,
+        # so they are advanced off the request loop
+        iterator = iter(telemetry_objects)
+        while True:
+            if isinstance(telemetry_objects, (list, tuple)):
+                telemetry_object = next(iterator, None)
+            else:
+                telemetry_object = await asyncio.to_thread(next, iterator, None)
+            if telemetry_object is None:
+                break
+            uploaded_objects.append(telemetry_object)
+            if concurrent:
+                uploads.append(asyncio.create_task(self._upload_file(telemetry_object)))
+            else:
+                await self._upload_file(telemetry_object)
+
+        await asyncio.gather(*uploads)
+        return uploaded_objects
 
     def run_all_analyses(
         self,
@@ -330,22 +670,69 @@ class AI:
         batch_size: int,
         multithreaded: bool,
         assistant: str = "batch",
+        inline_images: bool = False,
     ):
         """
         Run analyses on telemetry objects in batches.
 
         Args:
             telemetry_objects (list): List of telemetry objects with OpenAI file IDs.
-            batch_size (int): Number of objects per batch.
-            multithreaded (bool): Whether to use multithreading.
+            batch_size (int): Number of objects per batch, or None to let
+                ``batch_sizer(assistant)`` choose each batch's size.
+            multithreaded (bool): Run batches concurrently (up to the scheduler's run limit).
+            inline_images (bool): Send frames as data URLs; no file IDs needed.
 
         Returns:
             list: List of telemetry objects with analysis results.
         """
+        self.analysis_source_id(assistant)
+        return self.scheduler.run_sync(
+            self._run_all_analyses(
+                telemetry_objects,
+                batch_size,
+                multithreaded,
+                assistant,
+                self.use_inline_images(inline_images),
+            )
+        )
 
-        def _process_batch(batch):
-            result = self.get_n_analyses_from_openai(batch)
-            return result if result is not None else []
+    async def _run_all_analyses(
+        self,
+        telemetry_objects: list,
+        batch_size: int,
+        concurrent: bool = True,
+        assistant: str = "batch",
+        inline: bool = False,
+        on_batch_analyzed=None,
+    ) -> list:
+        async def _process_batch(batch):
+            result = await self._get_n_analyses(batch, assistant, inline)
+            result = result if result is not None else []
+            if on_batch_analyzed is not None:
+                on_batch_analyzed(result)
+            return result
+
+        if batch_size is None:
+            # Adaptive: each worker sizes its next batch from the results so far
+            sizer = self.batch_sizer(assistant)
+            position = 0
+            results_by_start = {}
+
+            async def _worker():
+                nonlocal position
+                while position < len(telemetry_objects):
+                    start = position
+                    batch = telemetry_objects[start : start + sizer.next_size()]
+                    position += len(batch)
+                    results_by_start[start] = await _process_batch(batch)
+
+            workers = (
+                self.scheduler.limits.get(self._run_limit(assistant), 1) if concurrent else 1
+            )
+            await asyncio.gather(*[_worker() for _ in range(workers)])
+            return [
+                obj for start in sorted(results_by_start) for obj in results_by_start[start]
+            ]
 
         # Create batches
         batches = [
@@ -353,66 +740,692 @@ class AI:
             for i in range(0, len(telemetry_objects), batch_size)
         ]
 
+        if concurrent:
+            results = await asyncio.gather(*[_process_batch(batch) for batch in batches])
+        else:
+            results = [await _process_batch(batch) for batch in batches]
+
+        # Flatten results
+        return [obj for batch_result in results for obj in batch_result]
+
+    def get_assistant_id(self, assistant: str = "batch") -> str:
+        """
+        ID of the assistant for the given type, creating the assistant if needed.
+
+        Args:
+            assistant (str): 'batch', 'greenway' or 'checker'.
+
+        Returns:
+            str: Assistant ID.
+        """
         if assistant == "batch":
             if not self.batch_assistant_id:
                 self.create_assistant(type="batch")
-            self.current_assistant_id = self.batch_assistant_id
+            return self.batch_assistant_id
         elif assistant == "greenway":
             if not self.greenway_assistant_id:
                 self.create_assistant(type="greenway")
-            self.current_assistant_id = self.greenway_assistant_id
+            return self.greenway_assistant_id
         elif assistant == "checker":
             if not self.checker_assistant_id:
                 self.create_assistant(type="checker")
-            self.current_assistant_id = self.checker_assistant_id
+            return self.checker_assistant_id
+        return self.current_assistant_id
 
-        if multithreaded:
-            from concurrent.futures import ThreadPoolExecutor
+    def analysis_source_id(self, assistant: str = "batch") -> str:
+        """
+        What produces analyses for an assistant type on the current backend, as cached.
 
-            with ThreadPoolExecutor(max_workers=20) as executor:
-                results = executor.map(_process_batch, batches)
-        else:
-            results = map(_process_batch, batches)
+        The assistant ID on the Assistants backend (created if needed); the model name on
+        the Responses backend, which needs no assistant.
+        """
+        if self.analysis_backend == "responses":
+            return f"responses:{self._response_prompt(assistant)[0]}"
+        return self.get_assistant_id(assistant)
 
-        # Flatten results
-        return [obj for batch_result in results for obj in batch_result]
+    def deferred_source_id(self, assistant: str = "batch") -> str:
+        """
+        Cache source for deferred (Batch API) analyses of an assistant type.
+
+        Batch lines always use the Responses body, so this is the Responses source on either
+        backend and never creates an assistant.
+        """
+        return f"responses:{self._response_prompt(assistant)[0]}"
+
+    def select_assistant(self, assistant: str = "batch") -> str:
+        """
+        Point analysis runs at the given assistant type, creating it if needed.
+
+        Concurrent pipelines share one AI, so internal calls pass the assistant type
+        explicitly; this default is only used by direct ``get_n_analyses_from_openai`` calls.
+
+        Args:
+            assistant (str): 'batch', 'greenway' or 'checker'.
+
+        Returns:
+            str: The assistant ID now in ``self.current_assistant_id``.
+        """
+        self.current_assistant = assistant
+        self.current_assistant_id = self.get_assistant_id(assistant)
+        return self.current_assistant_id
+
+    def prompt_version(self, assistant: str = None) -> str:
+        """
+        Version tag for cached analyses: the manual ``analysis_prompt_version`` plus a digest
+        of the local instructions and response format used for this assistant type.
+        """
+        assistant = assistant or self.current_assistant
+        prompts = {
+            "batch": (self.instructions, self.batch_response_format),
+            "greenway": (self.greenway_instructions, self.greenway_response_format),
+            "checker": (checker_instructions, self.batch_response_format),
+        }
+        digest = hashlib.sha256(
+            json.dumps(prompts.get(assistant), sort_keys=True).encode()
+        ).hexdigest()[:12]
+        return f"v{analysis_prompt_version}-{digest}"
+
+    def apply_cached_analysis(
+        self, telemetry_object, assistant: str = "batch", source_id: str = None
+    ) -> bool:
+        """
+        Fill ``analysis_results`` from the cache.
+
+        Args:
+            telemetry_object (TelemetryObject): Frame to look up.
+            assistant (str): Assistant type whose analysis is wanted.
+            source_id (str): Cache source to look under; defaults to
+                ``analysis_source_id(assistant)``.
+
+        Returns:
+            bool: True on a cache hit; the frame then needs no upload or inference.
+        """
+        if self.analysis_cache is None:
+            return False
+        try:
+            analysis = self.analysis_cache.get(
+                telemetry_object.get_content_hash(),
+                source_id or self.analysis_source_id(assistant),
+                self.prompt_version(assistant),
+            )
+        except OSError as e:
+            logger.ai(f"Could not hash {telemetry_object.filepath} for the cache: {e}")
+            return False
+        if analysis is None:
+            return False
+        analysis["file_id"] = telemetry_object.filename
+        telemetry_object.analysis_results = analysis
+        telemetry_object.release_image_bytes()
+        return True
+
+    def cache_analyses(
+        self, telemetry_objects: list, assistant: str = "batch", source_id: str = None
+    ):
+        """
+        Store freshly produced analyses for an assistant type and its prompt version,
+        under ``source_id`` or the current backend's ``analysis_source_id``.
+        """
+        if self.analysis_cache is None or not telemetry_objects:
+            return
+        try:
+            self.analysis_cache.put_many(
+                [
+                    (obj.get_content_hash(), obj.analysis_results)
+                    for obj in telemetry_objects
+                    if obj.analysis_results
+                ],
+                source_id or self.analysis_source_id(assistant),
+                self.prompt_version(assistant),
+            )
+        except Exception as e:
+            logger.ai(f"Failed to cache analyses: {e}")
+
+    def _split_cached(
+        self,
+        telemetry_objects,
+        ordered_objects: list,
+        cached_objects: list,
+        assistant: str,
+        source_id: str = None,
+    ):
+        """Yield cache misses; hits are filled in and collected in ``cached_objects``."""
+        for telemetry_object in telemetry_objects:
+            ordered_objects.append(telemetry_object)
+            if self.apply_cached_analysis(telemetry_object, assistant, source_id):
+                cached_objects.append(telemetry_object)
+            else:
+                yield telemetry_object
+
+    @staticmethod
+    def _in_frame_order(ordered_objects: list, *result_lists) -> list:
+        kept = {id(obj) for results in result_lists for obj in results}
+        return [obj for obj in ordered_objects if id(obj) in kept]
 
     def analyze_images_with_ai(
-        self, telemetry_objects: list, batch_size: int, multithreaded: bool = True
+        self,
+        telemetry_objects: list,
+        batch_size: int,
+        multithreaded: bool = True,
+        inline_images: bool = False,
     ):
         """
         Main function to analyze images using OpenAI.
 
         Args:
-            telemetry_objects (list): List of telemetry objects.
-            batch_size (int): Number of objects per analysis batch.
-            multithreaded (bool): Whether to use multithreading.
+            telemetry_objects (iterable): Telemetry objects, or a generator of streamed frames.
+            batch_size (int): Number of objects per analysis batch, or None for adaptive sizing.
+            multithreaded (bool): Send requests concurrently (within the scheduler's limits).
+            inline_images (bool): Send frames as base64 data URLs in the analysis request,
+                skipping the Files API upload and delete (Responses backend only).
 
         Returns:
             list: List of fully populated telemetry objects.
         """
-        # Stage 1: Upload files to OpenAI
+        self.analysis_source_id("batch")
+        return self.scheduler.run_sync(
+            self._analyze_images(
+                telemetry_objects,
+                batch_size,
+                multithreaded,
+                self.use_inline_images(inline_images),
+            )
+        )
+
+    async def analyze_images_with_ai_async(
+        self,
+        telemetry_objects: list,
+        batch_size: int,
+        inline_images: bool = False,
+        on_batch_analyzed=None,
+    ):
+        """
+        Awaitable ``analyze_images_with_ai``; the caller's event loop stays free.
+
+        ``on_batch_analyzed(frames)`` is called (on the request loop, so it must not block)
+        with each batch as soon as it is analyzed, and once with the cache hits.
+        """
+        await asyncio.to_thread(self.analysis_source_id, "batch")
+        return await self.scheduler.run(
+            self._analyze_images(
+                telemetry_objects,
+                batch_size,
+                inline=self.use_inline_images(inline_images),
+                on_batch_analyzed=on_batch_analyzed,
+            )
+        )
+
+    async def _analyze_images(
+        self,
+        telemetry_objects,
+        batch_size: int,
+        concurrent: bool = True,
+        inline: bool = False,
+        on_batch_analyzed=None,
+    ):
+        ordered_objects = []
+        cached_objects = []
+
+        # Stage 1: Upload files to OpenAI (cache hits skip upload and inference;
+        # inline frames are encoded into each request instead)
         start_time_6a = time.time()
-        self.upload_files_to_openai(telemetry_objects, multithreaded)
+        misses = self._split_cached(
+            telemetry_objects, ordered_objects, cached_objects, "batch"
+        )
+        if inline:
+            telemetry_objects = await asyncio.to_thread(list, misses)
+        else:
+            telemetry_objects = await self._upload_files(misses, concurrent)
+        if on_batch_analyzed is not None and cached_objects:
+            on_batch_analyzed(list(cached_objects))
 
         self.file_ids = [obj.openai_file_id for obj in telemetry_objects]
 
         # Stage 2: Run all analyses
         start_time_6b = time.time()
-        analyzed_telemetry_objects = self.run_all_analyses(
-            telemetry_objects, batch_size, multithreaded, assistant="batch"
+        analyzed_telemetry_objects = await self._run_all_analyses(
+            telemetry_objects,
+            batch_size,
+            concurrent,
+            assistant="batch",
+            inline=inline,
+            on_batch_analyzed=on_batch_analyzed,
         )
         # ASSISTANT TYPE IS SELECTED HERE. CURRENTLY SET TO GREENWAY FOR GREENWAY DATA VALIDATION. CHANGE TO 'batch' FOR RETURN TO ROAD HEALTH EVALUATOR
 
+        logger.ai(
+            f"Analysis cache: {len(cached_objects)} hits, {len(telemetry_objects)} frames sent to the model."
+        )
+        analyzed_telemetry_objects = self._in_frame_order(
+            ordered_objects, cached_objects, analyzed_telemetry_objects
+        )
         return analyzed_telemetry_objects, start_time_6a, start_time_6b
 
     def analyze_images_with_checker_ai(
-        self, telemetry_objects: list, batch_size: int, multithreaded: bool = True
+        self,
+        telemetry_objects: list,
+        batch_size: int,
+        multithreaded: bool = True,
+        inline_images: bool = False,
     ):
-        analyzed_telemetry_objects = self.run_all_analyses(
-            telemetry_objects, batch_size, multithreaded, assistant="checker"
+        self.analysis_source_id("checker")
+        return self.scheduler.run_sync(
+            self._analyze_images_with_checker(
+                telemetry_objects,
+                batch_size,
+                multithreaded,
+                self.use_inline_images(inline_images),
+            )
+        )
+
+    async def analyze_images_with_checker_ai_async(
+        self, telemetry_objects: list, batch_size: int, inline_images: bool = False
+    ):
+        """Awaitable ``analyze_images_with_checker_ai``; the caller's event loop stays free."""
+        await asyncio.to_thread(self.analysis_source_id, "checker")
+        return await self.scheduler.run(
+            self._analyze_images_with_checker(
+                telemetry_objects,
+                batch_size,
+                inline=self.use_inline_images(inline_images),
+            )
+        )
+
+    async def _analyze_images_with_checker(
+        self,
+        telemetry_objects: list,
+        batch_size: int,
+        concurrent: bool = True,
+        inline: bool = False,
+    ):
+        ordered_objects = []
+        cached_objects = []
+        misses = await asyncio.to_thread(
+            list,
+            self._split_cached(telemetry_objects, ordered_objects, cached_objects, "checker"),
+        )
+
+        if not inline:
+            # Frames whose first pass came from the cache were never uploaded
+            await self._upload_files(
+                [obj for obj in misses if not obj.openai_file_id], concurrent
+            )
+
+        analyzed_telemetry_objects = await self._run_all_analyses(
+            misses, batch_size, concurrent, assistant="checker", inline=inline
+        )
+        return self._in_frame_order(
+            ordered_objects, cached_objects, analyzed_telemetry_objects
+        )
+
+    def submit_images_deferred(
+        self,
+        telemetry_objects: list,
+        batch_size: int,
+        job_name: str,
+        assistant: str = "batch",
+        inline_images: bool = False,
+        context: dict = None,
+    ) -> tuple:
+        """
+        Submit frames to the Batch API (half price, no rate-limit pressure, results within
+        24 hours) and return without waiting for them; see ``collect_images_deferred``.
+
+        The submitted batch IDs are persisted under ``job_name``, so submitting the same
+        video again after a restart picks up the existing job instead of paying twice.
+
+        Args:
+            telemetry_objects (iterable): Telemetry objects.
+            batch_size (int): Images per request line, or None for the sizer's current size.
+            job_name (str): Persistent key for the job, e.g. the video's base name.
+            assistant (str): 'batch', 'greenway' or 'checker'; picks instructions and schema.
+            inline_images (bool): Embed frames in the JSONL as data URLs instead of uploading
+                them. The JSONL is split into several batches to stay under the Batch API's
+                200 MB input file limit.
+            context (dict): Stored with the job, e.g. what the caller needs to finish the
+                video once results are in.
+
+        Returns:
+            tuple: (telemetry objects in frame order, cache hits filled in; the job record,
+                or None when every frame was a cache hit)
+        """
+        return self.scheduler.run_sync(
+            self._submit_images_deferred(
+                telemetry_objects, batch_size, job_name, assistant, inline_images, context
+            )
+        )
+
+    async def submit_images_deferred_async(
+        self,
+        telemetry_objects: list,
+        batch_size: int,
+        job_name: str,
+        assistant: str = "batch",
+        inline_images: bool = False,
+        context: dict = None,
+    ) -> tuple:
+        """Awaitable ``submit_images_deferred``; the caller's event loop stays free."""
+        return await self.scheduler.run(
+            self._submit_images_deferred(
+                telemetry_objects, batch_size, job_name, assistant, inline_images, context
+            )
+        )
+
+    async def _submit_images_deferred(
+        self,
+        telemetry_objects,
+        batch_size: int,
+        job_name: str,
+        assistant: str,
+        inline: bool = False,
+        context: dict = None,
+    ) -> tuple:
+        ordered_objects = []
+        cached_objects = []
+        misses = await asyncio.to_thread(
+            list,
+            self._split_cached(
+                telemetry_objects,
+                ordered_objects,
+                cached_objects,
+                assistant,
+                self.deferred_source_id(assistant),
+            ),
+        )
+
+        job = self.batch_jobs.get(job_name)
+        if job and job.get("assistant") == assistant and {
+            obj.filename for obj in misses
+        } <= _job_filenames(job) | set(job.get("collected", {})):
+            logger.ai(
+                f"Resuming deferred job {job_name} (batches {', '.join(_job_batch_ids(job))})."
+            )
+            if context and job.get("context") != context:
+                job["context"] = context
+                self.batch_jobs.save(job_name, job)
+        elif misses:
+            if not inline:
+                await self._upload_files([obj for obj in misses if not obj.openai_file_id])
+            job = await self._submit_deferred(
+                misses, batch_size, job_name, assistant, inline, context
+            )
+        else:
+            job = None
+
+        logger.ai(
+            f"Deferred job {job_name}: {len(cached_objects)} cache hits, "
+            f"{len(misses)} frames {'with the Batch API' if job else 'not submitted'}."
+        )
+        return ordered_objects, job
+
+    def collect_images_deferred(self, job_name: str, telemetry_objects: list) -> list:
+        """
+        Apply a deferred job's results once all of its batches have finished.
+
+        Checks each batch's status once; it does not wait. Frames still without results once
+        every batch has finished (expired, failed or cancelled batches, failed or unreadable
+        request lines, frames the model left out) are submitted again under the same job, up
+        to ``DEFERRED_MAX_SUBMISSIONS`` times in all, keeping the results collected so far in
+        the job record. The job record is kept: the caller removes it
+        (``batch_jobs.remove``) once the results are safely used, so a failure after this
+        call can collect them again.
+
+        Args:
+            job_name (str): Key the job was submitted under.
+            telemetry_objects (list): The frames that were submitted (others are ignored).
+
+        Returns:
+            list: ``telemetry_objects`` with analyses where the batches returned one, or
+                None while a batch is still running or was resubmitted.
+        """
+        return self.scheduler.run_sync(
+            self._collect_images_deferred(job_name, telemetry_objects)
+        )
+
+    async def collect_images_deferred_async(
+        self, job_name: str, telemetry_objects: list
+    ) -> list:
+        """Awaitable ``collect_images_deferred``; the caller's event loop stays free."""
+        return await self.scheduler.run(
+            self._collect_images_deferred(job_name, telemetry_objects)
+        )
+
+    async def _collect_images_deferred(self, job_name: str, telemetry_objects: list) -> list:
+        job = self.batch_jobs.get(job_name)
+        if job is None:
+            return telemetry_objects  # Nothing was submitted, or it was collected already
+
+        batches = []
+        for batch_id in _job_batch_ids(job):
+            batch = await self._retrieve_batch(batch_id)
+            if batch.status not in BATCH_FINAL_STATUSES:
+                return None
+            batches.append(batch)
+
+        # Results from earlier submissions of a resubmitted job
+        collected = job.get("collected", {})
+        for obj in telemetry_objects:
+            if not obj.analysis_results and obj.filename in collected:
+                obj.analysis_results = collected[obj.filename]
+
+        submitted = _job_filenames(job)
+        submitted_objects = [obj for obj in telemetry_objects if obj.filename in submitted]
+        analyzed_objects = []
+        for batch in batches:
+            analyzed_objects += await self._collect_deferred(
+                batch, job, submitted_objects, job["assistant"]
+            )
+        logger.ai(
+            f"Deferred job {job_name}: {len(analyzed_objects)} of {len(submitted_objects)} "
+            "frames analyzed by the batch."
+        )
+
+        # Frames lost to an expired/failed batch, failed or unreadable lines, or left out
+        # by the model all get another submission, as missing_frame_retries does interactively
+        missing = [obj for obj in submitted_objects if not obj.analysis_results]
+        if missing:
+            submissions = job.get("submissions", 1)
+            statuses = ", ".join(f"{batch.id} {batch.status}" for batch in batches)
+            if submissions < DEFERRED_MAX_SUBMISSIONS:
+                logger.ai(
+                    f"Deferred job {job_name}: resubmitting {len(missing)} frames without results ({statuses})."
+                )
+                if not job.get("inline", False):
+                    await self._upload_files([obj for obj in missing if not obj.openai_file_id])
+                collected = {
+                    **collected,
+                    **{
+                        obj.filename: obj.analysis_results
+                        for obj in submitted_objects
+                        if obj.analysis_results
+                    },
+                }
+                await self._submit_deferred(
+                    missing,
+                    None,
+                    job_name,
+                    job["assistant"],
+                    job.get("inline", False),
+                    job.get("context"),
+                    collected=collected,
+                    submissions=submissions + 1,
+                )
+                return None
+            logger.error(
+                f"Deferred job {job_name}: {len(missing)} frames still have no results after {submissions} submissions ({statuses})."
+            )
+        return telemetry_objects
+
+    def _build_batch_lines(
+        self, telemetry_objects: list, batch_size: int, job_name: str, assistant: str, inline: bool
+    ) -> tuple:
+        """JSONL request lines for a deferred job, and which frames each ``custom_id`` covers."""
+        lines = []
+        requests = {}
+        batch_size = batch_size or self.batch_sizer(assistant).next_size()
+        for index in range(0, len(telemetry_objects), batch_size):
+            batch = [
+                obj for obj in telemetry_objects[index : index + batch_size]
+                if inline or obj.openai_file_id
+            ]
+            if not batch:
+                continue
+            custom_id = f"{job_name}-{index // batch_size}"
+            requests[custom_id] = [obj.filename for obj in batch]
+            lines.append(
+                json.dumps(
+                    {
+                        "custom_id": custom_id,
+                        "method": "POST",
+                        "url": "/v1/responses",
+                        "body": self._response_request_body(batch, assistant, inline),
+                    }
+                )
+            )
+        return lines, requests
+
+    async def _submit_deferred(
+        self,
+        telemetry_objects: list,
+        batch_size: int,
+        job_name: str,
+        assistant: str,
+        inline: bool = False,
+        context: dict = None,
+        collected: dict = None,
+        submissions: int = 1,
+    ) -> dict:
+        """
+        Write one Responses request per batch to JSONL, submit it and persist the job.
+
+        Inline frames make large files, so the JSONL is split into as many batches as
+        ``BATCH_INPUT_FILE_MAX_BYTES`` requires; they share one job record. ``collected``
+        (filename -> analysis) and ``submissions`` carry over from an earlier submission
+        of the same job.
+        """
+        lines, requests = await asyncio.get_running_loop().run_in_executor(
+            self.encode_pool,
+            self._build_batch_lines,
+            telemetry_objects,
+            batch_size,
+            job_name,
+            assistant,
+            inline,
+        )
+
+        chunks = _split_by_size(lines, BATCH_INPUT_FILE_MAX_BYTES)
+        batch_ids = []
+        input_file_ids = []
+        for part, chunk in enumerate(chunks, 1):
+            file_name = f"{job_name}.jsonl" if len(chunks) == 1 else f"{job_name}-{part}.jsonl"
+            input_file = await self.scheduler.with_retries(
+                lambda: self.async_client.files.create(
+                    file=(file_name, "\n".join(chunk).encode(), "application/jsonl"),
+                    purpose="batch",
+                ),
+                f"Upload of {file_name}",
+            )
+            batch = await self.scheduler.with_retries(
+                lambda: self.async_client.batches.create(
+                    input_file_id=input_file.id,
+                    endpoint="/v1/responses",
+                    completion_window="24h",
+                    metadata={"job": job_name},
+                ),
+                f"Batch submission for {file_name}",
+            )
+            batch_ids.append(batch.id)
+            input_file_ids.append(input_file.id)
+        job = {
+            "batch_ids": batch_ids,
+            "input_file_ids": input_file_ids,
+            "assistant": assistant,
+            "submitted_at": datetime.now(timezone.utc).isoformat(),
+            "requests": requests,
+            "inline": inline,
+            "context": context or {},
+            "collected": collected or {},
+            "submissions": submissions,
+        }
+        self.batch_jobs.save(job_name, job)
+        logger.ai(
+            f"Submitted deferred job {job_name}: {len(lines)} requests in batches {', '.join(batch_ids)}."
+        )
+        return job
+
+    async def _retrieve_batch(self, batch_id: str):
+        batch = await self.scheduler.with_retries(
+            lambda: self.async_client.batches.retrieve(batch_id),
+            f"Status check of {batch_id}",
+        )
+        if batch.status not in BATCH_FINAL_STATUSES:
+            counts = batch.request_counts
+            logger.ai(
+                f"Batch {batch_id} is {batch.status}"
+                + (f" ({counts.completed}/{counts.total} requests done)" if counts else "")
+            )
+        return batch
+
+    @staticmethod
+    def _response_body_text(body: dict) -> str:
+        """The ``output_text`` of a Responses API object given as JSON."""
+        return "".join(
+            part.get("text", "")
+            for item in body.get("output", [])
+            if item.get("type") == "message"
+            for part in item.get("content", [])
+            if part.get("type") == "output_text"
         )
-        return analyzed_telemetry_objects
+
+    async def _collect_deferred(
+        self, batch, job: dict, telemetry_objects: list, assistant: str
+    ) -> list:
+        """Apply a finished batch's results to the frames each request line covered."""
+        if batch.status != "completed":
+            logger.error(f"Batch {batch.id} ended as {batch.status}; collecting partial results.")
+        if batch.error_file_id:
+            errors = await self.async_client.files.content(batch.error_file_id)
+            for line in errors.text.splitlines():
+                logger.ai(f"Batch {batch.id} request failed: {line}")
+        if not batch.output_file_id:
+            return []
+
+        output = await self.async_client.files.content(batch.output_file_id)
+        by_filename = {obj.filename: obj for obj in telemetry_objects}
+        analyzed_objects = []
+        total_tokens = 0
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get("response") or {}
+            body = response.get("body") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                logger.ai(f"Batch request {result.get('custom_id')} failed: {result.get('error') or body}")
+                continue
+            total_tokens += (body.get("usage") or {}).get("total_tokens", 0)
+            request_objects = [
+                by_filename[filename]
+                for filename in job["requests"].get(result["custom_id"], [])
+                if filename in by_filename
+            ]
+            try:
+                await asyncio.to_thread(
+                    self._apply_analysis_texts,
+                    [self._response_body_text(body)],
+                    request_objects,
+                    assistant,
+                    self.deferred_source_id(assistant),
+                )
+            except ValueError as e:
+                logger.ai(f"Unreadable result for {result['custom_id']}: {e}")
+                continue
+            analyzed_objects.extend(obj for obj in request_objects if obj.analysis_results)
+
+        with open(TOKEN_USAGE_LOG_FILE, "a") as f:
+            f.write(
+                f"{datetime.now(timezone.utc)} - Batch ID: {batch.id}, Tokens Used: {total_tokens}, Images: {len(analyzed_objects)}\n"
+            )
+        return analyzed_objects
 
     def list_uploaded_files(self) -> list:
         """
@@ -454,7 +1467,7 @@ class AI:
 
     def delete_files(self, file_ids: list):
         """
-        Deletes files from OpenAI using multithreading.
+        Deletes files from OpenAI concurrently, within the scheduler's delete limit.
 
         Args:
             file_ids (list): List of file IDs to delete.
@@ -462,10 +1475,22 @@ class AI:
         Returns:
             dict: Dictionary mapping file IDs to deletion success status.
         """
+        return self.scheduler.run_sync(self._delete_files(file_ids))
+
+    async def delete_files_async(self, file_ids: list):
+        """Awaitable ``delete_files`` for callers on another event loop."""
+        return await self.scheduler.run(self._delete_files(file_ids))
+
+    async def _delete_files(self, file_ids: list) -> dict:
+        async def _delete_file(file_id):
+            async def _attempt():
+                async with self.scheduler.limit("delete"):
+                    return await self.async_client.files.delete(file_id)
 
-        def _delete_file(file_id):
             try:
-                result = self.client.files.delete(file_id)
+                result = await self.scheduler.with_retries(
+                    _attempt, f"Delete of {file_id}"
+                )
                 if isinstance(result, FileDeleted):
                     return file_id, True
                 else:
@@ -475,13 +1500,8 @@ class AI:
                 logger.ai(f"Error deleting file {file_id}: {e}")
                 return file_id, False
 
-        deletion_results = {}
-        with ThreadPoolExecutor(max_workers=20) as executor:
-            results = executor.map(_delete_file, file_ids)
-            for file_id, success in results:
-                deletion_results[file_id] = success
-
-        return deletion_results
+        results = await asyncio.gather(*[_delete_file(file_id) for file_id in file_ids])
+        return dict(results)
 
     def clear_old_files(self, days_ago_threshold: int = 7):
         days_ago = datetime.now(timezone.utc) - timedelta(days=days_ago_threshold)
@@ -0,0 +1,94 @@
+# analysis_cache.py
+"""
+Persistent cache of AI analyses, keyed by frame content.
+
+A frame's key is the SHA-256 of its JPEG bytes plus the assistant ID and prompt version
+that produced the analysis, so re-running a video after a crash only pays for frames that
+were never analyzed, while a new assistant or prompt version misses the cache as it should.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from logging_config import logger
+
+ANALYSIS_CACHE_FILE = "cache/analysis_cache.sqlite"
+
+
+class AnalysisCache:
+    def __init__(self, db_path=ANALYSIS_CACHE_FILE):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        db_folder = os.path.dirname(db_path)
+        if db_folder:
+            os.makedirs(db_folder, exist_ok=True)
+        # One connection shared by upload/analysis threads, serialized by self._lock
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analyses (
+                    frame_hash TEXT NOT NULL,
+                    assistant_id TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    analysis TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    PRIMARY KEY (frame_hash, assistant_id, prompt_version)
+                )
+                """
+            )
+
+    def get(self, frame_hash, assistant_id, prompt_version) -> dict:
+        """
+        Look up a cached analysis.
+
+        Args:
+            frame_hash (str): Content hash of the frame.
+            assistant_id (str): Assistant that produced the analysis.
+            prompt_version (str): Prompt/response-format version it was produced with.
+
+        Returns:
+            dict: The cached analysis, or None on a miss.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT analysis FROM analyses WHERE frame_hash = ? AND assistant_id = ? AND prompt_version = ?",
+                (frame_hash, assistant_id, prompt_version),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put_many(self, entries, assistant_id, prompt_version):
+        """
+        Store analyses for several frames in one transaction.
+
+        Args:
+            entries (iterable): ``(frame_hash, analysis)`` pairs.
+            assistant_id (str): Assistant that produced the analyses.
+            prompt_version (str): Prompt/response-format version they were produced with.
+        """
+        created_at = datetime.now(timezone.utc).isoformat()
+        rows = [
+            (frame_hash, assistant_id, prompt_version, json.dumps(analysis), created_at)
+            for frame_hash, analysis in entries
+        ]
+        if not rows:
+            return
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?)", rows
+            )
+        logger.info(f"Cached {len(rows)} analyses for assistant {assistant_id}.")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -1,32 +1,35 @@
-from arcgis.geometry import project
+from arcgis.geometry import Envelope
 from arcgis.features import FeatureLayer
 from arcgis.gis import GIS
 from arcgis.geometry.filters import intersects
 import os
 import dotenv
+from geospatial import meters_per_unit, project_points
 
 dotenv.load_dotenv()
 gis = GIS("https://www.arcgis.com", api_key=os.getenv("ARCGIS_API_KEY"))
 
 roads_url = "https://maps.townofcary.org/arcgis/rest/services/Transportation/Transportation/MapServer/19"
 roads_layer = FeatureLayer(roads_url, gis=gis)
+roads_sr = roads_layer.properties.extent.spatialReference
+roads_wkid = int(roads_sr.get("latestWkid") or roads_sr["wkid"])
 
 
 def find_nearby_road(lat, lon):
-    # Create extent buffer manually in WGS84
-    delta_deg = 0.0001  # ~10 meters
-    extent = {
-        "xmin": lon - delta_deg,
-        "ymin": lat - delta_deg,
-        "xmax": lon + delta_deg,
-        "ymax": lat + delta_deg,
-        "spatialReference": {"wkid": 4326},
-    }
-
-    # Project the extent to match layer SR
-    projected_extent = project([extent], in_sr=4326, out_sr=102719)[0]
-
-    query_filter = intersects(projected_extent, sr=102719)
+    # Project the point locally to the layer SR and buffer it there
+    xs, ys = project_points([lat], [lon], roads_wkid)
+    delta = 10 / meters_per_unit(roads_wkid)  # ~10 meters
+    projected_extent = Envelope(
+        {
+            "xmin": float(xs[0]) - delta,
+            "ymin": float(ys[0]) - delta,
+            "xmax": float(xs[0]) + delta,
+            "ymax": float(ys[0]) + delta,
+            "spatialReference": {"wkid": roads_wkid},
+        }
+    )
+
+    query_filter = intersects(projected_extent, sr=roads_wkid)
 
     result = roads_layer.query(
         geometry_filter=query_filter,
@@ -0,0 +1,69 @@
+# batch_jobs.py
+"""
+Record of submitted OpenAI Batch API jobs, so deferred analyses survive a restart.
+
+Each job is stored under a name (one per video) with its batch IDs, which frames every
+request line (``custom_id``) covers, and a ``context`` telling the monitoring loop which
+video to finish once the batches are done. A re-run of the same video picks the job back up
+instead of paying for a second submission.
+"""
+
+import os
+import json
+import threading
+from logging_config import logger
+
+BATCH_JOBS_FILE = "cache/batch_jobs.json"
+
+
+class BatchJobStore:
+    def __init__(self, path=BATCH_JOBS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path) as jobs_file:
+                return json.load(jobs_file)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError as e:
+            logger.error(f"Ignoring unreadable batch job file {self.path}: {e}")
+            return {}
+
+    def _write(self, jobs: dict):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as jobs_file:
+            json.dump(jobs, jobs_file, indent=2)
+        os.replace(temp_path, self.path)  # Never leave a half-written file behind
+
+    def get(self, job_name) -> dict:
+        """Stored record for ``job_name``, or None."""
+        with self._lock:
+            return self._load().get(job_name)
+
+    def save(self, job_name, record: dict):
+        """
+        Store or replace the record for a job.
+
+        Args:
+            job_name (str): Job key, e.g. the video's base name.
+            record (dict): ``batch_ids``, ``assistant``, ``requests`` (custom_id -> filenames), ...
+        """
+        with self._lock:
+            jobs = self._load()
+            jobs[job_name] = record
+            self._write(jobs)
+
+    def remove(self, job_name):
+        with self._lock:
+            jobs = self._load()
+            if jobs.pop(job_name, None) is not None:
+                self._write(jobs)
+
+    def all(self) -> dict:
+        with self._lock:
+            return self._load()
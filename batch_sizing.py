@@ -0,0 +1,152 @@
+# batch_sizing.py
+"""
+Adaptive sizing of multi-image analysis batches.
+
+Bigger batches spread the prompt tokens over more frames, but the model is more likely to
+skip or mislabel an entry in a long ``analyses`` list, and each request takes longer. The
+sizer grows the batch while frames keep matching and tokens per frame keep falling, and
+backs off as soon as frames go missing or a batch runs too long.
+
+Every observed batch is also appended to ``BATCH_OBSERVATIONS_FILE`` so sizing policies
+can be compared offline (``python benchmarks.py <video> batching``).
+"""
+
+import os
+import json
+import threading
+from logging_config import logger
+
+BATCH_OBSERVATIONS_FILE = "logs/batch_observations.jsonl"
+
+
+class AdaptiveBatchSizer:
+    """
+    Chooses the next batch size from recent latency, token usage and match rate.
+
+    Args:
+        initial_size (int): Size to start from.
+        min_size (int): Smallest batch it will choose.
+        max_size (int): Largest batch it will choose.
+        target_match_rate (float): Share of frames per batch that must come back analyzed;
+            a batch below it shrinks the next one.
+        max_batch_seconds (float): A batch slower than this shrinks the next one.
+        grow_after (int): Consecutive good batches before trying one frame more.
+        smoothing (float): Weight of the newest batch in the moving averages.
+        observations_file (str): JSONL file each batch is recorded to; None to skip.
+    """
+
+    def __init__(
+        self,
+        initial_size=6,
+        min_size=2,
+        max_size=12,
+        target_match_rate=1.0,
+        max_batch_seconds=90.0,
+        grow_after=3,
+        smoothing=0.3,
+        observations_file=BATCH_OBSERVATIONS_FILE,
+        name="batch",
+    ):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.size = max(min_size, min(max_size, initial_size))
+        self.target_match_rate = target_match_rate
+        self.max_batch_seconds = max_batch_seconds
+        self.grow_after = grow_after
+        self.smoothing = smoothing
+        self.observations_file = observations_file
+        self.name = name
+        self.tokens_per_frame = {}  # size -> moving average of tokens per frame
+        self._good_batches = 0
+        self._lock = threading.Lock()
+
+    def next_size(self) -> int:
+        return self.size
+
+    def _set_size(self, size, reason):
+        size = max(self.min_size, min(self.max_size, size))
+        if size != self.size:
+            logger.ai(f"{self.name} batch size {self.size} -> {size}: {reason}")
+            self.size = size
+        self._good_batches = 0
+
+    def record(self, size: int, seconds: float, total_tokens: int, matched: int):
+        """
+        Feed back one finished batch and adjust the size for the next ones.
+
+        Args:
+            size (int): Frames sent in the batch.
+            seconds (float): Wall time of the request, including retries.
+            total_tokens (int): Tokens the request reported (0 if unknown).
+            matched (int): Frames that came back with an analysis.
+        """
+        if size <= 0:
+            return
+        match_rate = matched / size
+        with self._lock:
+            if total_tokens:
+                per_frame = total_tokens / size
+                previous = self.tokens_per_frame.get(size, per_frame)
+                self.tokens_per_frame[size] = previous + self.smoothing * (per_frame - previous)
+
+            if match_rate < self.target_match_rate:
+                self._set_size(
+                    min(self.size, size) * 3 // 4,
+                    f"{size - matched} of {size} frames came back without an analysis",
+                )
+            elif seconds > self.max_batch_seconds:
+                self._set_size(
+                    min(self.size, size) - 1,
+                    f"batch took {seconds:.0f}s (limit {self.max_batch_seconds:.0f}s)",
+                )
+            elif size == self.size:
+                self._good_batches += 1
+                if self._good_batches >= self.grow_after and self._cheaper_per_frame():
+                    self._set_size(
+                        self.size + 1, f"{self._good_batches} clean batches in a row"
+                    )
+        self._write_observation(size, seconds, total_tokens, matched)
+
+    def _cheaper_per_frame(self) -> bool:
+        """False once a bigger batch has proven to cost more tokens per frame than this one."""
+        current = self.tokens_per_frame.get(self.size)
+        larger = self.tokens_per_frame.get(self.size + 1)
+        return current is None or larger is None or larger < current
+
+    def _write_observation(self, size, seconds, total_tokens, matched):
+        if not self.observations_file:
+            return
+        try:
+            folder = os.path.dirname(self.observations_file)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with open(self.observations_file, "a") as observations:
+                observations.write(
+                    json.dumps(
+                        {
+                            "sizer": self.name,
+                            "size": size,
+                            "seconds": round(seconds, 3),
+                            "total_tokens": total_tokens,
+                            "matched": matched,
+                        }
+                    )
+                    + "\n"
+                )
+        except OSError as e:
+            logger.warning(f"Could not record batch observation: {e}")
+
+
+def load_observations(path=BATCH_OBSERVATIONS_FILE, sizer_name=None) -> list:
+    """Recorded batches from ``path``, optionally only those of one sizer."""
+    observations = []
+    try:
+        with open(path) as observations_file:
+            for line in observations_file:
+                if line.strip():
+                    observation = json.loads(line)
+                    if sizer_name is None or observation.get("sizer") == sizer_name:
+                        observations.append(observation)
+    except FileNotFoundError:
+        pass
+    return observations
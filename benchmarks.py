@@ -0,0 +1,389 @@
+# benchmarks.py
+"""
+Ad-hoc performance benchmarks for the road health pipeline.
+Run with a sample GoPro clip, e.g. `python benchmarks.py unprocessed_videos/GX010229.MP4`,
+optionally followed by the name of a single benchmark (e.g. `profiles`).
+`backends` makes billed OpenAI requests and only runs when named.
+"""
+
+import os
+import sys
+import shutil
+import subprocess
+import random
+import tempfile
+import time
+from frame_sampling import FrameSampler, SAMPLING_STRATEGIES, AI_INPUT_PROFILES
+from utils import estimate_image_tokens, model
+from batch_sizing import AdaptiveBatchSizer, BATCH_OBSERVATIONS_FILE, load_observations
+
+
+def cut_clip(sampler: FrameSampler, video_path, seconds, output_folder) -> str:
+    """Stream-copy the first `seconds` of a video so extraction can be timed per clip length."""
+    base_name = os.path.splitext(os.path.basename(video_path))[0]
+    clip_path = os.path.join(output_folder, f"{base_name}_{seconds}s.mp4")
+    subprocess.run(
+        [
+            sampler.ffmpeg_path,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-y",
+            "-i",
+            video_path,
+            "-t",
+            str(seconds),
+            "-map",
+            "0:v:0",
+            "-c",
+            "copy",
+            clip_path,
+        ],
+        check=True,
+    )
+    return clip_path
+
+
+def benchmark_frame_sampling(
+    video_path,
+    clip_lengths=(60, 300, 1200),
+    frame_rates=(0.5, 1, 2),
+    strategies=SAMPLING_STRATEGIES,
+) -> list:
+    """
+    Time frame extraction for every clip length x sampling rate x strategy combination.
+
+    Args:
+        video_path (str): Source video; clips are cut from its start.
+        clip_lengths (tuple): Clip lengths in seconds (capped at the source duration).
+        frame_rates (tuple): Sampling rates in frames per second.
+        strategies (tuple): Sampling strategies to compare.
+
+    Returns:
+        list[dict]: One row per run with wall time and frames extracted.
+    """
+    sampler = FrameSampler()
+    source_duration = sampler.probe_video(video_path)["duration"]
+    rows = []
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for clip_length in clip_lengths:
+            if clip_length > source_duration:
+                continue
+            clip_path = cut_clip(sampler, video_path, clip_length, work_dir)
+
+            for frame_rate in frame_rates:
+                for strategy in strategies:
+                    output_folder = os.path.join(work_dir, "frames")
+                    start_time = time.time()
+                    frames = sampler.sample_frames(
+                        clip_path,
+                        frame_rate=frame_rate,
+                        output_folder=output_folder,
+                        strategy=strategy,
+                    )
+                    rows.append(
+                        {
+                            "clip_seconds": clip_length,
+                            "frame_rate": frame_rate,
+                            "strategy": strategy,
+                            "frames": len(frames),
+                            "wall_seconds": time.time() - start_time,
+                        }
+                    )
+                    shutil.rmtree(output_folder)
+
+    print(f"{'clip_s':>7} {'fps':>5} {'strategy':>8} {'frames':>7} {'wall_s':>8}")
+    for row in rows:
+        print(
+            f"{row['clip_seconds']:>7} {row['frame_rate']:>5} {row['strategy']:>8} "
+            f"{row['frames']:>7} {row['wall_seconds']:>8.2f}"
+        )
+    return rows
+
+
+def benchmark_ai_input_profiles(
+    video_path,
+    profiles=None,
+    frame_rate=1,
+    max_frames=20,
+    batch_size=5,
+    model_name=model,
+    ai=None,
+) -> list:
+    """
+    Compare AI input profiles by frame size, bytes per frame and image tokens per batch.
+
+    Token counts are estimated from the output resolution with the model's tile pricing
+    (prompt text is not included). Pass an ``AI`` client to also time real uploads; the
+    uploaded files are deleted afterwards.
+
+    Args:
+        video_path (str): Source video.
+        profiles (dict): Name -> AIInputProfile. Defaults to ``AI_INPUT_PROFILES``.
+        frame_rate (float): Sampling rate in frames per second.
+        max_frames (int): Frames extracted per profile.
+        batch_size (int): Images per analysis request.
+        model_name (str): Model whose image token pricing is used.
+        ai (AI): Optional client for measuring upload latency.
+
+    Returns:
+        list[dict]: One row per profile.
+    """
+    sampler = FrameSampler()
+    profiles = profiles or AI_INPUT_PROFILES
+    metadata = sampler.probe_video(video_path)
+    rows = []
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, profile in profiles.items():
+            output_folder = os.path.join(work_dir, name)
+            start_time = time.time()
+            frames = sampler.sample_frames(
+                video_path,
+                frame_rate=frame_rate,
+                output_folder=output_folder,
+                max_frames=max_frames,
+                profile=profile,
+            )
+            extract_seconds = time.time() - start_time
+
+            frame_bytes = [os.path.getsize(path) for path, _ in frames]
+            width, height = profile.output_size(metadata["width"], metadata["height"])
+            image_tokens = estimate_image_tokens(width, height, model_name)
+
+            upload_seconds = None
+            if ai is not None:
+                file_ids = []
+                start_time = time.time()
+                for path, _ in frames:
+                    file_ids.append(ai.upload_image(path).id)
+                upload_seconds = (time.time() - start_time) / max(len(frames), 1)
+                ai.delete_files(file_ids)
+
+            rows.append(
+                {
+                    "profile": name,
+                    "resolution": f"{width}x{height}",
+                    "frames": len(frames),
+                    "kb_per_frame": sum(frame_bytes) / max(len(frame_bytes), 1) / 1024,
+                    "tokens_per_batch": image_tokens * batch_size,
+                    "extract_seconds": extract_seconds,
+                    "upload_seconds": upload_seconds,
+                }
+            )
+
+    print(
+        f"{'profile':>9} {'resolution':>11} {'frames':>7} {'kb/frame':>9} "
+        f"{'tok/batch':>10} {'extract_s':>10} {'upload_s':>9}"
+    )
+    for row in rows:
+        upload = (
+            f"{row['upload_seconds']:>9.2f}" if row["upload_seconds"] is not None else f"{'-':>9}"
+        )
+        print(
+            f"{row['profile']:>9} {row['resolution']:>11} {row['frames']:>7} "
+            f"{row['kb_per_frame']:>9.1f} {row['tokens_per_batch']:>10} "
+            f"{row['extract_seconds']:>10.2f} {upload}"
+        )
+    return rows
+
+
+def benchmark_analysis_backends(
+    video_path,
+    backends=("assistants", "responses"),
+    batches=3,
+    batch_size=5,
+    profile="balanced",
+    ai=None,
+) -> list:
+    """
+    Time per-batch analysis latency on each AI backend with the same uploaded frames.
+
+    Makes real (billed) requests: ``batches`` x ``batch_size`` frames per backend. The
+    analysis cache is bypassed and the uploaded files are deleted afterwards.
+
+    Args:
+        video_path (str): Source video.
+        backends (tuple): Names from ``ai.ANALYSIS_BACKENDS``.
+        batches (int): Batches timed per backend.
+        batch_size (int): Images per analysis request.
+        profile (str): AI input profile the frames are extracted with.
+        ai (AI): Client to use. Defaults to one built from ``OPENAI_API_KEY``.
+
+    Returns:
+        list[dict]: One row per backend.
+    """
+    from ai import AI
+    from processing import TelemetryObject
+
+    ai = ai or AI(os.getenv("OPENAI_API_KEY"))
+    sampler = FrameSampler()
+    rows = []
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        frames = sampler.sample_frames(
+            video_path,
+            frame_rate=1,
+            output_folder=work_dir,
+            max_frames=batches * batch_size,
+            profile=AI_INPUT_PROFILES[profile],
+        )
+        file_ids = [ai.upload_image(path).id for path, _ in frames]
+
+        original_backend, original_cache = ai.analysis_backend, ai.analysis_cache
+        ai.analysis_cache = None
+        try:
+            for backend in backends:
+                ai.analysis_backend = backend
+                ai.analysis_source_id("batch")  # Assistant creation is not timed
+                batch_seconds = []
+                analyzed = 0
+                for start in range(0, len(frames), batch_size):
+                    telemetry_objects = []
+                    for (path, _), file_id in zip(
+                        frames[start : start + batch_size],
+                        file_ids[start : start + batch_size],
+                    ):
+                        telemetry_object = TelemetryObject(
+                            filename=os.path.basename(path), filepath=path
+                        )
+                        telemetry_object.openai_file_id = file_id
+                        telemetry_objects.append(telemetry_object)
+
+                    start_time = time.time()
+                    ai.get_n_analyses_from_openai(telemetry_objects)
+                    batch_seconds.append(time.time() - start_time)
+                    analyzed += sum(1 for obj in telemetry_objects if obj.analysis_results)
+
+                rows.append(
+                    {
+                        "backend": backend,
+                        "batches": len(batch_seconds),
+                        "frames_analyzed": analyzed,
+                        "mean_seconds": sum(batch_seconds) / max(len(batch_seconds), 1),
+                        "max_seconds": max(batch_seconds, default=0.0),
+                    }
+                )
+        finally:
+            ai.analysis_backend, ai.analysis_cache = original_backend, original_cache
+            ai.delete_files(file_ids)
+
+    print(f"{'backend':>11} {'batches':>8} {'analyzed':>9} {'mean_s':>8} {'max_s':>8}")
+    for row in rows:
+        print(
+            f"{row['backend']:>11} {row['batches']:>8} {row['frames_analyzed']:>9} "
+            f"{row['mean_seconds']:>8.2f} {row['max_seconds']:>8.2f}"
+        )
+    return rows
+
+
+def _replay_batch(observations_by_size, size, rng) -> dict:
+    """A recorded batch of ``size`` frames, scaled from the nearest recorded size if needed."""
+    nearest = min(observations_by_size, key=lambda recorded: abs(recorded - size))
+    observation = rng.choice(observations_by_size[nearest])
+    scale = size / nearest
+    return {
+        "seconds": observation["seconds"] * scale,
+        "total_tokens": int(observation["total_tokens"] * scale),
+        "matched": min(size, round(observation["matched"] * scale)),
+    }
+
+
+def benchmark_batch_sizing(
+    video_path,
+    frame_rate=0.5,
+    fixed_sizes=(3, 6, 9, 12),
+    concurrency=4,
+    observations_file=BATCH_OBSERVATIONS_FILE,
+    sizer_name="batch",
+    seed=0,
+) -> list:
+    """
+    Compare fixed batch sizes with the adaptive sizer by replaying recorded batches.
+
+    Uses the per-batch latency, tokens and match counts that ``AdaptiveBatchSizer`` appends
+    to ``observations_file`` during real runs, so it makes no API calls. Batches of a size
+    that was never recorded are scaled from the nearest recorded size.
+
+    Args:
+        video_path (str): Video whose length (at ``frame_rate``) sets the frame count.
+        frame_rate (float): Sampling rate in frames per second.
+        fixed_sizes (tuple): Fixed batch sizes to compare against.
+        concurrency (int): Batches in flight at once, for the wall-time estimate.
+        observations_file (str): Recorded batches (JSONL).
+        sizer_name (str): Only replay batches recorded by this sizer.
+        seed (int): Seed for picking recorded batches.
+
+    Returns:
+        list[dict]: One row per policy.
+    """
+    observations_by_size = {}
+    for observation in load_observations(observations_file, sizer_name):
+        observations_by_size.setdefault(observation["size"], []).append(observation)
+    if not observations_by_size:
+        print(f"No recorded batches in {observations_file}; run the pipeline first.")
+        return []
+
+    duration = FrameSampler().probe_video(video_path)["duration"]
+    frame_count = max(1, int(duration * frame_rate))
+    policies = [(f"fixed {size}", size) for size in fixed_sizes] + [("adaptive", None)]
+    rows = []
+
+    for policy_name, fixed_size in policies:
+        rng = random.Random(seed)
+        sizer = AdaptiveBatchSizer(observations_file=None, name=policy_name)
+        remaining = frame_count
+        batch_seconds = total_tokens = matched = batches = 0
+        while remaining > 0:
+            size = min(remaining, fixed_size or sizer.next_size())
+            result = _replay_batch(observations_by_size, size, rng)
+            sizer.record(size, result["seconds"], result["total_tokens"], result["matched"])
+            batch_seconds += result["seconds"]
+            total_tokens += result["total_tokens"]
+            matched += result["matched"]
+            batches += 1
+            remaining -= size
+
+        rows.append(
+            {
+                "policy": policy_name,
+                "batches": batches,
+                "wall_seconds": batch_seconds / concurrency,
+                "tokens_per_frame": total_tokens / frame_count,
+                "frames_missed": frame_count - matched,
+                "final_size": fixed_size or sizer.next_size(),
+            }
+        )
+
+    print(f"Replaying {frame_count} frames from {sum(map(len, observations_by_size.values()))} recorded batches")
+    print(
+        f"{'policy':>9} {'batches':>8} {'wall_s':>8} {'tok/frame':>10} {'missed':>7} {'size':>5}"
+    )
+    for row in rows:
+        print(
+            f"{row['policy']:>9} {row['batches']:>8} {row['wall_seconds']:>8.1f} "
+            f"{row['tokens_per_frame']:>10.0f} {row['frames_missed']:>7} {row['final_size']:>5}"
+        )
+    return rows
+
+
+BENCHMARKS = {
+    "sampling": benchmark_frame_sampling,
+    "profiles": benchmark_ai_input_profiles,
+    "backends": benchmark_analysis_backends,
+    "batching": benchmark_batch_sizing,
+}
+# Makes real, billed OpenAI requests, so it only runs when named explicitly
+BILLED_BENCHMARKS = {"backends"}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(f"Usage: python benchmarks.py <video_path> [{'|'.join(BENCHMARKS)}]")
+        sys.exit(1)
+    selected = sys.argv[2:] or [
+        name for name in BENCHMARKS if name not in BILLED_BENCHMARKS
+    ]
+    for benchmark_name in selected:
+        BENCHMARKS[benchmark_name](sys.argv[1])
@@ -306,6 +306,7 @@ class Box:
         telemetry_objects: list = None,
         greenway_mode=False,
         video_path: str = None,
+        archive_in_memory_frames=True,
     ):
         telemetry_objects = telemetry_objects or []
         source_video_base = os.path.splitext(os.path.basename(video_path))[0]
@@ -388,13 +389,25 @@ class Box:
 
         # Bundle frames into per-video ZIPs and upload
         grouped = self.group_telem_objects_by_video(telemetry_objects)
+        # Streamed frames live only in memory; archive those bytes directly unless
+        # full-resolution copies were written to source_normals_folder instead
+        in_memory_frames = {
+            obj.filename: obj.image_bytes
+            for obj in telemetry_objects
+            if archive_in_memory_frames and getattr(obj, "image_bytes", None) is not None
+        }
         zip_paths = []
         for base, items in grouped.items():
             # extract file paths
             fps = [item["filename"] for item in items]
             video_id = re.search(f"([^/]+)(?=\.)", base).group(1)
             zip_name = f"{video_id}_{timestamp}"
-            zip_path = self.create_zip_from_group(group_name=zip_name, file_list=fps)
+            zip_path = self.create_zip_from_group(
+                group_name=zip_name,
+                file_list=fps,
+                in_memory_frames=in_memory_frames,
+                frames_folder=source_normals_folder,
+            )
             zip_paths.append(zip_path)
         # Upload all ZIP archives
         await self.upload_zip_to_box(zip_paths, destination_folder_id)
@@ -726,7 +739,12 @@ class Box:
         return dict(grouped_objects)
 
     def create_zip_from_group(
-        self, group_name: str, file_list: list, output_dir: str = "zipped_files"
+        self,
+        group_name: str,
+        file_list: list,
+        output_dir: str = "zipped_files",
+        in_memory_frames: dict = None,
+        frames_folder: str = "frames",
     ) -> str:
         """
         Creates a zip file from a list of file paths for a specific group.
@@ -735,6 +753,9 @@ class Box:
             group_name (str): The name of the group to create a zip file for.
             file_list (list): A list of file paths to include in the zip file.
             output_dir (str): The directory to save the zip file in. Defaults to 'zipped_files'.
+            in_memory_frames (dict): Optional filename -> JPEG bytes for streamed frames,
+                written straight into the archive instead of being read from 'frames/'.
+            frames_folder (str): Folder the frame files were extracted to. Defaults to 'frames'.
 
         Returns:
             str: The path to the created zip file.
@@ -754,9 +775,13 @@ class Box:
         zip_file_path = os.path.join(output_dir, f"{group_name}.zip")
 
         with zipfile.ZipFile(zip_file_path, "w", zipfile.ZIP_DEFLATED) as zipf:
+            in_memory_frames = in_memory_frames or {}
             for file_path in file_list:
-                full_path = os.path.join("frames", file_path)
-                if os.path.exists(full_path):
+                full_path = os.path.join(frames_folder, file_path)
+                frame_bytes = in_memory_frames.get(os.path.basename(file_path))
+                if frame_bytes is not None:
+                    zipf.writestr(os.path.basename(file_path), frame_bytes)
+                elif os.path.exists(full_path):
                     zipf.write(full_path, arcname=os.path.basename(file_path))
                 else:
                     print(f"File {full_path} does not exist. Skipping.")
@@ -0,0 +1,158 @@
+# frame_dedup.py
+"""
+Keeps near-duplicate frames out of AI analysis.
+
+Trucks idling at a bin produce dozens of frames of the same curb. A frame is redundant when
+the truck has not moved far from the last kept frame (or GPS reports it as stopped) and the
+image still looks like that frame. The image check keeps frames where the scene changed
+without moving, e.g. turning in place, and is the only signal for frames without a GPS fix.
+"""
+
+import io
+from PIL import Image
+from logging_config import logger
+from geo_index import haversine_m, has_fix
+
+
+def dhash(image_bytes: bytes, hash_size: int = 8) -> int:
+    """
+    Difference hash of a JPEG: compares adjacent pixels of a tiny grayscale thumbnail.
+
+    ``Image.draft`` lets the JPEG decoder downscale while decoding, so this costs a fraction
+    of a full decode.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.draft("L", (hash_size * 8, hash_size * 8))
+        pixels = list(
+            image.convert("L")
+            .resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+            .getdata()
+        )
+
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    return bin(hash_a ^ hash_b).count("1")
+
+
+class FrameDeduplicator:
+    """
+    Keeps frames that add coverage and folds the rest into the last kept frame.
+
+    Every kept frame gets ``represents_frames``: itself plus the dropped frames after it.
+    Dropped frames get ``duplicate_of`` (the kept frame) and ``represents_frames = 0``; they
+    stay in the dataset and archive but are not uploaded or analyzed.
+
+    Args:
+        min_distance_m (float): Distance the truck must travel before a similar-looking
+            frame is kept again.
+        stopped_speed_mps (float): GPS speed below which the truck counts as stopped.
+        max_hamming (int): dHash bit difference (out of 64) still treated as the same view.
+        max_dropped (int): Keep a frame anyway after this many consecutive drops, so a
+            long stop still gets an occasional look.
+    """
+
+    def __init__(
+        self, min_distance_m=3.0, stopped_speed_mps=0.5, max_hamming=6, max_dropped=120
+    ):
+        self.min_distance_m = min_distance_m
+        self.stopped_speed_mps = stopped_speed_mps
+        self.max_hamming = max_hamming
+        self.max_dropped = max_dropped
+        self.reset()
+
+    def reset(self):
+        """Forget the last kept frame; call between videos."""
+        self._last_kept = None
+        self._last_kept_hash = None
+        self._dropped_in_row = 0
+        self.kept = 0
+        self.dropped = 0
+
+    def _frame_hash(self, telemetry_object) -> int:
+        return dhash(telemetry_object.read_image_bytes())
+
+    def _is_stationary(self, telemetry_object) -> bool:
+        previous = self._last_kept
+        if not (
+            has_fix(previous.lat, previous.lon)
+            and has_fix(telemetry_object.lat, telemetry_object.lon)
+        ):
+            return True  # No GPS to go on; let the image decide
+        speed = getattr(telemetry_object, "speed", None)
+        if speed is not None and speed < self.stopped_speed_mps:
+            return True
+        distance = haversine_m(
+            previous.lat, previous.lon, telemetry_object.lat, telemetry_object.lon
+        )
+        return distance < self.min_distance_m
+
+    def keep(self, telemetry_object) -> bool:
+        """
+        Decide whether a frame is worth analyzing, in frame order.
+
+        Args:
+            telemetry_object (TelemetryObject): Next frame, with GPS already joined.
+
+        Returns:
+            bool: True to keep it; False if it was folded into the last kept frame.
+        """
+        if self._last_kept is not None and self._dropped_in_row < self.max_dropped:
+            if self._is_stationary(telemetry_object):
+                try:
+                    if self._last_kept_hash is None:
+                        self._last_kept_hash = self._frame_hash(self._last_kept)
+                    frame_hash = self._frame_hash(telemetry_object)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Could not hash {telemetry_object.filename}: {e}")
+                    frame_hash = None
+
+                if (
+                    frame_hash is not None
+                    and hamming_distance(frame_hash, self._last_kept_hash)
+                    <= self.max_hamming
+                ):
+                    self._last_kept.represents_frames += 1
+                    telemetry_object.represents_frames = 0
+                    telemetry_object.duplicate_of = self._last_kept
+                    telemetry_object.release_image_bytes()  # Never uploaded
+                    self._dropped_in_row += 1
+                    self.dropped += 1
+                    return False
+                self._last_kept_hash = frame_hash
+            else:
+                self._last_kept_hash = None  # Hashed lazily only if the next frame is stationary
+        else:
+            self._last_kept_hash = None
+
+        telemetry_object.represents_frames = 1
+        telemetry_object.duplicate_of = None
+        self._last_kept = telemetry_object
+        self._dropped_in_row = 0
+        self.kept += 1
+        return True
+
+    def filter(self, telemetry_objects):
+        """
+        Yield only the frames worth analyzing; works on lists and streamed generators.
+
+        Args:
+            telemetry_objects (iterable): Frames in order, with GPS already joined.
+
+        Yields:
+            TelemetryObject: Kept frames.
+        """
+        self.reset()
+        for telemetry_object in telemetry_objects:
+            if self.keep(telemetry_object):
+                yield telemetry_object
+        logger.info(
+            f"Frame dedup kept {self.kept} of {self.kept + self.dropped} frames."
+        )
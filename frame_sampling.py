@@ -0,0 +1,443 @@
+# frame_sampling.py
+import os
+import json
+import subprocess
+from fractions import Fraction
+from concurrent.futures import ThreadPoolExecutor
+from logging_config import logger
+
+
+SAMPLING_STRATEGIES = ("stride", "fps", "seek")
+
+
+class AIInputProfile:
+    """
+    How frames are sized for the vision model, applied inside the FFmpeg filter graph.
+
+    The model downsamples large images anyway, so sending a smaller, more compressed frame
+    cuts upload bytes and image tokens without changing what it sees much.
+
+    Args:
+        long_edge (int): Downscale so the longer side is at most this many pixels
+            (None keeps the cropped resolution).
+        quality (int): FFmpeg ``-q:v`` JPEG quality, 2 (best) to 31.
+        crop_top, crop_bottom, crop_left, crop_right (int): Pixels trimmed from each edge
+            before scaling.
+        archive_full_resolution (bool): Also write a cropped, unscaled copy of each frame
+            for long-term storage.
+    """
+
+    ARCHIVE_QUALITY = 2
+
+    def __init__(
+        self,
+        long_edge=None,
+        quality=2,
+        crop_top=360,
+        crop_bottom=0,
+        crop_left=0,
+        crop_right=0,
+        archive_full_resolution=False,
+    ):
+        self.long_edge = long_edge
+        self.quality = quality
+        self.crop_top = crop_top
+        self.crop_bottom = crop_bottom
+        self.crop_left = crop_left
+        self.crop_right = crop_right
+        self.archive_full_resolution = archive_full_resolution
+
+    def crop_size(self, width, height) -> tuple:
+        crop_width = width - self.crop_left - self.crop_right
+        crop_height = height - self.crop_top - self.crop_bottom
+        if crop_width <= 0 or crop_height <= 0:
+            raise ValueError(
+                f"Invalid crop size: {crop_width}x{crop_height}. Ensure the crop fits inside the {width}x{height} video."
+            )
+        return crop_width, crop_height
+
+    def output_size(self, width, height) -> tuple:
+        """Size of the AI frame for a ``width`` x ``height`` source (even dimensions for MJPEG)."""
+        crop_width, crop_height = self.crop_size(width, height)
+        if not self.long_edge or max(crop_width, crop_height) <= self.long_edge:
+            return crop_width, crop_height
+        scale = self.long_edge / max(crop_width, crop_height)
+        return (
+            max(2, round(crop_width * scale / 2) * 2),
+            max(2, round(crop_height * scale / 2) * 2),
+        )
+
+    def crop_filter(self, width, height) -> str:
+        crop_width, crop_height = self.crop_size(width, height)
+        return f"crop={crop_width}:{crop_height}:{self.crop_left}:{self.crop_top}"
+
+    def scale_filter(self, width, height) -> str:
+        """Scale step for the AI output, or None when the crop is already small enough."""
+        if self.output_size(width, height) == self.crop_size(width, height):
+            return None
+        output_width, output_height = self.output_size(width, height)
+        return f"scale={output_width}:{output_height}:flags=area"
+
+
+AI_INPUT_PROFILES = {
+    "full": AIInputProfile(),  # Cropped source resolution, as uploaded before profiles existed
+    "balanced": AIInputProfile(long_edge=1536, quality=4),
+    "compact": AIInputProfile(long_edge=1024, quality=5),
+}
+
+
+class FrameSampler:
+    """
+    Picks frames out of a video with FFmpeg without building a per-frame select expression.
+
+    Strategies:
+        stride: ``select='not(mod(n,K))'`` keeps every K-th decoded frame (same frames as the
+            old ``eq(n,idx)`` chain, evaluated in constant time per frame).
+        fps: time-based ``fps=frame_rate`` filter, lets FFmpeg pick the frame nearest each tick.
+        seek: one input-seek (``-ss`` before ``-i``) per sample window, so FFmpeg jumps to the
+            nearest keyframe instead of decoding the whole clip. Best for very sparse sampling.
+    """
+
+    FFMPEG_PATH = "/opt/homebrew/bin/ffmpeg"
+    FFPROBE_PATH = "/opt/homebrew/bin/ffprobe"
+
+    def __init__(self, ffmpeg_path=None, ffprobe_path=None, seek_workers=4):
+        self.ffmpeg_path = ffmpeg_path or FrameSampler.FFMPEG_PATH
+        self.ffprobe_path = ffprobe_path or FrameSampler.FFPROBE_PATH
+        self.seek_workers = seek_workers
+
+    def probe_video(self, video_path) -> dict:
+        """
+        Read the first video stream's dimensions, frame count, frame rate and duration.
+
+        Args:
+            video_path (str): Path to the video file.
+
+        Returns:
+            dict: ``width``, ``height``, ``nb_frames``, ``fps`` (float) and ``duration`` (seconds).
+        """
+        command = [
+            self.ffprobe_path,
+            "-v",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-show_entries",
+            "stream=width,height,nb_frames,avg_frame_rate,duration",
+            "-of",
+            "json",
+            video_path,
+        ]
+        result = subprocess.run(command, capture_output=True, text=True, check=True)
+        stream = json.loads(result.stdout)["streams"][0]
+
+        # Handles fractional frame rates like "30000/1001" without eval()
+        fps = float(Fraction(stream["avg_frame_rate"]))
+        duration = float(stream.get("duration") or 0)
+        nb_frames = stream.get("nb_frames")
+        total_frames = int(nb_frames) if nb_frames else int(duration * fps)
+
+        return {
+            "width": int(stream["width"]),
+            "height": int(stream["height"]),
+            "nb_frames": total_frames,
+            "fps": fps,
+            "duration": duration or total_frames / fps,
+        }
+
+    @staticmethod
+    def output_args(
+        profile: AIInputProfile,
+        width,
+        height,
+        output_target,
+        archive_target=None,
+        pre_filter=None,
+        output_options=(),
+        ai_output_options=(),
+    ) -> list:
+        """
+        Build the ``-filter_complex``/``-map`` arguments that apply ``profile`` to the video.
+
+        The AI frame is cropped and scaled to ``output_target``; when ``archive_target`` is
+        given the cropped frame is split off before scaling and written there unscaled.
+
+        Args:
+            profile (AIInputProfile): Crop, scale and quality settings.
+            width (int): Source video width.
+            height (int): Source video height.
+            output_target (str): Output for AI frames (image pattern, file or ``pipe:1``).
+            archive_target (str): Optional output for full-resolution frames.
+            pre_filter (str): Filters to run before cropping, e.g. a ``select``.
+            output_options (tuple): FFmpeg options repeated for every output.
+            ai_output_options (tuple): FFmpeg options for the AI output only.
+
+        Returns:
+            list: FFmpeg arguments to place after the inputs.
+        """
+        chain = ",".join(
+            step for step in (pre_filter, profile.crop_filter(width, height)) if step
+        )
+        scale = profile.scale_filter(width, height) or "null"
+        ai_output = [
+            "-map",
+            "[ai]",
+            *output_options,
+            *ai_output_options,
+            "-q:v",
+            str(profile.quality),
+            output_target,
+        ]
+
+        if not archive_target:
+            return ["-filter_complex", f"[0:v:0]{chain},{scale}[ai]", *ai_output]
+
+        return [
+            "-filter_complex",
+            f"[0:v:0]{chain},split=2[to_ai][archive];[to_ai]{scale}[ai]",
+            *ai_output,
+            "-map",
+            "[archive]",
+            *output_options,
+            "-q:v",
+            str(AIInputProfile.ARCHIVE_QUALITY),
+            archive_target,
+        ]
+
+    def sample_frames(
+        self,
+        video_path,
+        frame_rate=1,
+        output_folder="frames",
+        max_frames=None,
+        crop_top=360,
+        strategy="stride",
+        profile: AIInputProfile = None,
+        archive_folder=None,
+    ) -> list:
+        """
+        Extract frames at ``frame_rate`` frames per second using the chosen sampling strategy.
+
+        Args:
+            video_path (str): Path to the video file.
+            frame_rate (float): Frames per second to extract.
+            output_folder (str): Directory to save extracted frames.
+            max_frames (int): Maximum number of frames to extract.
+            crop_top (int): Number of pixels to crop from the top (used when no profile is given).
+            strategy (str): One of ``SAMPLING_STRATEGIES``.
+            profile (AIInputProfile): Crop/scale/quality for the extracted frames.
+            archive_folder (str): Where full-resolution copies go when the profile keeps them.
+
+        Returns:
+            list[tuple]: List of tuples containing frame file paths and timestamps (seconds).
+        """
+        if strategy not in SAMPLING_STRATEGIES:
+            raise ValueError(
+                f"Unknown sampling strategy '{strategy}'. Use one of {SAMPLING_STRATEGIES}."
+            )
+
+        profile = profile or AIInputProfile(crop_top=crop_top)
+        os.makedirs(output_folder, exist_ok=True)
+
+        metadata = self.probe_video(video_path)
+        fps = metadata["fps"]
+        video_basename = os.path.splitext(os.path.basename(video_path))[0]
+        output_pattern = os.path.join(output_folder, f"{video_basename}_%04d.jpg")
+        archive_pattern = None
+        if profile.archive_full_resolution and archive_folder:
+            os.makedirs(archive_folder, exist_ok=True)
+            archive_pattern = os.path.join(archive_folder, f"{video_basename}_%04d.jpg")
+
+        if strategy == "fps":
+            num_frames = int(metadata["duration"] * frame_rate)
+            if max_frames:
+                num_frames = min(num_frames, max_frames)
+            timestamps = [i / frame_rate for i in range(num_frames)]
+            video_filter = f"fps={frame_rate}:round=near"
+        else:
+            frame_interval = max(1, round(fps / frame_rate))
+            target_indices = list(range(0, metadata["nb_frames"], frame_interval))
+            if max_frames:
+                target_indices = target_indices[:max_frames]
+            timestamps = [index / fps for index in target_indices]
+            video_filter = (
+                f"select='not(mod(n\\,{frame_interval}))',setpts=N/FRAME_RATE/TB"
+            )
+
+        if strategy == "seek":
+            self._extract_by_seeking(
+                video_path, timestamps, metadata, profile, output_pattern, archive_pattern
+            )
+        else:
+            ffmpeg_command = [
+                self.ffmpeg_path,
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-i",
+                video_path,
+                "-an",  # Disable audio processing
+                *self.output_args(
+                    profile,
+                    metadata["width"],
+                    metadata["height"],
+                    output_pattern,
+                    archive_target=archive_pattern,
+                    pre_filter=video_filter,
+                    output_options=(
+                        "-vsync",
+                        "vfr",  # Variable frame rate
+                        "-frames:v",
+                        str(len(timestamps)),  # Stop after extracting the desired frames
+                    ),
+                ),
+            ]
+            self._run_ffmpeg(ffmpeg_command)
+
+        # FFmpeg can write fewer frames than planned (rounding at the end of the clip, a
+        # seek past the last keyframe), so only return the files that exist
+        extracted_frames = [
+            (output_pattern % (i + 1), timestamps[i])
+            for i in range(len(timestamps))
+            if os.path.exists(output_pattern % (i + 1))
+        ]
+        if len(extracted_frames) < len(timestamps):
+            logger.warning(
+                f"FFmpeg wrote {len(extracted_frames)} of {len(timestamps)} planned frames for {video_path}."
+            )
+        logger.info(
+            f"Extracted {len(extracted_frames)} frames to {output_folder} ({strategy} sampling)."
+        )
+        return extracted_frames
+
+    def stream_frames(
+        self,
+        video_path,
+        crop_top=0,
+        quality=2,
+        chunk_size=1 << 20,
+        profile: AIInputProfile = None,
+        archive_folder=None,
+    ):
+        """
+        Decode every frame and yield it as in-memory JPEG bytes, without writing to disk.
+
+        FFmpeg encodes MJPEG to stdout (image2pipe); the byte stream is split on JPEG
+        start/end-of-image markers so each frame is yielded as soon as it is encoded.
+
+        Args:
+            video_path (str): Path to the video file.
+            crop_top (int): Number of pixels to crop from the top (used when no profile is given).
+            quality (int): FFmpeg ``-q:v`` JPEG quality (used when no profile is given).
+            chunk_size (int): Bytes read from the pipe per read call.
+            profile (AIInputProfile): Crop/scale/quality for the streamed frames.
+            archive_folder (str): Where full-resolution copies are written (as
+                ``frame_%04d.jpg``) when the profile keeps them.
+
+        Yields:
+            tuple: ``(frame_index, jpeg_bytes)`` in decode order.
+        """
+        profile = profile or AIInputProfile(crop_top=crop_top, quality=quality)
+        metadata = self.probe_video(video_path)
+        archive_pattern = None
+        if profile.archive_full_resolution and archive_folder:
+            os.makedirs(archive_folder, exist_ok=True)
+            archive_pattern = os.path.join(archive_folder, "frame_%04d.jpg")
+
+        ffmpeg_command = [
+            self.ffmpeg_path,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-i",
+            video_path,
+            "-an",
+            *self.output_args(
+                profile,
+                metadata["width"],
+                metadata["height"],
+                "pipe:1",
+                archive_target=archive_pattern,
+                output_options=("-vsync", "0"),  # Every frame
+                ai_output_options=("-f", "image2pipe", "-vcodec", "mjpeg"),
+            ),
+        ]
+        process = subprocess.Popen(
+            ffmpeg_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+
+        buffer = bytearray()
+        frame_index = 0
+        try:
+            while True:
+                chunk = process.stdout.read(chunk_size)
+                if not chunk:
+                    break
+                buffer.extend(chunk)
+
+                # Split complete JPEGs out of the buffer (SOI = FFD8, EOI = FFD9)
+                while True:
+                    start = buffer.find(b"\xff\xd8")
+                    if start < 0:
+                        break
+                    end = buffer.find(b"\xff\xd9", start + 2)
+                    if end < 0:
+                        if start > 0:
+                            del buffer[:start]
+                        break
+                    yield frame_index, bytes(buffer[start : end + 2])
+                    frame_index += 1
+                    del buffer[: end + 2]
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read().decode(errors="replace")
+            process.stderr.close()
+            return_code = process.wait()
+
+        if return_code != 0:
+            logger.error(f"FFmpeg failed with error: {stderr}")
+            raise RuntimeError("Failed to stream frames using FFmpeg.")
+
+        logger.info(f"Streamed {frame_index} frames from {video_path}.")
+
+    def _extract_by_seeking(
+        self, video_path, timestamps, metadata, profile, output_pattern, archive_pattern
+    ):
+        """Grab one frame per timestamp with a fast input seek, a few FFmpeg processes at a time."""
+
+        def _extract_one(indexed_timestamp):
+            i, timestamp = indexed_timestamp
+            self._run_ffmpeg(
+                [
+                    self.ffmpeg_path,
+                    "-hide_banner",
+                    "-loglevel",
+                    "error",
+                    "-y",
+                    "-ss",
+                    f"{timestamp:.3f}",
+                    "-i",
+                    video_path,
+                    "-an",
+                    *self.output_args(
+                        profile,
+                        metadata["width"],
+                        metadata["height"],
+                        output_pattern % (i + 1),
+                        archive_target=(
+                            archive_pattern % (i + 1) if archive_pattern else None
+                        ),
+                        output_options=("-frames:v", "1"),
+                    ),
+                ]
+            )
+
+        with ThreadPoolExecutor(max_workers=self.seek_workers) as executor:
+            list(executor.map(_extract_one, enumerate(timestamps)))
+
+    def _run_ffmpeg(self, ffmpeg_command):
+        try:
+            subprocess.run(ffmpeg_command, check=True)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"FFmpeg failed with error: {e}")
+            raise RuntimeError("Failed to extract frames using FFmpeg.")
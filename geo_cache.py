@@ -0,0 +1,190 @@
+# geo_cache.py
+"""
+Disk-backed cache of geospatial lookups, keyed by geohash cell.
+
+Trucks drive the same routes every night, so road-ownership lookups keep landing on the
+same spots. Results are stored per ``kind`` of lookup and geohash cell (about 4.8 m square
+at the default precision of 9) and expire after ``ttl_days``. Hits and misses are counted
+per kind so the hit rate can be reported.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from logging_config import logger
+
+GEO_CACHE_FILE = "cache/geo_cache.sqlite"
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat: float, lon: float, precision: int = 9) -> str:
+    """Standard base32 geohash of a point."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # geohash bits alternate, starting with longitude
+    while len(chars) < precision:
+        value, value_range = (lon, lon_range) if even else (lat, lat_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+class GeohashCache:
+    """
+    Lookup results in SQLite, one row per kind and geohash cell.
+
+    Args:
+        db_path (str): SQLite file.
+        precision (int): Geohash length; 9 is ~4.8 m cells, 8 is ~38 x 19 m.
+        ttl_days (float): Age after which an entry is ignored and looked up again.
+    """
+
+    def __init__(self, db_path=GEO_CACHE_FILE, precision=9, ttl_days=30):
+        self.db_path = db_path
+        self.precision = precision
+        self.ttl_days = ttl_days
+        self.hits = Counter()
+        self.misses = Counter()
+        self._lock = threading.Lock()
+
+        db_folder = os.path.dirname(db_path)
+        if db_folder:
+            os.makedirs(db_folder, exist_ok=True)
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS geo_cache (
+                    kind TEXT NOT NULL,
+                    geohash TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    retrieved_at TEXT NOT NULL,
+                    PRIMARY KEY (kind, geohash)
+                )
+                """
+            )
+
+    def key(self, lat, lon) -> str:
+        return geohash(float(lat), float(lon), self.precision)
+
+    def get(self, kind: str, lat, lon):
+        """
+        Cached value for the cell containing the point, or None if missing or expired.
+
+        Args:
+            kind (str): Lookup type, e.g. "road_owner".
+            lat (float): Latitude.
+            lon (float): Longitude.
+        """
+        return self.get_many(kind, [(lat, lon)])[0]
+
+    def get_many(self, kind: str, points) -> list:
+        """Cached value (or None) for each (lat, lon) in ``points``, in order."""
+        keys = [self.key(lat, lon) for lat, lon in points]
+        if not keys:
+            return []
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.ttl_days)).isoformat()
+        found = {}
+        unique_keys = list(set(keys))
+        with self._lock:
+            for start in range(0, len(unique_keys), 500):  # stay under SQLite's variable limit
+                chunk = unique_keys[start : start + 500]
+                rows = self._connection.execute(
+                    f"SELECT geohash, value FROM geo_cache WHERE kind = ? AND retrieved_at >= ? AND geohash IN ({','.join('?' * len(chunk))})",
+                    (kind, cutoff, *chunk),
+                ).fetchall()
+                found.update((cell, json.loads(value)) for cell, value in rows)
+            values = [found.get(cell) for cell in keys]
+            hit_count = sum(value is not None for value in values)
+            self.hits[kind] += hit_count
+            self.misses[kind] += len(values) - hit_count
+        return values
+
+    def put(self, kind: str, lat, lon, value):
+        """Store the lookup result for the cell containing the point."""
+        self.put_many(kind, [(lat, lon)], [value])
+
+    def put_many(self, kind: str, points, values):
+        now = datetime.now(timezone.utc).isoformat()
+        rows = [
+            (kind, self.key(lat, lon), json.dumps(value), now)
+            for (lat, lon), value in zip(points, values)
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO geo_cache (kind, geohash, value, retrieved_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    def clear(self, kind: str):
+        """Drop every entry of one kind, e.g. after its source data was refreshed."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM geo_cache WHERE kind = ?", (kind,))
+
+    def purge_expired(self) -> int:
+        """Delete expired entries. Returns the number removed."""
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.ttl_days)).isoformat()
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "DELETE FROM geo_cache WHERE retrieved_at < ?", (cutoff,)
+            )
+        if cursor.rowcount:
+            logger.info(f"Purged {cursor.rowcount} expired geo cache entries.")
+        return cursor.rowcount
+
+    def counters(self) -> tuple:
+        """Copy of the (hits, misses) counters, to pass to ``stats(since=...)`` later."""
+        with self._lock:
+            return Counter(self.hits), Counter(self.misses)
+
+    def stats(self, since: tuple = None) -> dict:
+        """
+        Hit counts and rates since startup, or since a ``counters()`` snapshot.
+
+        Args:
+            since (tuple): (hits, misses) from ``counters()``; None for the whole process.
+
+        Returns:
+            dict: ``hits``, ``misses`` and ``hit_rate`` overall, plus the same per kind
+                under ``kinds``.
+        """
+        hits, misses = self.counters()
+        if since is not None:
+            hits.subtract(since[0])
+            misses.subtract(since[1])
+        kinds = {
+            kind: _rates(hits[kind], misses[kind])
+            for kind in sorted(set(hits) | set(misses))
+        }
+        overall = _rates(sum(hits.values()), sum(misses.values()))
+        return {**overall, "kinds": kinds}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def _rates(hits, misses) -> dict:
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups, 3) if lookups else None,
+    }
@@ -0,0 +1,154 @@
+# geo_index.py
+"""
+Small geodesy helpers shared by the frame, pothole and location lookups.
+"""
+
+import math
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lat1, lon1, lat2, lon2) -> float:
+    """Great-circle distance in meters between two WGS84 points."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def has_fix(lat, lon) -> bool:
+    """False for missing coordinates and the 0,0 placeholder used when no track exists."""
+    return lat is not None and lon is not None and not (lat == 0 and lon == 0)
+
+
+class GridIndex:
+    """
+    Spatial hash of points on a grid of roughly ``cell_size_m`` square cells.
+
+    Rows are bands of latitude; within a row, the longitude step is widened by
+    1/cos(latitude) so cells stay about square away from the equator. A radius query only
+    has to look at the handful of cells around the point.
+    """
+
+    def __init__(self, cell_size_m: float):
+        self.cell_size_m = cell_size_m
+        self._lat_step = math.degrees(cell_size_m / EARTH_RADIUS_M)
+        self._cells = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _lon_step(self, row: int) -> float:
+        row_latitude = math.radians((row + 0.5) * self._lat_step)
+        return self._lat_step / max(math.cos(row_latitude), 1e-6)
+
+    def _cell(self, lat, lon) -> tuple:
+        row = math.floor(lat / self._lat_step)
+        return row, math.floor(lon / self._lon_step(row))
+
+    def insert(self, lat, lon, item):
+        self._cells.setdefault(self._cell(lat, lon), []).append((lat, lon, item))
+        self._size += 1
+
+    def remove(self, lat, lon, item) -> bool:
+        entries = self._cells.get(self._cell(lat, lon), [])
+        for index, entry in enumerate(entries):
+            if entry[2] is item:
+                del entries[index]
+                self._size -= 1
+                return True
+        return False
+
+    def within(self, lat, lon, radius_m: float) -> list:
+        """
+        Items within ``radius_m`` of a point, nearest first.
+
+        Returns:
+            list[tuple]: ``(distance_m, item)`` pairs.
+        """
+        span = max(1, math.ceil(radius_m / self.cell_size_m))
+        center_row = math.floor(lat / self._lat_step)
+        matches = []
+        for row in range(center_row - span, center_row + span + 1):
+            center_col = math.floor(lon / self._lon_step(row))
+            for col in range(center_col - span, center_col + span + 1):
+                for item_lat, item_lon, item in self._cells.get((row, col), ()):
+                    distance = haversine_m(lat, lon, item_lat, item_lon)
+                    if distance <= radius_m:
+                        matches.append((distance, item))
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+    def nearest(self, lat, lon, radius_m: float):
+        """``(distance_m, item)`` of the nearest item within ``radius_m``, or None."""
+        matches = self.within(lat, lon, radius_m)
+        return matches[0] if matches else None
+
+
+def _unit_vector(lat, lon) -> tuple:
+    phi, lam = math.radians(lat), math.radians(lon)
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+
+class KDTree:
+    """
+    Static KD-tree over WGS84 points for nearest-neighbour queries with no radius limit.
+
+    Points are stored as unit vectors on the sphere, where straight-line (chord) distance
+    ranks points exactly like great-circle distance; results are reported in haversine meters.
+
+    Args:
+        points (list[tuple[float, float]]): (lat, lon) pairs.
+        items (list): Value returned for each point; defaults to its index.
+    """
+
+    def __init__(self, points, items=None):
+        self._points = list(points)
+        self._items = list(items) if items is not None else list(range(len(self._points)))
+        self._vectors = [_unit_vector(lat, lon) for lat, lon in self._points]
+        self._root = self._build(list(range(len(self._points))), 0)
+
+    def __len__(self):
+        return len(self._points)
+
+    def _build(self, indices, depth):
+        if not indices:
+            return None
+        axis = depth % 3
+        indices.sort(key=lambda index: self._vectors[index][axis])
+        middle = len(indices) // 2
+        return (
+            indices[middle],
+            axis,
+            self._build(indices[:middle], depth + 1),
+            self._build(indices[middle + 1 :], depth + 1),
+        )
+
+    def nearest(self, lat, lon):
+        """``(distance_m, item)`` of the nearest point, or None if the tree is empty."""
+        target = _unit_vector(lat, lon)
+        best_index = None
+        best_squared = math.inf
+        stack = [(self._root, 0.0)]
+        while stack:
+            node, bound_squared = stack.pop()
+            if node is None or bound_squared >= best_squared:
+                continue
+            index, axis, left, right = node
+            vector = self._vectors[index]
+            squared = sum((t - v) ** 2 for t, v in zip(target, vector))
+            if squared < best_squared:
+                best_index, best_squared = index, squared
+            offset = target[axis] - vector[axis]
+            near, far = (left, right) if offset < 0 else (right, left)
+            stack.append((far, offset * offset))  # searched only if still closer than the best
+            stack.append((near, 0.0))
+        if best_index is None:
+            return None
+        item_lat, item_lon = self._points[best_index]
+        return haversine_m(lat, lon, item_lat, item_lon), self._items[best_index]
@@ -1,9 +1,87 @@
+"""
+Road ownership lookups against the Town of Cary roads layer.
+
+"remote" mode sends one multipoint query to the ArcGIS layer per call and matches each
+point to its nearest road locally. "local" mode (the default) answers from an in-memory
+STRtree over a GeoJSON snapshot of the layer, refreshed when it gets older than
+``max_snapshot_age_days`` (or with ``python geospatial.py refresh``).
+
+Coordinates are reprojected locally with pyproj into the layer's spatial reference (NC State
+Plane, wkid 102719, unless the layer metadata says otherwise), so buffers are in real
+distances and no lookup needs the ArcGIS geometry service.
+"""
+
 import os
+import sys
+import json
+import time
+import threading
 import dotenv
-from arcgis.geometry import project
-from arcgis.features import FeatureLayer
-from arcgis.gis import GIS
-from arcgis.geometry.filters import intersects
+import numpy as np
+import shapely
+from pyproj import CRS, Transformer
+from pyproj.exceptions import CRSError
+from shapely.geometry import shape
+from logging_config import logger
+
+ROADS_SNAPSHOT_FILE = "cache/cary_roads.geojson"
+WGS84_WKID = 4326
+DEFAULT_ROADS_WKID = 102719  # NAD83 / North Carolina State Plane (US feet)
+
+_transformers = threading.local()
+
+
+def crs_from_wkid(wkid: int) -> CRS:
+    """CRS for an Esri wkid, which is either an EPSG code or one of Esri's own (e.g. 102719)."""
+    for authority in ("EPSG", "ESRI"):
+        try:
+            return CRS.from_authority(authority, str(wkid))
+        except CRSError:
+            continue
+    raise ValueError(f"Unknown spatial reference wkid {wkid}")
+
+
+def get_transformer(in_wkid: int, out_wkid: int) -> Transformer:
+    """
+    Cached transformer between two wkids (x = lon/easting, y = lat/northing).
+
+    pyproj transformers are not thread-safe, so each thread keeps its own cache.
+    """
+    cache = getattr(_transformers, "cache", None)
+    if cache is None:
+        cache = _transformers.cache = {}
+    key = (in_wkid, out_wkid)
+    if key not in cache:
+        cache[key] = Transformer.from_crs(
+            crs_from_wkid(in_wkid), crs_from_wkid(out_wkid), always_xy=True
+        )
+    return cache[key]
+
+
+def project_points(lats, lons, out_wkid: int, in_wkid: int = WGS84_WKID):
+    """
+    Project arrays of coordinates in one vectorized call.
+
+    Args:
+        lats (array-like): Latitudes (or northings when ``in_wkid`` is projected).
+        lons (array-like): Longitudes (or eastings).
+        out_wkid (int): Target spatial reference.
+        in_wkid (int): Source spatial reference, WGS84 by default.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: x and y in the target spatial reference.
+    """
+    return get_transformer(in_wkid, out_wkid).transform(
+        np.asarray(lons, dtype=float), np.asarray(lats, dtype=float)
+    )
+
+
+def meters_per_unit(wkid: int) -> float:
+    """Length of one coordinate unit of ``wkid`` in meters (degrees approximated at mid-lat)."""
+    crs = crs_from_wkid(wkid)
+    if crs.is_geographic:
+        return 111_000.0
+    return crs.axis_info[0].unit_conversion_factor
 
 
 class RoadOwnerFinder:
@@ -13,46 +91,295 @@ class RoadOwnerFinder:
         gis_url: str = "https://www.arcgis.com",
         roads_url: str = "https://maps.townofcary.org/arcgis/rest/services/Transportation/Transportation/MapServer/19",
         buffer_meters: float = 10.0,
+        mode: str = "local",
+        snapshot_path: str = ROADS_SNAPSHOT_FILE,
+        max_snapshot_age_days: float = 7,
+        dedupe_meters: float = 2.0,
+        cache=None,
     ):
         dotenv.load_dotenv()
-        key = api_key or os.getenv("ARCGIS_API_KEY")
-        self.gis = GIS(gis_url, api_key=key)
-        self.roads_layer = FeatureLayer(roads_url, gis=self.gis)
-        # approximate degrees per meter at mid-lat (~10 m buffer)
-        self._delta_deg = buffer_meters / 111_000
+        self._api_key = api_key or os.getenv("ARCGIS_API_KEY")
+        self.gis_url = gis_url
+        self.roads_url = roads_url
+        self._gis = None
+        self._roads_layer = None
+        self._layer_wkid = None
+        self.buffer_meters = buffer_meters
+        self.dedupe_meters = dedupe_meters  # points closer than this share one lookup
+        self.cache = cache  # optional geo_cache.GeohashCache in front of every lookup
+
+        self.mode = mode
+        self.snapshot_path = snapshot_path
+        self.max_snapshot_age_days = max_snapshot_age_days
+        self._road_tree = None
+        self._roads = []  # {"owner", "segment_id"} per indexed segment
+        self._index_wkid = DEFAULT_ROADS_WKID
+        self._index_buffer = None
+        self._snapshot_mtime = None  # mtime of the snapshot file the index was built from
+        self._snapshot_lock = threading.Lock()
+        self._last_refresh_attempt = 0.0
+        self.refresh_retry_seconds = 3600  # after a failed refresh, keep the old copy this long
+        if self.mode == "local":
+            self.load_snapshot()
+
+    @property
+    def roads_layer(self):
+        """The ArcGIS roads layer; logs in on first use, so local lookups never do."""
+        if self._roads_layer is None:
+            from arcgis.features import FeatureLayer
+            from arcgis.gis import GIS
+
+            self._gis = GIS(self.gis_url, api_key=self._api_key)
+            self._roads_layer = FeatureLayer(self.roads_url, gis=self._gis)
+        return self._roads_layer
+
+    @property
+    def layer_wkid(self) -> int:
+        """Spatial reference of the roads layer, from its metadata (102719 if unavailable)."""
+        if self._layer_wkid is None:
+            try:
+                spatial_reference = self.roads_layer.properties.extent.spatialReference
+                self._layer_wkid = int(
+                    spatial_reference.get("latestWkid") or spatial_reference["wkid"]
+                )
+            except Exception as e:
+                logger.warning(
+                    f"Could not read the roads layer spatial reference ({e}); assuming {DEFAULT_ROADS_WKID}."
+                )
+                self._layer_wkid = DEFAULT_ROADS_WKID
+        return self._layer_wkid
 
     def get_pothole_owner(self, lat: float, lon: float) -> str:
         """Return 'Town', 'State', 'Private' or 'UNKNOWN' for a given point."""
-        road = self._find_nearby_road(lat, lon)
-        return self._get_road_owner(road) if road else "UNKNOWN"
-
-    def _find_nearby_road(self, lat: float, lon: float):
-        # build a small WGS84 box around the point
-        d = self._delta_deg
-        extent = {
-            "xmin": lon - d,
-            "ymin": lat - d,
-            "xmax": lon + d,
-            "ymax": lat + d,
-            "spatialReference": {"wkid": 4326},
-        }
-        # reproject to layer's SR (hard-coded here)
-        projected = project([extent], in_sr=4326, out_sr=102719)[0]
-        geom_filter = intersects(projected, sr=102719)
+        return self.get_owners([(lat, lon)])[0]
+
+    def get_owners(self, points) -> list:
+        """
+        Owners for many points in one pass.
+
+        Points are projected together and deduplicated to ``dedupe_meters`` cells. Local
+        mode answers them all with one vectorized STRtree query; remote mode sends a single
+        multipoint query for the roads within ``buffer_meters`` of any of them and picks
+        each point's nearest road locally. Points already in ``cache`` skip the lookup.
+
+        Args:
+            points (iterable[tuple[float, float]]): (lat, lon) pairs.
+
+        Returns:
+            list[str]: Owner for each point, in order ('UNKNOWN' when no road is near).
+        """
+        return [road["owner"] for road in self.get_roads(points)]
+
+    def get_roads(self, points) -> list:
+        """
+        Nearest road for each point, going through ``cache`` when one is set.
+
+        Returns:
+            list[dict]: ``owner`` and ``segment_id`` (None when no road is near) per point.
+        """
+        points = list(points)
+        if self.mode == "local":
+            self._current_index()  # a newer snapshot also invalidates cached owners
+        if self.cache is None:
+            return self._lookup_roads(points)
+        roads = self.cache.get_many("road_owner", points)
+        missing = [i for i, road in enumerate(roads) if road is None]
+        if missing:
+            missing_points = [points[i] for i in missing]
+            found = self._lookup_roads(missing_points)
+            self.cache.put_many("road_owner", missing_points, found)
+            for i, road in zip(missing, found):
+                roads[i] = road
+        return roads
+
+    def _lookup_roads(self, points) -> list:
+        if not points:
+            return []
+        lats, lons = zip(*points)
+        if self.mode == "local":
+            road_tree, roads, wkid, max_distance = self._current_index()
+        else:
+            wkid = self.layer_wkid
+        xs, ys = project_points(lats, lons, wkid)
+
+        cell = self.dedupe_meters / meters_per_unit(wkid)
+        cells = np.column_stack((np.floor(xs / cell), np.floor(ys / cell)))
+        _, first, inverse = np.unique(
+            cells, axis=0, return_index=True, return_inverse=True
+        )
+        unique_xs, unique_ys = xs[first], ys[first]
+
+        if self.mode != "local":
+            road_tree, roads = self._query_roads_near(unique_xs, unique_ys, wkid)
+            max_distance = self.buffer_meters / meters_per_unit(wkid)
+        unique_roads = _nearest_roads(road_tree, roads, unique_xs, unique_ys, max_distance)
+        return [unique_roads[i] for i in inverse.ravel()]
+
+    def _query_roads_near(self, xs, ys, wkid: int):
+        """One query for every road within ``buffer_meters`` of the points, as an STRtree."""
+        from arcgis.geometry import MultiPoint
+        from arcgis.geometry.filters import intersects
+
+        points = MultiPoint(
+            {
+                "points": [[float(x), float(y)] for x, y in zip(xs, ys)],
+                "spatialReference": {"wkid": wkid},
+            }
+        )
         res = self.roads_layer.query(
-            geometry_filter=geom_filter,
-            out_fields="OWNERSHP",
-            return_geometry=False,
-            result_record_count=1,
+            geometry_filter=intersects(points, sr=wkid),
+            distance=self.buffer_meters,
+            units="esriSRUnit_Meter",
+            out_fields="OBJECTID,OWNERSHP",
+            return_geometry=True,
+            out_sr=wkid,
         )
-        return res.features[0] if res.features else None
+        geometries = []
+        roads = []
+        for feature in res.features:
+            paths = (feature.geometry or {}).get("paths")
+            if not paths:
+                continue
+            geometries.append(shapely.MultiLineString(paths))
+            roads.append(
+                {
+                    "owner": self._get_road_owner(feature),
+                    "segment_id": feature.attributes.get("OBJECTID"),
+                }
+            )
+        logger.info(f"Fetched {len(roads)} roads near {len(xs)} points.")
+        return shapely.STRtree(geometries), roads
 
     def _get_road_owner(self, feature) -> str:
         return feature.attributes.get("OWNERSHP", "UNKNOWN")
 
+    def snapshot_age_days(self) -> float:
+        """Age of the local snapshot in days, or None if there is none."""
+        if not os.path.exists(self.snapshot_path):
+            return None
+        return (time.time() - os.path.getmtime(self.snapshot_path)) / 86400
+
+    def refresh_snapshot(self) -> int:
+        """
+        Download every road segment (geometry in WGS84, OBJECTID and OWNERSHP) to the
+        snapshot file. Cached owners are dropped, since they may predate the new data.
+
+        Returns:
+            int: Number of road segments saved.
+        """
+        start_time = time.time()
+        feature_set = self.roads_layer.query(
+            where="1=1", out_fields="OBJECTID,OWNERSHP",
+            return_geometry=True,
+            out_sr=WGS84_WKID,
+        )
+        snapshot = json.loads(feature_set.to_geojson)
+        snapshot["layer_wkid"] = self.layer_wkid
+        road_count = len(snapshot.get("features", []))
+
+        folder = os.path.dirname(self.snapshot_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        temp_path = f"{self.snapshot_path}.tmp"
+        with open(temp_path, "w") as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+        os.replace(temp_path, self.snapshot_path)
+        logger.info(
+            f"Saved {road_count} road segments to {self.snapshot_path} in {time.time() - start_time:.1f}s"
+        )
+        if self.cache is not None:
+            self.cache.clear("road_owner")
+        return road_count
+
+    def load_snapshot(self):
+        """Build the in-memory road index, refreshing the snapshot first if it is stale."""
+        self._current_index()
+
+    def _current_index(self) -> tuple:
+        """
+        The road index, brought up to date first.
+
+        Checked on every lookup, so a long-running process refreshes the snapshot once it
+        is older than ``max_snapshot_age_days`` and picks up a snapshot rewritten by
+        ``python geospatial.py refresh``.
+
+        Returns:
+            tuple: STRtree, roads, index wkid and search distance in index units.
+        """
+        with self._snapshot_lock:
+            age_days = self.snapshot_age_days()
+            # Without a snapshot there is nothing to fall back on, so every lookup retries.
+            if age_days is None or (
+                age_days > self.max_snapshot_age_days
+                and time.time() - self._last_refresh_attempt > self.refresh_retry_seconds
+            ):
+                self._last_refresh_attempt = time.time()
+                try:
+                    self.refresh_snapshot()
+                except Exception as e:
+                    if age_days is None:
+                        raise
+                    logger.warning(
+                        f"Could not refresh road snapshot ({e}); using the {age_days:.0f}-day-old copy."
+                    )
+            if os.path.getmtime(self.snapshot_path) != self._snapshot_mtime:
+                self._load_index()
+            return self._road_tree, self._roads, self._index_wkid, self._index_buffer
+
+    def _load_index(self):
+        if self._snapshot_mtime is not None and self.cache is not None:
+            self.cache.clear("road_owner")  # owners from the previous snapshot
+        self._snapshot_mtime = os.path.getmtime(self.snapshot_path)
+        with open(self.snapshot_path) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+        features = snapshot.get("features", [])
+        geometries = []
+        roads = []
+        for feature in features:
+            if not feature.get("geometry"):
+                continue
+            properties = feature.get("properties") or {}
+            geometries.append(shape(feature["geometry"]))
+            roads.append(
+                {
+                    "owner": properties.get("OWNERSHP") or "UNKNOWN",
+                    "segment_id": properties.get("OBJECTID"),
+                }
+            )
+
+        # Index in the layer's projected SR so the buffer is a true distance
+        self._index_wkid = snapshot.get("layer_wkid", DEFAULT_ROADS_WKID)
+        transformer = get_transformer(WGS84_WKID, self._index_wkid)
+        geometries = shapely.transform(
+            np.asarray(geometries, dtype=object),
+            lambda coords: np.column_stack(
+                transformer.transform(coords[:, 0], coords[:, 1])
+            ),
+        )
+        self._index_buffer = self.buffer_meters / meters_per_unit(self._index_wkid)
+        self._road_tree = shapely.STRtree(geometries)
+        self._roads = roads
+        logger.info(f"Indexed {len(roads)} road segments from {self.snapshot_path}.")
+
+
+def _nearest_roads(road_tree, roads, xs, ys, max_distance) -> list:
+    """Nearest road within ``max_distance`` of each point, in one tree query."""
+    nearest = [{"owner": "UNKNOWN", "segment_id": None}] * len(xs)
+    if len(roads) == 0:
+        return nearest
+    point_indices, road_indices = road_tree.query_nearest(
+        shapely.points(xs, ys), max_distance=max_distance, all_matches=False
+    )
+    for point_index, road_index in zip(point_indices, road_indices):
+        nearest[int(point_index)] = roads[int(road_index)]
+    return nearest
+
 
 def main():
     client = RoadOwnerFinder()
+    if sys.argv[1:] == ["refresh"]:
+        client.refresh_snapshot()
+        return
     owner = client.get_pothole_owner(35.795120, -78.786080)
     print(owner)
 
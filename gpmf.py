@@ -0,0 +1,393 @@
+# gpmf.py
+"""
+In-process reader for GoPro GPMF telemetry.
+
+Walks the MP4 box tree of a memory-mapped video, finds the 'gpmd' metadata track and
+decodes its GPS5 (HERO5-HERO10) or GPS9 (HERO11+) samples straight into columnar arrays.
+This replaces dumping stream 0:2 with FFmpeg, running gopro2gpx and re-parsing the GPX XML.
+GPX output is still available through GPMFTelemetry.write_gpx.
+"""
+
+import os
+import mmap
+import struct
+import datetime
+import numpy as np
+from logging_config import logger
+from telemetry_track import TelemetryTrack, to_epoch_seconds
+
+MP4_CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts", b"dinf"}
+
+# GPMF type characters -> big-endian numpy dtypes
+GPMF_TYPES = {
+    b"b": ">i1",
+    b"B": ">u1",
+    b"s": ">i2",
+    b"S": ">u2",
+    b"l": ">i4",
+    b"L": ">u4",
+    b"f": ">f4",
+    b"d": ">f8",
+    b"j": ">i8",
+    b"J": ">u8",
+}
+
+GPS9_EPOCH = datetime.datetime(2000, 1, 1)
+MIN_GPS_FIX = 2  # 0 = no lock, 2 = 2D lock, 3 = 3D lock
+
+
+def _iter_boxes(buf, start, end):
+    """Yield ``(box_type, payload_start, box_end)`` for each MP4 box between start and end."""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", buf, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", buf, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            break
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def _find_box(buf, start, end, box_type):
+    for found_type, payload_start, box_end in _iter_boxes(buf, start, end):
+        if found_type == box_type:
+            return payload_start, box_end
+    return None
+
+
+def _find_path(buf, start, end, path):
+    """Descend through nested boxes, e.g. ``(b"mdia", b"minf", b"stbl")``."""
+    span = (start, end)
+    for box_type in path:
+        span = _find_box(buf, span[0], span[1], box_type)
+        if span is None:
+            return None
+    return span
+
+
+def _find_gpmd_track(buf):
+    """Return the (start, end) span of the trak box whose sample entry is 'gpmd'."""
+    moov = _find_box(buf, 0, len(buf), b"moov")
+    if moov is None:
+        raise ValueError("No moov box found; is this an MP4 file?")
+
+    for box_type, payload_start, box_end in _iter_boxes(buf, *moov):
+        if box_type != b"trak":
+            continue
+        stsd = _find_path(
+            buf, payload_start, box_end, (b"mdia", b"minf", b"stbl", b"stsd")
+        )
+        # stsd: version/flags (4), entry count (4), then entry size (4) + format (4)
+        if stsd and buf[stsd[0] + 12 : stsd[0] + 16] == b"gpmd":
+            return payload_start, box_end
+    return None
+
+
+def _read_timescale(buf, trak_start, trak_end):
+    mdhd_start, _ = _find_path(buf, trak_start, trak_end, (b"mdia", b"mdhd"))
+    version = buf[mdhd_start]
+    if version == 1:
+        return struct.unpack_from(">I", buf, mdhd_start + 20)[0]
+    return struct.unpack_from(">I", buf, mdhd_start + 12)[0]
+
+
+def _read_sample_table(buf, trak_start, trak_end):
+    """
+    Resolve every metadata sample's file offset, size, start time and duration.
+
+    Returns:
+        list[tuple]: ``(offset, size, start_seconds, duration_seconds)`` per sample.
+    """
+    timescale = _read_timescale(buf, trak_start, trak_end)
+    stbl = _find_path(buf, trak_start, trak_end, (b"mdia", b"minf", b"stbl"))
+
+    stsz_start, _ = _find_box(buf, *stbl, b"stsz")
+    uniform_size, sample_count = struct.unpack_from(">II", buf, stsz_start + 4)
+    if uniform_size:
+        sizes = [uniform_size] * sample_count
+    else:
+        sizes = list(struct.unpack_from(f">{sample_count}I", buf, stsz_start + 12))
+
+    chunk_box = _find_box(buf, *stbl, b"stco")
+    if chunk_box:
+        chunk_count = struct.unpack_from(">I", buf, chunk_box[0] + 4)[0]
+        chunk_offsets = struct.unpack_from(f">{chunk_count}I", buf, chunk_box[0] + 8)
+    else:
+        chunk_box = _find_box(buf, *stbl, b"co64")
+        chunk_count = struct.unpack_from(">I", buf, chunk_box[0] + 4)[0]
+        chunk_offsets = struct.unpack_from(f">{chunk_count}Q", buf, chunk_box[0] + 8)
+
+    stsc_start, _ = _find_box(buf, *stbl, b"stsc")
+    stsc_count = struct.unpack_from(">I", buf, stsc_start + 4)[0]
+    stsc = [
+        struct.unpack_from(">III", buf, stsc_start + 8 + 12 * i)[:2]
+        for i in range(stsc_count)
+    ]
+
+    stts_start, _ = _find_box(buf, *stbl, b"stts")
+    stts_count = struct.unpack_from(">I", buf, stts_start + 4)[0]
+    durations = []
+    for i in range(stts_count):
+        count, delta = struct.unpack_from(">II", buf, stts_start + 8 + 8 * i)
+        durations.extend([delta] * count)
+
+    samples = []
+    sample_index = 0
+    media_time = 0
+    for chunk_index, chunk_offset in enumerate(chunk_offsets, start=1):
+        samples_per_chunk = next(
+            per_chunk
+            for first_chunk, per_chunk in reversed(stsc)
+            if first_chunk <= chunk_index
+        )
+        offset = chunk_offset
+        for _ in range(samples_per_chunk):
+            if sample_index >= sample_count:
+                break
+            duration = durations[sample_index] if sample_index < len(durations) else 0
+            samples.append(
+                (
+                    offset,
+                    sizes[sample_index],
+                    media_time / timescale,
+                    duration / timescale,
+                )
+            )
+            offset += sizes[sample_index]
+            media_time += duration
+            sample_index += 1
+    return samples
+
+
+def _iter_klv(buf, start, end):
+    """Yield ``(key, type, struct_size, repeat, data_start)`` for each GPMF KLV entry."""
+    offset = start
+    while offset + 8 <= end:
+        key = bytes(buf[offset : offset + 4])
+        if key == b"\x00\x00\x00\x00":
+            break
+        type_char, struct_size, repeat = struct.unpack_from(">cBH", buf, offset + 4)
+        data_start = offset + 8
+        yield key, type_char, struct_size, repeat, data_start
+        offset = data_start + ((struct_size * repeat + 3) & ~3)  # 32-bit aligned
+
+
+def _read_values(buf, type_char, struct_size, repeat, data_start):
+    dtype = np.dtype(GPMF_TYPES[type_char])
+    count = struct_size * repeat // dtype.itemsize
+    data = bytes(buf[data_start : data_start + count * dtype.itemsize])
+    return np.frombuffer(data, dtype=dtype).astype(np.float64)
+
+
+def _parse_gpsu(buf, data_start):
+    """GPSU is 'yymmddhhmmss.sss' UTC."""
+    text = bytes(buf[data_start : data_start + 16]).decode("ascii")
+    return datetime.datetime.strptime(text, "%y%m%d%H%M%S.%f")
+
+
+def _parse_gps_stream(buf, start, end, sample_start, sample_duration):
+    """
+    Decode one STRM that carries GPS5 or GPS9 into a dict of column arrays.
+
+    Returns None for streams that are not GPS, or whose fix is too weak to use.
+    """
+    scale = None
+    gpsu = None
+    fix = None
+    type_string = None
+    gps5 = None
+    gps9 = None
+
+    for key, type_char, struct_size, repeat, data_start in _iter_klv(buf, start, end):
+        if key == b"SCAL":
+            scale = _read_values(buf, type_char, struct_size, repeat, data_start)
+        elif key == b"GPSU":
+            gpsu = _parse_gpsu(buf, data_start)
+        elif key == b"GPSF":
+            fix = int(_read_values(buf, type_char, struct_size, repeat, data_start)[0])
+        elif key == b"TYPE":
+            type_string = bytes(buf[data_start : data_start + struct_size * repeat])
+        elif key == b"GPS5":
+            gps5 = (struct_size, repeat, data_start)
+        elif key == b"GPS9":
+            gps9 = (struct_size, repeat, data_start)
+
+    if gps9 and type_string:
+        struct_size, repeat, data_start = gps9
+        fields = [GPMF_TYPES[bytes([char])] for char in type_string.rstrip(b"\x00")]
+        dtype = np.dtype([(f"f{i}", field) for i, field in enumerate(fields)])
+        raw = np.frombuffer(
+            bytes(buf[data_start : data_start + struct_size * repeat]), dtype=dtype
+        )
+        columns = np.stack(
+            [raw[name].astype(np.float64) for name in dtype.names], axis=1
+        )
+        columns /= scale if scale is not None else 1.0
+        # lat, lon, alt, speed2d, speed3d, days since 2000, secs since midnight, DOP, fix
+        times = (
+            to_epoch_seconds(GPS9_EPOCH) + columns[:, 5] * 86400 + columns[:, 6]
+        )
+        keep = columns[:, 8] >= MIN_GPS_FIX
+        start_time = None
+        if keep.any():
+            # Video time of the first locked sample, spread evenly across the payload
+            first = int(np.argmax(keep))
+            start_time = times[first] - (
+                sample_start + first * sample_duration / len(times)
+            )
+        return {
+            "times": times[keep],
+            "lat": columns[keep, 0],
+            "lon": columns[keep, 1],
+            "elevation": columns[keep, 2],
+            "speed": columns[keep, 3],
+            "start_time": start_time,
+        }
+
+    if gps5 and gpsu is not None:
+        struct_size, repeat, data_start = gps5
+        columns = _read_values(buf, b"l", struct_size, repeat, data_start).reshape(
+            repeat, 5
+        )
+        columns /= scale if scale is not None else 1.0
+        # GPSU stamps the payload; spread its samples across the payload's duration
+        payload_start = to_epoch_seconds(gpsu)
+        times = payload_start + np.arange(repeat) * (sample_duration / max(repeat, 1))
+        locked = fix is None or fix >= MIN_GPS_FIX
+        if not locked:
+            times = times[:0]
+        return {
+            "times": times,
+            "lat": columns[: len(times), 0],
+            "lon": columns[: len(times), 1],
+            "elevation": columns[: len(times), 2],
+            "speed": columns[: len(times), 3],
+            "start_time": payload_start - sample_start if locked else None,
+        }
+
+    return None
+
+
+class GPMFTelemetry:
+    """Columnar GPS telemetry decoded from one GoPro video."""
+
+    def __init__(self, times, lat, lon, elevation, speed, start_time):
+        self.times = times
+        self.lat = lat
+        self.lon = lon
+        self.elevation = elevation
+        self.speed = speed
+        self.start_time: datetime.datetime = start_time  # UTC time of video frame 0
+
+    def __len__(self):
+        return len(self.times)
+
+    def to_track(self) -> TelemetryTrack:
+        return TelemetryTrack(
+            times=self.times,
+            lat=self.lat,
+            lon=self.lon,
+            elevation=self.elevation,
+            speed=self.speed,
+        )
+
+    def write_gpx(self, gpx_path):
+        """Write the track as GPX 1.1, in the same shape gopro2gpx produces."""
+        timestamps = TelemetryTrack.format_gpx_timestamps(self.times)
+        start = self.start_time.isoformat(timespec="microseconds") + "Z"
+        lines = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            '<gpx version="1.1" creator="road-health gpmf" '
+            'xmlns="http://www.topografix.com/GPX/1/1" '
+            'xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v2">',
+            f"<metadata><time>{start}</time></metadata>",
+            "<trk><trkseg>",
+        ]
+        for i, timestamp in enumerate(timestamps):
+            lines.append(
+                f'<trkpt lat="{self.lat[i]:.7f}" lon="{self.lon[i]:.7f}">'
+                f"<ele>{self.elevation[i]:.3f}</ele><time>{timestamp}</time>"
+                f"<extensions><gpxtpx:TrackPointExtension>"
+                f"<gpxtpx:speed>{self.speed[i]:.3f}</gpxtpx:speed>"
+                f"</gpxtpx:TrackPointExtension></extensions></trkpt>"
+            )
+        lines.append("</trkseg></trk></gpx>")
+
+        with open(gpx_path, "w") as gpx_file:
+            gpx_file.write("\n".join(lines))
+        logger.info(f"Wrote {len(timestamps)} trackpoints to {gpx_path}")
+
+
+def read_gpmf_telemetry(mp4_path) -> GPMFTelemetry:
+    """
+    Read GPS telemetry straight from a GoPro MP4's GPMF track.
+
+    Args:
+        mp4_path (str): Path to the video file.
+
+    Returns:
+        GPMFTelemetry: Sorted columnar telemetry plus the UTC start time of the video.
+    """
+    if not os.path.exists(mp4_path):
+        raise FileNotFoundError(f"Video file '{mp4_path}' not found.")
+
+    chunks = []
+    start_time = None
+    with open(mp4_path, "rb") as video_file:
+        with mmap.mmap(video_file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            track = _find_gpmd_track(buf)
+            if track is None:
+                raise ValueError(f"No GPMF metadata track found in {mp4_path}.")
+
+            for offset, size, sample_start, sample_duration in _read_sample_table(
+                buf, *track
+            ):
+                for key, _, devc_size, devc_repeat, devc_start in _iter_klv(
+                    buf, offset, offset + size
+                ):
+                    if key != b"DEVC":
+                        continue
+                    devc_end = devc_start + devc_size * devc_repeat
+                    for strm_key, _, struct_size, repeat, strm_start in _iter_klv(
+                        buf, devc_start, devc_end
+                    ):
+                        if strm_key != b"STRM":
+                            continue
+                        stream = _parse_gps_stream(
+                            buf,
+                            strm_start,
+                            strm_start + struct_size * repeat,
+                            sample_start,
+                            sample_duration,
+                        )
+                        if stream is None:
+                            continue
+                        if start_time is None and stream["start_time"] is not None:
+                            start_time = stream["start_time"]
+                        chunks.append(stream)
+
+    if start_time is None:
+        raise ValueError(f"No GPS data found in {mp4_path}.")
+
+    def _column(name):
+        if not chunks:
+            return np.zeros(0)
+        return np.concatenate([chunk[name] for chunk in chunks])
+
+    telemetry = GPMFTelemetry(
+        times=_column("times"),
+        lat=_column("lat"),
+        lon=_column("lon"),
+        elevation=_column("elevation"),
+        speed=_column("speed"),
+        start_time=datetime.datetime.fromtimestamp(
+            start_time, tz=datetime.timezone.utc
+        ).replace(tzinfo=None),
+    )
+    logger.info(f"Read {len(telemetry)} GPS fixes from {mp4_path} (GPMF).")
+    return telemetry
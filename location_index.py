@@ -0,0 +1,157 @@
+# location_index.py
+"""
+Local copy of the Salesforce ``Location__c`` street segments with a nearest-location index.
+
+The first sync pulls every street segment once; later syncs only ask for records modified
+since the newest ``LastModifiedDate`` already held (deleted ones included), so keeping the
+copy current costs one small query. Nearest-location lookups are a KD-tree query in memory.
+"""
+
+import os
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from logging_config import logger
+from geo_index import KDTree, has_fix
+
+LOCATIONS_SNAPSHOT_FILE = "cache/sf_locations.json"
+STREET_SEGMENT_RECORD_TYPES = ("0124u000000ciJTAAY", "0124u000000ciJSAAY")
+
+
+class SalesforceLocationIndex:
+    """
+    Street segments from ``Location__c``, synced to a JSON file and indexed in a KD-tree.
+
+    Args:
+        sf (Salesforce): Authenticated simple_salesforce client.
+        snapshot_path (str): JSON file holding the synced records.
+        sync_interval_minutes (float): ``nearest`` syncs first when the last sync is older.
+        record_type_ids (tuple): Record types that count as street segments.
+    """
+
+    def __init__(
+        self,
+        sf,
+        snapshot_path=LOCATIONS_SNAPSHOT_FILE,
+        sync_interval_minutes=60,
+        record_type_ids=STREET_SEGMENT_RECORD_TYPES,
+    ):
+        self.sf = sf
+        self.snapshot_path = snapshot_path
+        self.sync_interval_minutes = sync_interval_minutes
+        self.record_type_ids = tuple(record_type_ids)
+        self._lock = threading.Lock()
+        self._locations = {}  # Id -> {"Id", "Name", "Latitude", "Longitude"}
+        self._watermark = None  # newest LastModifiedDate held, as a SOQL datetime literal
+        self._last_sync = 0.0
+        self._tree = KDTree([])
+        self._load()
+
+    def __len__(self):
+        return len(self._locations)
+
+    def _load(self):
+        try:
+            with open(self.snapshot_path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError as e:
+            logger.error(f"Ignoring unreadable location snapshot {self.snapshot_path}: {e}")
+            return
+        self._locations = snapshot.get("locations", {})
+        self._watermark = snapshot.get("watermark")
+        self._rebuild_tree()
+        logger.info(f"Loaded {len(self._locations)} street segments from {self.snapshot_path}.")
+
+    def _save(self):
+        folder = os.path.dirname(self.snapshot_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        temp_path = f"{self.snapshot_path}.tmp"
+        with open(temp_path, "w") as snapshot_file:
+            json.dump({"watermark": self._watermark, "locations": self._locations}, snapshot_file)
+        os.replace(temp_path, self.snapshot_path)
+
+    def _rebuild_tree(self):
+        located = [
+            location
+            for location in self._locations.values()
+            if has_fix(location["Latitude"], location["Longitude"])
+        ]
+        self._tree = KDTree(
+            [(location["Latitude"], location["Longitude"]) for location in located], located
+        )
+
+    def sync(self) -> int:
+        """
+        Bring the local copy up to date: everything on the first run, then only changes.
+
+        Returns:
+            int: Number of records added, updated or removed.
+        """
+        with self._lock:
+            return self._sync()
+
+    def _sync(self) -> int:
+        start_time = time.time()
+        fields = "Id, Name, RecordTypeId, IsDeleted, LastModifiedDate, Geolocation__latitude__s, Geolocation__longitude__s"
+        if self._watermark is None:
+            record_types = ", ".join(f"'{record_type}'" for record_type in self.record_type_ids)
+            soql = f"SELECT {fields} FROM Location__c WHERE RecordTypeId IN ({record_types})"
+            records = self.sf.query_all(soql)["records"]
+        else:
+            # Include records that left the street-segment types or were deleted, to drop them
+            soql = f"SELECT {fields} FROM Location__c WHERE LastModifiedDate >= {self._watermark}"
+            records = self.sf.query_all(soql, include_deleted=True)["records"]
+
+        for record in records:
+            if record.get("IsDeleted") or record.get("RecordTypeId") not in self.record_type_ids:
+                self._locations.pop(record["Id"], None)
+            else:
+                self._locations[record["Id"]] = {
+                    "Id": record["Id"],
+                    "Name": record.get("Name"),
+                    "Latitude": record.get("Geolocation__latitude__s"),
+                    "Longitude": record.get("Geolocation__longitude__s"),
+                }
+            self._watermark = max(
+                self._watermark or "", _soql_datetime(record["LastModifiedDate"])
+            )
+        if records:
+            self._rebuild_tree()
+            self._save()
+        self._last_sync = time.time()
+        logger.info(
+            f"Synced {len(records)} Location__c changes ({len(self._locations)} street segments) in {time.time() - start_time:.1f}s"
+        )
+        return len(records)
+
+    def nearest(self, lat, lon):
+        """
+        Closest street segment to a point, syncing first if the copy is due for it.
+
+        Returns:
+            tuple: (location dict with Id, Name, Latitude, Longitude; distance in km), or
+                (None, inf) when there are no located street segments.
+        """
+        if time.time() - self._last_sync > self.sync_interval_minutes * 60:
+            try:
+                self.sync()
+            except Exception as e:
+                if not self._locations:
+                    raise
+                self._last_sync = time.time()  # Don't retry on every lookup
+                logger.warning(f"Location__c sync failed ({e}); using the local copy.")
+        match = self._tree.nearest(float(lat), float(lon))
+        if match is None:
+            return None, float("inf")
+        distance_m, location = match
+        return location, round(distance_m / 1000, 3)
+
+
+def _soql_datetime(value: str) -> str:
+    """Salesforce's ``2024-05-01T12:00:00.000+0000`` as a SOQL literal in UTC."""
+    parsed = datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f%z")
+    return parsed.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -6,6 +6,7 @@ import os
 from logging_config import logger
 import shutil
 import asyncio
+import time
 from flask import Flask
 
 
@@ -30,6 +31,11 @@ class App:
         self.downloaded_but_unprocessed = []
         self.time_to_check = None
         self.processing_status = {}
+        self.max_parallel_videos = 3  # Videos processed at once, each in its own work dir
+        self.video_work_root = "work"
+        self.video_processors = {}
+        self.deferred_check_interval = 300  # Seconds between Batch API checks for deferred videos
+        self._last_deferred_check = 0.0
 
     async def initialize(self):
         """Run initialization logic and send status updates."""
@@ -99,52 +105,162 @@ class App:
             logger.info("No files to process. Exiting pipeline.")
             return
 
-        for file in files_to_process:
-            self.processing_status["file"] = {
-                "stage": "Downloading",
-                "status": f"Downloading {file}...",
-            }
-            logger.info(self.processing_status["file"]["status"])
+        semaphore = asyncio.Semaphore(self.max_parallel_videos)
+        results = await asyncio.gather(
+            *[
+                self.process_file(file, semaphore, greenway_mode=greenway_mode, mode=mode)
+                for file in files_to_process
+            ],
+            return_exceptions=True,
+        )
+        for file, result in zip(files_to_process, results):
+            if isinstance(result, Exception):
+                self.processing_status[file] = {
+                    "stage": "Errored",
+                    "status": f"Processing failed for {file}: {result}",
+                }
+                logger.error(self.processing_status[file]["status"])
 
-            self.processing_status["file"] = {
-                "stage": "Processing",
-                "status": f"Processing footage from {file}...",
-            }
-            logger.info(self.processing_status["file"]["status"])
+        self.save_processed_videos()
 
-            telemetry_objects = await self.frame_processor.process_video_pipeline(
-                video_path=file, frame_rate=0.5, mode=mode
-            )
-            #'video' VS 'timelapse' MODE SET HERE. TIMELAPSE MODE IGNORES FRAMERATE I THINK
-            self.processed_videos.add(file)
+        # Now that all the actions are done, we can clear out the frames and unprocessed_videos folder.
+        # For unprocessed_videos, make sure to only delete the files that are also in the processed_files list
+        self.status = "Cleaning up processed files..."
+        logger.info(self.status)
+        self.clear_folders()
 
-            # MOVED THIS OVER TO PROCESSING.PY FOR PER-FILE UPLOAD AND CLEANUP. MIGHT WORK?
-            # await self.box.save_frames_to_long_term_storage(telemetry_objects=telemetry_objects, greenway_mode=greenway_mode, video_path=file)
+        self.status = "Idle - Waiting for next check"
 
+    def create_video_processor(self, file, mode="timelapse") -> Processor:
+        """Build a Processor with its own work dir, sharing the AI/Box clients and settings."""
+        template = self.frame_processor
+        work_dir = os.path.join(
+            self.video_work_root, os.path.splitext(os.path.basename(file))[0]
+        )
+        processor = Processor(
+            mode=mode, work_dir=work_dir, ai=template.ai, box=template.box
+        )
+        processor.frame_sampling = template.frame_sampling
+        processor.ai_input_profile = template.ai_input_profile
+        processor.telemetry_source = template.telemetry_source
+        processor.export_gpx = template.export_gpx
+        processor.interpolate_gps = template.interpolate_gps
+        processor.dedup_frames = template.dedup_frames
+        processor.stream_frames = template.stream_frames
+        processor.write_frames_to_disk = template.write_frames_to_disk
+        processor.overlap_stages = template.overlap_stages
+        processor.analysis_mode = template.analysis_mode
+        processor.image_submission = template.image_submission
+        processor.inline_ai_input_profile = template.inline_ai_input_profile
+        processor.adaptive_batch_size = template.adaptive_batch_size
+        processor.stream_checker = template.stream_checker
+        processor.stage_concurrency = dict(template.stage_concurrency)
+        processor.stage_queue_size = template.stage_queue_size
+        return processor
+
+    async def process_file(self, file, semaphore, greenway_mode=False, mode="timelapse"):
+        """Process one video end-to-end; at most `max_parallel_videos` run at once."""
+        async with semaphore:
             self.processing_status[file] = {
-                "stage": "Complete",
-                "status": f"Processing complete for {file}.",
+                "stage": "Processing",
+                "status": f"Processing footage from {file}...",
             }
             logger.info(self.processing_status[file]["status"])
 
-            self.status = "Processing Salesforce actions..."
-            logger.info(self.status)
-
-            if not greenway_mode:
-                ai_events_created = await self.work_order_creator.ai_event_engine(
-                    box_client=self.box, telemetry_objects=telemetry_objects
+            processor = self.create_video_processor(file, mode=mode)
+            self.video_processors[file] = processor
+            try:
+                telemetry_objects = await processor.process_video_pipeline(
+                    video_path=file, frame_rate=0.5, mode=mode
                 )
-                logger.info(f"AI Events created: {ai_events_created}")
+                #'video' VS 'timelapse' MODE SET HERE. TIMELAPSE MODE IGNORES FRAMERATE I THINK
+            finally:
+                self.video_processors.pop(file, None)
+            self.processed_videos.add(file)
 
-        self.save_processed_videos()
+            if telemetry_objects is None:
+                # Deferred analysis: collect_deferred_videos finishes it once the batch is done
+                self.processing_status[file] = {
+                    "stage": "Awaiting Batch",
+                    "status": f"Frames from {file} were submitted to the Batch API.",
+                }
+                logger.info(self.processing_status[file]["status"])
+                return None
+
+            await self.complete_video(file, processor, telemetry_objects, greenway_mode)
+            return telemetry_objects
+
+    async def complete_video(self, file, processor, telemetry_objects, greenway_mode=False):
+        """Record a processed video's status and run its Salesforce actions."""
+        self.processing_status[file] = {
+            "stage": "Complete",
+            "status": f"Processing complete for {file}.",
+            "analysis_coverage": processor.analysis_coverage,
+        }
+        logger.info(self.processing_status[file]["status"])
 
-        # Now that all the actions are done, we can clear out the frames and unprocessed_videos folder.
-        # For unprocessed_videos, make sure to only delete the files that are also in the processed_files list
-        self.status = "Cleaning up processed files..."
-        logger.info(self.status)
-        self.clear_folders()
+        if not greenway_mode:
+            logger.info(f"Processing Salesforce actions for {file}...")
+            ai_events_created = await self.work_order_creator.ai_event_engine(
+                box_client=self.box, telemetry_objects=telemetry_objects
+            )
+            logger.info(f"AI Events created: {ai_events_created}")
+            # Read right after the await, before another video's run can replace it
+            geo_cache_stats = self.work_order_creator.last_geo_cache_stats
+            self.processing_status[file]["geo_cache"] = geo_cache_stats
+            logger.info(
+                f"Geo cache hit rate for {file}: {geo_cache_stats['hit_rate']}"
+            )
 
-        self.status = "Idle - Waiting for next check"
+    def pending_deferred_jobs(self) -> dict:
+        """Stored Batch API jobs of videos still waiting for results, by job name."""
+        return {
+            job_name: job
+            for job_name, job in self.frame_processor.ai.batch_jobs.all().items()
+            if job.get("context", {}).get("video")
+        }
+
+    async def collect_deferred_videos(self, mode="timelapse"):
+        """
+        Finish videos whose deferred (Batch API) analysis is done: Steps 6.5-9 and Salesforce.
+
+        Called on every monitoring tick; checks the batches at most every
+        ``deferred_check_interval`` seconds. Jobs from before a restart are picked up too.
+        """
+        if time.time() - self._last_deferred_check < self.deferred_check_interval:
+            return
+        self._last_deferred_check = time.time()
+
+        semaphore = asyncio.Semaphore(self.max_parallel_videos)
+        await asyncio.gather(
+            *[
+                self.collect_deferred_video(job["context"], semaphore, mode=mode)
+                for job in self.pending_deferred_jobs().values()
+            ]
+        )
+
+    async def collect_deferred_video(self, context: dict, semaphore, mode="timelapse"):
+        file = context["video"]
+        if file in self.video_processors:
+            return  # Being (re)processed right now; that run resumes the same job
+        async with semaphore:
+            processor = self.create_video_processor(file, mode=context.get("mode", mode))
+            self.video_processors[file] = processor
+            try:
+                telemetry_objects = await processor.finish_deferred_video()
+            except Exception as e:
+                self.processing_status[file] = {
+                    "stage": "Errored",
+                    "status": f"Finishing deferred analysis failed for {file}: {e}",
+                }
+                logger.error(self.processing_status[file]["status"])
+                return
+            finally:
+                self.video_processors.pop(file, None)
+            if telemetry_objects is not None:
+                await self.complete_video(
+                    file, processor, telemetry_objects, self.greenway_mode
+                )
 
     async def download_files(self, files_to_download: list = None) -> bool:
         for file in files_to_download:
@@ -266,6 +382,8 @@ class App:
                     self.monitoring_status = "Active"
                     await asyncio.sleep(1)
 
+                await self.collect_deferred_videos(mode=mode)
+
                 new_files_to_download = self.check_for_new_files()
                 if len(new_files_to_download) > 0:
                     self.status = "Downloading"
@@ -279,7 +397,8 @@ class App:
                 else:
                     self.status = "Monitoring"
                     logger.info(self.status)
-                    five_min_timer -= 1
+                    if not self.pending_deferred_jobs():
+                        five_min_timer -= 1  # Keep running until deferred videos are finished
                     if five_min_timer <= 0:
                         logger.info(
                             "Five-minute timeout reached with no new files. Shutting down monitoring."
@@ -0,0 +1,166 @@
+# pothole_index.py
+"""
+Spatial dedup of pothole detections before AI events are created.
+
+One physical pothole shows up in several consecutive timelapse frames, and again every day
+the route is driven. Detections within ``radius_m`` of each other are clustered into one
+event per defect, and a persistent index of already-reported potholes suppresses events for
+defects reported recently.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from logging_config import logger
+from geo_index import GridIndex, has_fix
+
+REPORTED_POTHOLES_FILE = "cache/reported_potholes.sqlite"
+
+
+class PotholeCluster:
+    """Detections of one physical pothole; the most confident one represents it."""
+
+    def __init__(self, representative):
+        self.representative = representative
+        self.detections = [representative]
+
+    @property
+    def lat(self):
+        return self.representative.lat
+
+    @property
+    def lon(self):
+        return self.representative.lon
+
+    @property
+    def confidence(self) -> float:
+        return _confidence(self.representative)
+
+
+def _confidence(telemetry_object) -> float:
+    return (telemetry_object.analysis_results or {}).get("pothole_confidence", 0)
+
+
+def cluster_detections(telemetry_objects, radius_m: float = 8.0) -> list:
+    """
+    Group pothole detections that are within ``radius_m`` of each other.
+
+    Detections are taken most-confident first; each joins the nearest existing cluster whose
+    representative is within the radius, or starts a new one. Detections without a GPS fix
+    cannot be placed and each become their own cluster.
+
+    Args:
+        telemetry_objects (iterable): Frames already filtered to pothole detections.
+        radius_m (float): Distance under which two detections are the same pothole.
+
+    Returns:
+        list[PotholeCluster]: Clusters, most confident first.
+    """
+    grid = GridIndex(radius_m)
+    clusters = []
+    for telemetry_object in sorted(telemetry_objects, key=_confidence, reverse=True):
+        if not has_fix(telemetry_object.lat, telemetry_object.lon):
+            clusters.append(PotholeCluster(telemetry_object))
+            continue
+        nearest = grid.nearest(telemetry_object.lat, telemetry_object.lon, radius_m)
+        if nearest is not None:
+            nearest[1].detections.append(telemetry_object)
+            continue
+        cluster = PotholeCluster(telemetry_object)
+        grid.insert(cluster.lat, cluster.lon, cluster)
+        clusters.append(cluster)
+    return clusters
+
+
+class ReportedPotholeIndex:
+    """
+    Potholes that already have an AI event, in SQLite with an in-memory grid on top.
+
+    Args:
+        db_path (str): SQLite file.
+        radius_m (float): Distance under which a detection is the same pothole.
+        suppress_days (float): How long after its event a pothole keeps suppressing new
+            ones; after that (e.g. it was patched and failed again) it is reported anew.
+    """
+
+    def __init__(self, db_path=REPORTED_POTHOLES_FILE, radius_m=8.0, suppress_days=30):
+        self.db_path = db_path
+        self.radius_m = radius_m
+        self.suppress_days = suppress_days
+        self._lock = threading.Lock()
+        self._grid = GridIndex(radius_m)
+
+        db_folder = os.path.dirname(db_path)
+        if db_folder:
+            os.makedirs(db_folder, exist_ok=True)
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS reported_potholes (
+                    id INTEGER PRIMARY KEY,
+                    lat REAL NOT NULL,
+                    lon REAL NOT NULL,
+                    record_id TEXT,
+                    reported_at TEXT NOT NULL,
+                    last_seen_at TEXT NOT NULL,
+                    detections INTEGER NOT NULL
+                )
+                """
+            )
+            rows = self._connection.execute(
+                "SELECT id, lat, lon, record_id, reported_at FROM reported_potholes"
+            ).fetchall()
+        for row_id, lat, lon, record_id, reported_at in rows:
+            self._grid.insert(
+                lat,
+                lon,
+                {
+                    "id": row_id,
+                    "record_id": record_id,
+                    "reported_at": datetime.fromisoformat(reported_at),
+                },
+            )
+        logger.info(f"Loaded {len(rows)} reported potholes from {db_path}.")
+
+    def find(self, lat, lon) -> dict:
+        """
+        The reported pothole at this spot that should suppress a new event, if any.
+
+        Returns:
+            dict: ``id``, ``record_id`` and ``reported_at`` of the nearest recently reported
+                pothole within ``radius_m``, or None.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.suppress_days)
+        with self._lock:
+            for _, reported in self._grid.within(lat, lon, self.radius_m):
+                if reported["reported_at"] >= cutoff:
+                    return reported
+        return None
+
+    def add(self, lat, lon, record_id, detections=1):
+        """Record a pothole that just got an AI event."""
+        now = datetime.now(timezone.utc)
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO reported_potholes (lat, lon, record_id, reported_at, last_seen_at, detections) VALUES (?, ?, ?, ?, ?, ?)",
+                (lat, lon, record_id, now.isoformat(), now.isoformat(), detections),
+            )
+            self._grid.insert(
+                lat,
+                lon,
+                {"id": cursor.lastrowid, "record_id": record_id, "reported_at": now},
+            )
+
+    def touch(self, reported: dict, detections=1):
+        """Note that a reported pothole was seen again."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE reported_potholes SET last_seen_at = ?, detections = detections + ? WHERE id = ?",
+                (datetime.now(timezone.utc).isoformat(), detections, reported["id"]),
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
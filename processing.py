@@ -7,26 +7,56 @@ from ai import AI
 import dotenv
 import json
 import time
+import asyncio
+import threading
 from logging_config import logger
 from bisect import bisect_left
 import shutil
+import copy
+import functools
+import hashlib
+import numpy as np
 import geojson
 from box import Box
+from frame_sampling import FrameSampler, AIInputProfile, AI_INPUT_PROFILES
+from telemetry_track import TelemetryTrack
+from frame_dedup import FrameDeduplicator
+from gpmf import read_gpmf_telemetry
 
 
 dotenv.load_dotenv()
 
 
+def parse_gpx_time(text: str) -> datetime.datetime:
+    """Parse a GPX UTC time (with or without fractional seconds) into a naive datetime."""
+    return datetime.datetime.fromisoformat(text.strip().replace("Z", "+00:00")).replace(
+        tzinfo=None
+    )
+
+
+_STAGE_DONE = object()  # End-of-stream sentinel passed between pipeline stage queues
+
+
+def _record_frames(telemetry_objects, all_frames: list):
+    """Pass frames through unchanged, appending each to ``all_frames``."""
+    for telemetry_object in telemetry_objects:
+        all_frames.append(telemetry_object)
+        yield telemetry_object
+
+
 class Processor:
     FFMPEG_PATH = "/opt/homebrew/bin/ffmpeg"
     FFPROBE_PATH = "/opt/homebrew/bin/ffprobe"
     TEMP_BIN_FILE = "temp_metadata.bin"
     TEMP_GPX_FILE = "temp_metadata.gpx"
 
-    def __init__(self, mode="video"):
+    def __init__(self, mode="video", work_dir=".", ai: AI = None, box: Box = None):
         self.ensure_ffmpeg_installed()
-        self.ai = AI(os.getenv("OPENAI_API_KEY"))
-        self.box: Box = Box()
+        # Clients can be shared so several Processors (one per video) run side by side
+        self.ai = ai or AI(os.getenv("OPENAI_API_KEY"))
+        self.box: Box = box or Box()
+        self.work_dir = work_dir  # Per-video scratch space for temp files and frames
+        os.makedirs(self.work_dir, exist_ok=True)
         self.video_fps = None
         self.analysis_frames_per_second = None
         self.analysis_max_frames = None
@@ -34,6 +64,7 @@ class Processor:
         self.seconds_analyzed = None
         self.minutes_analyzed = None
         self.base_timestamp = None
+        self.analysis_coverage = None  # Set by report_analysis_coverage after Step 6
         self.processing_status = "Idle"
         self.processing_stages = {
             "Metadata": "Pending",
@@ -43,9 +74,67 @@ class Processor:
             "Finalization": "Pending",
         }
         self.mode = mode
+        self.frame_sampling = "stride"
+        self.stream_frames = False  # Pipe timelapse frames from FFmpeg instead of frames/
+        self.write_frames_to_disk = True  # Only consulted when streaming
+        self.overlap_stages = False  # Run extraction/GPS/upload/analysis as a queue pipeline
+        # "interactive", or "deferred" for the Batch API (half price, results within 24h;
+        # for overnight runs). Deferred runs the steps in sequence, even with overlap_stages,
+        # and stops after submitting; finish_deferred_video runs Steps 6.5-9 later.
+        self.analysis_mode = "interactive"
+        # "file" uploads each frame and references its file ID; "inline" sends frames as
+        # base64 data URLs inside the analysis request (Responses backend or deferred mode)
+        self.image_submission = "file"
+        # Let AI.batch_sizer tune frames per request from latency, tokens and match rate
+        # (within its bounds) instead of using the fixed batch_size
+        self.adaptive_batch_size = True
+        self.stream_checker = True  # Re-check positives while first-pass batches still run
+        self.stage_concurrency = {"gps": 1, "upload": 8, "analysis": 4, "checker": 2}
+        self.stage_queue_size = 64
+        self.ai_input_profile = "full"  # Name in AI_INPUT_PROFILES, or an AIInputProfile
+        # Inline frames are base64 inside every request; an unscaled profile is capped to this
+        self.inline_ai_input_profile = "balanced"
+        self.dedup_frames = True  # Skip AI on near-duplicate frames (e.g. stopped at a bin)
+        self.frame_deduplicator = FrameDeduplicator()
+        self.interpolate_gps = True  # Interpolate between fixes instead of nearest fix
+        self.telemetry_source = "gpmf"  # "gpmf" (in-process parser) or "gopro2gpx"
+        self.export_gpx = True  # Also write GPX_files/<video>.gpx when reading GPMF
+        self.telemetry_data = None
+        self._telemetry_track = None
+        self._telemetry_track_source = None
+        self.frame_sampler = FrameSampler(
+            ffmpeg_path=Processor.FFMPEG_PATH, ffprobe_path=Processor.FFPROBE_PATH
+        )
 
         print(f"{self.box = }")
 
+    @property
+    def temp_bin_file(self):
+        return os.path.join(self.work_dir, Processor.TEMP_BIN_FILE)
+
+    @property
+    def temp_gpx_file(self):
+        return os.path.join(self.work_dir, Processor.TEMP_GPX_FILE)
+
+    @property
+    def frames_folder(self):
+        return os.path.join(self.work_dir, "frames")
+
+    @property
+    def archive_frames_folder(self):
+        """Where frames for long-term storage live; separate only when the profile keeps full-res copies."""
+        if self.get_ai_input_profile().archive_full_resolution:
+            return os.path.join(self.work_dir, "frames_full")
+        return self.frames_folder
+
+    @property
+    def work_order_folder(self):
+        return os.path.join(self.work_dir, "work_order_frames")
+
+    @property
+    def timing_log_file(self):
+        return os.path.join(self.work_dir, "pipeline_timing_log.txt")
+
     @staticmethod
     def ensure_ffmpeg_installed():
         """Ensure ffmpeg and ffprobe are installed and accessible."""
@@ -57,6 +146,37 @@ class Processor:
             )
         logger.info("ffmpeg and ffprobe are installed and paths are correct.")
 
+    def get_ai_input_profile(self, crop_top=None) -> AIInputProfile:
+        """
+        Resolve ``self.ai_input_profile`` to an AIInputProfile.
+
+        With inline image submission a profile that keeps the source resolution (e.g.
+        "full") takes its size and quality from ``self.inline_ai_input_profile`` instead:
+        multi-MB frames would be base64-encoded into every request and Batch API file.
+
+        Args:
+            crop_top (int): Optional top crop that overrides the profile's own.
+
+        Returns:
+            AIInputProfile: Profile used for frames sent to the AI.
+        """
+        profile = self.ai_input_profile
+        if not isinstance(profile, AIInputProfile):
+            if profile not in AI_INPUT_PROFILES:
+                raise ValueError(
+                    f"Unknown AI input profile '{profile}'. Use one of {list(AI_INPUT_PROFILES)}."
+                )
+            profile = AI_INPUT_PROFILES[profile]
+        if self.image_submission == "inline" and not profile.long_edge:
+            inline_profile = AI_INPUT_PROFILES[self.inline_ai_input_profile]
+            profile = copy.copy(profile)
+            profile.long_edge = inline_profile.long_edge
+            profile.quality = max(profile.quality, inline_profile.quality)
+        if crop_top is not None and crop_top != profile.crop_top:
+            profile = copy.copy(profile)
+            profile.crop_top = crop_top
+        return profile
+
     def save_pipeline_settings(self, frame_rate, max_frames, batch_size):
         self.analysis_frames_per_second = frame_rate
         self.analysis_max_frames = max_frames
@@ -68,7 +188,16 @@ class Processor:
         logger.info(f"Video file {file_path} found and validated.")
 
     def extract_all_metadata(self, mp4_file_path):  # Runs at the start of the program
-        """Extracts binary metadata and converts it to GPX format."""
+        """
+        Reads GPS telemetry and the base timestamp from the video.
+
+        With ``telemetry_source = "gpmf"`` the GPMF track is parsed in-process into
+        ``self._telemetry_track``; otherwise the binary stream is dumped with FFmpeg and
+        converted to GPX with gopro2gpx.
+        """
+        if self.telemetry_source == "gpmf":
+            return self._extract_metadata_from_gpmf(mp4_file_path)
+
         logger.info(f"Extracting metadata from {mp4_file_path}...")
         try:
             # Extract binary metadata
@@ -88,17 +217,17 @@ class Processor:
                     "0:2",
                     "-f",
                     "rawvideo",
-                    Processor.TEMP_BIN_FILE,
+                    self.temp_bin_file,
                 ],
                 stdout=subprocess.DEVNULL,
                 stderr=subprocess.DEVNULL,
                 check=True,
             )
-            logger.info(f"Extracted binary metadata to {Processor.TEMP_BIN_FILE}.")
-            logger.info(f"TEMP_GPX_FILE: {Processor.TEMP_GPX_FILE}")
+            logger.info(f"Extracted binary metadata to {self.temp_bin_file}.")
+            logger.info(f"TEMP_GPX_FILE: {self.temp_gpx_file}")
 
             # Generate GPX file
-            gpx_prefix = os.path.splitext(Processor.TEMP_GPX_FILE)[0]
+            gpx_prefix = os.path.splitext(self.temp_gpx_file)[0]
             logger.info(f"GPX prefix: {gpx_prefix}")
             gopro2gpx_path = shutil.which("gopro2gpx")
 
@@ -112,31 +241,31 @@ class Processor:
             if result.returncode != 0:
                 logger.error(f"gopro2gpx failed with error:\n{result.stderr}")
                 raise RuntimeError("gopro2gpx failed. See logs for details.")
-            logger.info(f"Generated GPX file {Processor.TEMP_GPX_FILE}.")
+            logger.info(f"Generated GPX file {self.temp_gpx_file}.")
 
             # Check GPX file size and number of trackpoints
-            if not os.path.exists(Processor.TEMP_GPX_FILE):
+            if not os.path.exists(self.temp_gpx_file):
                 raise FileNotFoundError(
-                    f"GPX file {Processor.TEMP_GPX_FILE} not created."
+                    f"GPX file {self.temp_gpx_file} not created."
                 )
 
             self._save_gpx_to_folder(mp4_file_path)
 
-            tree = ET.parse(Processor.TEMP_GPX_FILE)
+            tree = ET.parse(self.temp_gpx_file)
             root = tree.getroot()
             namespaces = {"default": "http://www.topografix.com/GPX/1/1"}
             trkpts = root.findall(".//default:trkpt", namespaces)
 
             if len(trkpts) == 0:
                 raise ValueError(
-                    f"GPX file {Processor.TEMP_GPX_FILE} contains no trackpoints."
+                    f"GPX file {self.temp_gpx_file} contains no trackpoints."
                 )
 
             logger.info(
                 f"Extracted metadata from {mp4_file_path}. GPX contains {len(trkpts)} trackpoints."
             )
 
-            tree = ET.parse(Processor.TEMP_GPX_FILE)
+            tree = ET.parse(self.temp_gpx_file)
             root = tree.getroot()
 
             namespaces = {"default": "http://www.topografix.com/GPX/1/1"}
@@ -152,19 +281,51 @@ class Processor:
             logger.exception(f"Failed to extract metadata: {e}")
             raise
 
-    def _save_gpx_to_folder(self, video_filename):
-        """Save the GPX file into a GPX_files/ folder with a video-based name."""
+    def _extract_metadata_from_gpmf(self, mp4_file_path):
+        """Parse GPS5/GPS9 straight from the MP4, skipping the .bin dump and GPX round trip."""
+        logger.info(f"Reading GPMF telemetry from {mp4_file_path}...")
+        try:
+            telemetry = read_gpmf_telemetry(mp4_file_path)
+            if len(telemetry) == 0:
+                raise ValueError(f"{mp4_file_path} contains no usable GPS fixes.")
+
+            self.base_timestamp = telemetry.start_time
+            self.telemetry_data = None
+            self._telemetry_track = telemetry.to_track()
+            self._telemetry_track_source = None
+            logger.info(f"Base timestamp extracted from GPMF: {self.base_timestamp}")
+
+            if self.export_gpx:
+                telemetry.write_gpx(self._gpx_export_path(mp4_file_path))
+        except Exception as e:
+            logger.exception(f"Failed to extract metadata: {e}")
+            raise
+
+    def load_telemetry(self):
+        """
+        Make telemetry ready for the GPS join.
+
+        GPMF telemetry is already loaded as a track by ``extract_all_metadata``; the
+        gopro2gpx path still has to parse the temp GPX file.
+        """
+        if self.telemetry_source == "gpmf" and self._telemetry_track is not None:
+            return
+        self.telemetry_data = self.preprocess_gpx_file()
+
+    def _gpx_export_path(self, video_filename):
         gpx_folder = "GPX_files"
         os.makedirs(gpx_folder, exist_ok=True)
 
         base_name = os.path.splitext(os.path.basename(video_filename))[0]
-        dest_path = os.path.join(gpx_folder, f"{base_name}.gpx")
+        return os.path.join(gpx_folder, f"{base_name}.gpx")
 
-        shutil.copy2(Processor.TEMP_GPX_FILE, dest_path)
+    def _save_gpx_to_folder(self, video_filename):
+        """Save the GPX file into a GPX_files/ folder with a video-based name."""
+        dest_path = self._gpx_export_path(video_filename)
+        shutil.copy2(self.temp_gpx_file, dest_path)
         logger.info(f"Copied GPX file to {dest_path}")
 
-    @staticmethod
-    def cleanup_temp_files(*files):
+    def cleanup_temp_files(self, *files):
         """Remove temporary files."""
         for file in files:
             if os.path.exists(file):
@@ -176,13 +337,14 @@ class Processor:
             "temp_metadata.gpx",
             "temp_metadata.kml",
         ]:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
+            temp_path = os.path.join(self.work_dir, temp_file)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
 
     def preprocess_gpx_file(self):
         """Preprocess the GPX file to extract and sort all timestamps with telemetry data."""
         try:
-            tree = ET.parse(Processor.TEMP_GPX_FILE)
+            tree = ET.parse(self.temp_gpx_file)
             root = tree.getroot()
 
             namespaces = {
@@ -195,11 +357,8 @@ class Processor:
             for trkpt in root.findall(".//default:trkpt", namespaces):
                 time_element = trkpt.find("default:time", namespaces)
                 if time_element is not None:
-                    # Parse and truncate microseconds
-                    timestamp = datetime.datetime.strptime(
-                        time_element.text.strip(), "%Y-%m-%dT%H:%M:%S.%fZ"
-                    )
-                    timestamp = timestamp.replace(microsecond=0)  # Drop microseconds
+                    # Keep sub-second precision; GPS5 logs ~18 fixes per second
+                    timestamp = parse_gpx_time(time_element.text)
                     telemetry = {
                         "timestamp": timestamp,
                         "lat": float(trkpt.attrib.get("lat", 0.0)),
@@ -224,7 +383,7 @@ class Processor:
     def convert_to_gpx_timestamp(self, seconds):
         """Convert a timestamp in seconds to ISO 8601 format.
 
-        Example: ``15.5`` -> ``"2024-09-26T16:37:34Z"``.
+        Example: ``15.5`` -> ``"2024-09-26T16:37:34.500Z"``.
 
         Parameters
         ----------
@@ -234,12 +393,12 @@ class Processor:
         Returns
         -------
         str
-            ISO 8601 formatted timestamp without microseconds.
+            ISO 8601 formatted timestamp with millisecond precision.
         """
         base_time = self.base_timestamp
         delta = datetime.timedelta(seconds=seconds)
         target_time = base_time + delta
-        return target_time.replace(microsecond=0).strftime("%Y-%m-%dT%H:%M:%SZ")
+        return target_time.isoformat(timespec="milliseconds") + "Z"
 
     def get_base_timestamp_from_gpx(self):
         """
@@ -248,7 +407,7 @@ class Processor:
             datetime: The base timestamp as a datetime object.
         """
         try:
-            tree = ET.parse(Processor.TEMP_GPX_FILE)
+            tree = ET.parse(self.temp_gpx_file)
             root = tree.getroot()
 
             namespaces = {"default": "http://www.topografix.com/GPX/1/1"}
@@ -267,60 +426,49 @@ class Processor:
             logger.error(f"Failed to extract base timestamp from GPX file: {e}")
             raise
 
-    def extract_all_frames_ffmpeg(self, video_path, output_folder="frames", crop_top=0):
+    def extract_all_frames_ffmpeg(self, video_path, output_folder=None, crop_top=None):
         """
         Extracts **all** frames from a video using FFmpeg.
 
         Args:
             video_path (str): Path to the video file.
             output_folder (str): Directory to save extracted frames.
-            crop_top (int): Number of pixels to crop from the top.
+            crop_top (int): Number of pixels to crop from the top (overrides the AI input profile).
 
         Returns:
             list[tuple]: List of tuples containing frame file paths and timestamps.
         """
+        output_folder = output_folder or self.frames_folder
         if not os.path.exists(output_folder):
             os.makedirs(output_folder)
 
-        # Get video metadata using FFprobe
-        command = [
-            self.FFPROBE_PATH,
-            "-select_streams",
-            "v:0",
-            "-show_entries",
-            "stream=width,height,nb_frames,avg_frame_rate",
-            "-of",
-            "json",
-            video_path,
-        ]
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        metadata = json.loads(result.stdout)
-
-        # Get video width and height
-        video_width = int(metadata["streams"][0]["width"])
-        video_height = int(metadata["streams"][0]["height"])
+        profile = self.get_ai_input_profile(crop_top)
+        archive_pattern = None
+        if profile.archive_full_resolution:
+            os.makedirs(self.archive_frames_folder, exist_ok=True)
+            archive_pattern = os.path.join(self.archive_frames_folder, "frame_%04d.jpg")
 
-        # Ensure crop height is valid
-        crop_height = video_height - crop_top
-        if crop_height <= 0:
-            raise ValueError(
-                f"Invalid crop height: {crop_height}. Ensure crop_top is not greater than video height."
-            )
+        # Get video metadata using FFprobe
+        metadata = self.frame_sampler.probe_video(video_path)
 
-        # Extract **all** frames using FFmpeg
+        # Extract **all** frames using FFmpeg, cropped/scaled per the AI input profile
         ffmpeg_command = [
             self.FFMPEG_PATH,
             "-i",
             video_path,  # Input video
-            "-vsync",
-            "0",  # Extract every frame
-            "-frame_pts",
-            "1",  # Preserve frame order
-            "-vf",
-            f"crop={video_width}:{crop_height}:0:{crop_top}",  # Crop if needed
-            "-q:v",
-            "2",  # High-quality frames
-            os.path.join(output_folder, "frame_%04d.jpg"),  # Save frames sequentially
+            *self.frame_sampler.output_args(
+                profile,
+                metadata["width"],
+                metadata["height"],
+                os.path.join(output_folder, "frame_%04d.jpg"),  # Save frames sequentially
+                archive_target=archive_pattern,
+                output_options=(
+                    "-vsync",
+                    "0",  # Extract every frame
+                    "-frame_pts",
+                    "1",  # Preserve frame order
+                ),
+            ),
         ]
 
         try:
@@ -341,13 +489,57 @@ class Processor:
         logger.info(f"Extracted {len(extracted_frames)} frames to {output_folder}.")
         return extracted_frames
 
+    def stream_telemetry_objects(
+        self, video_path, output_folder=None, crop_top=None, add_coords=True
+    ):
+        """
+        Stream **all** frames from a video straight into in-memory TelemetryObjects.
+
+        Frames are piped out of FFmpeg as JPEG bytes and kept on ``image_bytes``, so upload
+        and archiving can read them without touching ``frames/``. Frames are only written to
+        ``output_folder`` when ``self.write_frames_to_disk`` is set; the bytes are then
+        released once the frame is uploaded or encoded, and later steps read the file.
+
+        Args:
+            video_path (str): Path to the video file.
+            output_folder (str): Directory frames would be (optionally) written to.
+            crop_top (int): Number of pixels to crop from the top (overrides the AI input profile).
+            add_coords (bool): Join GPS coordinates as each frame arrives (needs ``self.telemetry_data``).
+
+        Yields:
+            TelemetryObject: One per frame, in decode order.
+        """
+        output_folder = output_folder or self.frames_folder
+        os.makedirs(output_folder, exist_ok=True)
+
+        for index, image_bytes in self.frame_sampler.stream_frames(
+            video_path,
+            profile=self.get_ai_input_profile(crop_top),
+            archive_folder=self.archive_frames_folder,
+        ):
+            filename = f"frame_{index + 1:04d}.jpg"
+            filepath = os.path.join(output_folder, filename)
+            if self.write_frames_to_disk:
+                with open(filepath, "wb") as frame_file:
+                    frame_file.write(image_bytes)
+
+            # Timelapse frames use the frame index as their offset, same as extract_all_frames_ffmpeg
+            telemetry_object = self._create_telemetry_object(
+                (filepath, index), video_path=video_path
+            )
+            telemetry_object.image_bytes = image_bytes
+            if add_coords:
+                self._add_coords_to_telemetry_object(telemetry_object)
+            yield telemetry_object
+
     def extract_frames_ffmpeg(
         self,
         video_path,
         frame_rate=1,
-        output_folder="frames",
+        output_folder=None,
         max_frames=None,
-        crop_top=360,
+        crop_top=None,
+        sampling=None,
     ):
         """
         Extract frames at specific intervals from a video using FFmpeg, respecting max_frames.
@@ -356,93 +548,21 @@ class Processor:
             frame_rate (int): Frames per second to extract.
             output_folder (str): Directory to save extracted frames.
             max_frames (int): Maximum number of frames to extract.
+            crop_top (int): Number of pixels to crop from the top (overrides the AI input profile).
+            sampling (str): Frame sampling strategy ('stride', 'fps' or 'seek').
+                Defaults to ``self.frame_sampling``.
         Returns:
             list[tuple]: List of tuples containing frame file paths and timestamps.
         """
-        if not os.path.exists(output_folder):
-            os.makedirs(output_folder)
-
-        # Get video metadata using FFprobe
-        command = [
-            self.FFPROBE_PATH,
-            "error",
-            "-select_streams",
-            "v:0",
-            "-show_entries",
-            "stream=width,height,nb_frames,avg_frame_rate",
-            "-of",
-            "json",
-            video_path,
-        ]
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        metadata = json.loads(result.stdout)
-
-        # Calculate total frames and FPS from metadata
-        total_frames = int(metadata["streams"][0]["nb_frames"])
-        avg_frame_rate = metadata["streams"][0]["avg_frame_rate"]
-        fps = int(
-            eval(avg_frame_rate)
-        )  # Handles fractional frame rates like "30000/1001"
-
-        # Pre-calculate frame timestamps
-        frame_interval = max(1, round(fps / frame_rate))
-        target_indices = list(range(0, total_frames, frame_interval))
-        if max_frames:
-            target_indices = target_indices[:max_frames]
-
-        # Convert frame indices to timestamps
-        timestamps = [index / fps for index in target_indices]
-
-        # Get original video width and height
-        video_width = int(metadata["streams"][0]["width"])
-        video_height = int(metadata["streams"][0]["height"])
-
-        # Ensure crop height is valid
-        crop_height = video_height - crop_top
-        if crop_height <= 0:
-            raise ValueError(
-                f"Invalid crop height: {crop_height}. Ensure crop_top is not greater than video height."
-            )
-
-        # Build FFmpeg command to extract specific frames using the 'select' filter
-        select_filter = "+".join([f"eq(n\\,{index})" for index in target_indices])
-        video_basename = os.path.splitext(os.path.basename(video_path))[0]
-
-        ffmpeg_command = [
-            self.FFMPEG_PATH,
-            "-i",
+        return self.frame_sampler.sample_frames(
             video_path,
-            "-map",
-            "0:v:0",  # Process only the video stream
-            "-an",  # Disable audio processing
-            "-vf",
-            f"select='{select_filter}',setpts=N/FRAME_RATE/TB,crop={video_width}:{crop_height}:0:{crop_top}",  # Select specific frames
-            "-vsync",
-            "vfr",  # Variable frame rate
-            "-frames:v",
-            str(len(target_indices)),  # Stop after extracting the desired frames
-            os.path.join(
-                output_folder, f"{video_basename}_%04d.jpg"
-            ),  # Save frames sequentially
-        ]
-
-        # Run the FFmpeg command and handle errors
-        try:
-            subprocess.run(ffmpeg_command, check=True)
-        except subprocess.CalledProcessError as e:
-            logger.error(f"FFmpeg failed with error: {e}")
-            raise RuntimeError("Failed to extract frames using FFmpeg.")
-
-        # Generate frame file paths and return them with timestamps
-        extracted_frames = [
-            (
-                os.path.join(output_folder, f"{video_basename}_{i + 1:04d}.jpg"),
-                timestamps[i],
-            )
-            for i in range(len(timestamps))
-        ]
-        logger.info(f"Extracted {len(extracted_frames)} frames to {output_folder}.")
-        return extracted_frames
+            frame_rate=frame_rate,
+            output_folder=output_folder or self.frames_folder,
+            max_frames=max_frames,
+            strategy=sampling or self.frame_sampling,
+            profile=self.get_ai_input_profile(crop_top),
+            archive_folder=self.archive_frames_folder,
+        )
 
     def create_telemetry_objects(
         self, extracted_frame_tuples: list, video_path: str = "Default"
@@ -474,13 +594,22 @@ class Processor:
         )
         return telemetry_object
 
+    def get_telemetry_track(self) -> TelemetryTrack:
+        """Columnar view of ``self.telemetry_data``, built once per video and reused per frame."""
+        if (
+            self._telemetry_track is None
+            or self._telemetry_track_source is not self.telemetry_data
+        ):
+            self._telemetry_track = TelemetryTrack.from_telemetry_data(
+                self.telemetry_data or []
+            )
+            self._telemetry_track_source = self.telemetry_data
+        return self._telemetry_track
+
     def add_coords_to_telemetry_objects(
         self, telemetry_objects: list
     ):  # Runs once, using all telemetry_objects created in create_telemetry_objects
-        telemetry_objects = telemetry_objects
-
-        for object in telemetry_objects:
-            self._add_coords_to_telemetry_object(object)
+        self._join_track_to_telemetry_objects(telemetry_objects)
 
         logger.info(
             f"Collected and saved coordinates for {len(telemetry_objects)} telemetry objects."
@@ -489,18 +618,93 @@ class Processor:
 
     def _add_coords_to_telemetry_object(
         self, telemetry_object
-    ):  # Runs for each telemetry_object in add_coords_to_telemetry_objects
-        timestamp = self.convert_to_gpx_timestamp(telemetry_object.timestamp)
-        telemetry = self.get_telemetry_for_timestamp_binary(
-            timestamp, self.telemetry_data
-        )
-        telem_lat = telemetry.get("lat", 0.0)
-        telem_lon = telemetry.get("lon", 0.0)
-        telemetry_object.lat = telem_lat
-        telemetry_object.lon = telem_lon
-        telemetry_object.timestamp = timestamp
+    ):  # Runs for a single streamed frame; same join as add_coords_to_telemetry_objects
+        self._join_track_to_telemetry_objects([telemetry_object])
         return telemetry_object
 
+    def _join_track_to_telemetry_objects(self, telemetry_objects: list):
+        """
+        Look up GPS for every frame offset with one vectorized search over the track.
+
+        Frame ``timestamp`` offsets (seconds from ``self.base_timestamp``) are replaced by
+        their ISO 8601 GPX timestamps, and ``lat``/``lon`` are filled in.
+        """
+        if not telemetry_objects:
+            return
+        track = self.get_telemetry_track()
+
+        base_timestamp = self.base_timestamp
+        if base_timestamp is None and len(track):
+            base_timestamp = datetime.datetime.fromtimestamp(
+                track.times[0], tz=datetime.timezone.utc
+            ).replace(tzinfo=None)
+            logger.warning("No GPX base timestamp; using the first trackpoint time.")
+
+        epoch_times = TelemetryTrack.offsets_to_epoch(
+            [obj.timestamp for obj in telemetry_objects], base_timestamp
+        )
+        telemetry = track.lookup(epoch_times, interpolate=self.interpolate_gps)
+        gpx_timestamps = TelemetryTrack.format_gpx_timestamps(epoch_times)
+
+        for i, telemetry_object in enumerate(telemetry_objects):
+            telemetry_object.lat = float(telemetry["lat"][i])
+            telemetry_object.lon = float(telemetry["lon"][i])
+            speed = float(telemetry["speed"][i])
+            telemetry_object.speed = None if np.isnan(speed) else speed
+            telemetry_object.timestamp = gpx_timestamps[i]
+
+    def deduplicate_frames(self, telemetry_objects, all_frames: list = None):
+        """
+        Fold near-duplicate frames into the last kept frame (see ``FrameDeduplicator``).
+
+        Args:
+            telemetry_objects (iterable): Frames in order, with GPS joined. A list gives a
+                list back; a generator of streamed frames stays a generator.
+            all_frames (list): Filled with every frame, duplicates included, as frames pass
+                through; hand it to ``restore_duplicate_frames`` after analysis.
+
+        Returns:
+            list or generator: Kept frames, each with ``represents_frames`` set.
+        """
+        if all_frames is not None:
+            if isinstance(telemetry_objects, list):
+                all_frames.extend(telemetry_objects)
+            else:
+                telemetry_objects = _record_frames(telemetry_objects, all_frames)
+        if not self.dedup_frames:
+            return telemetry_objects
+        kept = self.frame_deduplicator.filter(telemetry_objects)
+        return list(kept) if isinstance(telemetry_objects, list) else kept
+
+    def restore_duplicate_frames(self, telemetry_objects: list, all_frames: list) -> list:
+        """
+        Put near-duplicate frames back next to the frames they were folded into.
+
+        Duplicates skip upload and analysis, but they belong to the saved dataset and the
+        Box archive, so each gets a copy of its kept frame's (checked) analysis.
+
+        Args:
+            telemetry_objects (list): Analyzed kept frames.
+            all_frames (list): Every frame in order, from ``deduplicate_frames``.
+
+        Returns:
+            list: ``telemetry_objects`` plus their duplicates, in frame order.
+        """
+        kept_ids = {id(obj) for obj in telemetry_objects}
+        restored = []
+        for obj in all_frames:
+            if id(obj) in kept_ids:
+                restored.append(obj)
+            elif obj.duplicate_of is not None and id(obj.duplicate_of) in kept_ids:
+                obj.analysis_results = dict(obj.duplicate_of.analysis_results or {})
+                obj.first_pass_analysis = obj.duplicate_of.first_pass_analysis
+                restored.append(obj)
+        if len(restored) > len(telemetry_objects):
+            logger.info(
+                f"Restored {len(restored) - len(telemetry_objects)} near-duplicate frames with their kept frame's analysis."
+            )
+        return restored
+
     def get_telemetry_for_timestamp_binary(self, target_time, telemetry_data) -> dict:
         """
         Find the GPS telemetry closest to the specified timestamp using binary search.
@@ -513,11 +717,7 @@ class Processor:
             dict: Telemetry data closest to the target timestamp.
         """
         try:
-            # Parse and truncate microseconds
-            target_time_dt = datetime.datetime.strptime(
-                target_time, "%Y-%m-%dT%H:%M:%SZ"
-            )
-            target_time_dt = target_time_dt.replace(microsecond=0)
+            target_time_dt = parse_gpx_time(target_time)
 
             # Extract all timestamps from telemetry data
             timestamps = [entry["timestamp"] for entry in telemetry_data]
@@ -551,7 +751,7 @@ class Processor:
     def get_telemetry_for_timestamp(self, target_time) -> dict:
         """Extract GPS coordinates closest to a specified timestamp from the GPX file."""
         try:
-            tree = ET.parse(Processor.TEMP_GPX_FILE)
+            tree = ET.parse(self.temp_gpx_file)
             root = tree.getroot()
 
             namespaces = {
@@ -606,12 +806,20 @@ class Processor:
         - profit
     """
 
-    def get_ai_analyses(self, telemetry_objects: list, batch_size: int = 3) -> list:
+    async def get_ai_analyses(
+        self,
+        telemetry_objects: list,
+        batch_size: int = 3,
+        on_batch_analyzed=None,
+    ) -> list:
+        if self.adaptive_batch_size:
+            batch_size = None
         analyzed_telem_objects, file_upload_start, image_analysis_start = (
-            self.ai.analyze_images_with_ai(
+            await self.ai.analyze_images_with_ai_async(
                 telemetry_objects=telemetry_objects,
                 batch_size=batch_size,
-                multithreaded=True,
+                inline_images=self.image_submission == "inline",
+                on_batch_analyzed=on_batch_analyzed,
             )
         )
         logger.info(
@@ -619,17 +827,118 @@ class Processor:
         )
         return analyzed_telem_objects
 
-    def get_checker_ai_analyses(
+    async def get_checker_ai_analyses(
         self, telemetry_objects: list, batch_size: int = 3
     ) -> list:
         print("Rechecking files!")
-        analyzed_telem_objects = self.ai.analyze_images_with_checker_ai(
+        if self.adaptive_batch_size:
+            batch_size = None
+        for obj in telemetry_objects:
+            obj.first_pass_analysis = obj.analysis_results  # Kept when the checker overrides it
+        analyzed_telem_objects = await self.ai.analyze_images_with_checker_ai_async(
             telemetry_objects=telemetry_objects,
             batch_size=batch_size,
-            multithreaded=True,
+            inline_images=self.image_submission == "inline",
         )
         return analyzed_telem_objects
 
+    @staticmethod
+    def _is_positive(telemetry_object) -> bool:
+        return (telemetry_object.analysis_results or {}).get("pothole") == "yes"
+
+    def queue_positives_for_checker(self, checker_queue, loop, telemetry_objects):
+        """
+        Queue a first-pass batch's pothole positives for the streaming checker.
+
+        Safe to call from any thread or event loop (the AI calls it on its request loop).
+        """
+        for telemetry_object in telemetry_objects:
+            if self._is_positive(telemetry_object):
+                loop.call_soon_threadsafe(checker_queue.put_nowait, telemetry_object)
+
+    async def run_streaming_checker(self, checker_queue, batch_size: int = 3) -> list:
+        """
+        Re-check positives as they arrive on ``checker_queue``, until the end sentinel.
+
+        Whatever has queued up when a checker worker frees up goes out as one batch, so
+        positives are re-checked while the first pass is still running. Workers are capped
+        by ``stage_concurrency["checker"]`` (and the scheduler's own "checker" limit), so
+        the checker never takes first-pass run slots.
+
+        Args:
+            checker_queue (asyncio.Queue): Positive frames, then ``_STAGE_DONE``.
+            batch_size (int): Largest checker batch (adaptive sizing may choose).
+
+        Returns:
+            list: Frames returned by the checker, ready for ``merge_checker_results``.
+        """
+        checked_objects = []
+        batch_queue = asyncio.Queue(maxsize=1)  # Batch only when a worker is ready
+
+        async def _batch_positives():
+            finished = False
+            while not finished:
+                telemetry_object = await checker_queue.get()
+                if telemetry_object is _STAGE_DONE:
+                    break
+                batch = [telemetry_object]
+                max_size = (
+                    self.ai.batch_sizer("checker").next_size()
+                    if self.adaptive_batch_size
+                    else batch_size
+                )
+                while len(batch) < max_size and not checker_queue.empty():
+                    telemetry_object = checker_queue.get_nowait()
+                    if telemetry_object is _STAGE_DONE:
+                        finished = True
+                        break
+                    batch.append(telemetry_object)
+                await batch_queue.put(batch)
+            await batch_queue.put(_STAGE_DONE)
+
+        async def _check(batch):
+            checked_objects.extend(
+                await self.get_checker_ai_analyses(batch, batch_size=len(batch))
+            )
+            return None
+
+        await asyncio.gather(
+            _batch_positives(),
+            self._run_stage(
+                _check, batch_queue, None, self.stage_concurrency.get("checker", 2)
+            ),
+        )
+        return checked_objects
+
+    def merge_checker_results(self, telemetry_objects: list, checked_objects: list) -> int:
+        """
+        Fold checker re-assessments into the full frame list, matched by filename.
+
+        Frames the checker did not review keep their first-pass analysis, so the whole
+        video's dataset stays intact for saving, Box and work orders.
+
+        Args:
+            telemetry_objects (list): Every analyzed frame of the video.
+            checked_objects (list): Frames returned by the checker pass.
+
+        Returns:
+            int: Number of frames whose analysis the checker replaced.
+        """
+        frames_by_key = {obj.filename: obj for obj in telemetry_objects}
+        merged = 0
+        for checked in checked_objects:
+            frame = frames_by_key.get(checked.filename)
+            if frame is None or checked.analysis_results is checked.first_pass_analysis:
+                continue  # Not in this video, or the checker returned nothing for it
+            if frame is not checked:
+                frame.first_pass_analysis = checked.first_pass_analysis
+                frame.analysis_results = checked.analysis_results
+            merged += 1
+        logger.info(
+            f"Checker re-assessed {merged} of {len(checked_objects)} positive detections."
+        )
+        return merged
+
     def save_telemetry_objects(self, telemetry_objects: list):
         """
         Save each telemetry object as a JSON file in the same folder as the frame JPG.
@@ -647,7 +956,7 @@ class Processor:
             else:
                 flat_telemetry_objects.append(item)
 
-        work_order_folder = "work_order_frames"
+        work_order_folder = self.work_order_folder
         os.makedirs(work_order_folder, exist_ok=True)
 
         for obj in flat_telemetry_objects:
@@ -655,6 +964,7 @@ class Processor:
             frame_base = os.path.splitext(os.path.basename(obj.filepath))[0]
             json_filename = f"{video_base}_{frame_base}.json"
             json_path = os.path.join(os.path.dirname(obj.filepath), json_filename)
+            os.makedirs(os.path.dirname(json_path) or ".", exist_ok=True)
 
             telemetry_data = {
                 "filename": obj.filename,
@@ -666,7 +976,10 @@ class Processor:
                 "openai_file_id": obj.openai_file_id,
                 "box_file_id": obj.box_file_id,
                 "box_file_url": obj.box_file_url,
+                "represents_frames": obj.represents_frames,
+                "duplicate_of": obj.duplicate_of_filename(),
                 "analysis_results": obj.analysis_results,
+                "first_pass_analysis": obj.first_pass_analysis,
             }
             with open(json_path, "w") as json_file:
                 json.dump(telemetry_data, json_file, indent=4)
@@ -676,16 +989,25 @@ class Processor:
             pothole = ai_analysis.get("pothole", "no")
             pothole_confidence = ai_analysis.get("pothole_confidence", 0)
 
-            if pothole == "yes" and pothole_confidence >= 0.9:
+            # Near-duplicates share their kept frame's analysis; one work order frame is enough
+            if (
+                pothole == "yes"
+                and pothole_confidence >= 0.9
+                and obj.duplicate_of is None
+            ):
                 # Copy frame and metadata JSON to work_order_frames/
                 work_order_frame_path = os.path.join(
                     work_order_folder, os.path.basename(obj.filepath)
                 )
 
-                shutil.copy2(obj.filepath, work_order_frame_path)
+                if obj.image_bytes is not None:
+                    with open(work_order_frame_path, "wb") as frame_file:
+                        frame_file.write(obj.image_bytes)
+                else:
+                    shutil.copy2(obj.filepath, work_order_frame_path)
 
                 logger.info(
-                    f"Copied {obj.filename} to work_order_frames/ (Pothole confidence: {pothole_confidence})"
+                    f"Copied {obj.filename} to {work_order_folder}/ (Pothole confidence: {pothole_confidence})"
                 )
 
         logger.info(f"Saved {len(telemetry_objects)} telemetry objects as JSON files.")
@@ -703,8 +1025,35 @@ class Processor:
             json.dump(analyses, json_file, indent=4)
         logger.info(f"Saved all analyses in {output_path}.")
 
+    def report_analysis_coverage(self, telemetry_objects: list) -> dict:
+        """
+        Count frames that have an AI analysis and log the ones that don't.
+
+        Args:
+            telemetry_objects (list): Frames after AI analysis.
+
+        Returns:
+            dict: ``frames``, ``analyzed``, ``coverage`` (0-1) and ``missing`` filenames;
+                also kept in ``self.analysis_coverage``.
+        """
+        missing = [obj.filename for obj in telemetry_objects if not obj.has_analysis()]
+        analyzed = len(telemetry_objects) - len(missing)
+        self.analysis_coverage = {
+            "frames": len(telemetry_objects),
+            "analyzed": analyzed,
+            "coverage": analyzed / len(telemetry_objects) if telemetry_objects else 1.0,
+            "missing": missing,
+        }
+        message = f"AI analysis coverage: {analyzed}/{len(telemetry_objects)} frames"
+        if missing:
+            logger.warning(f"{message}; missing: {', '.join(missing)}")
+        else:
+            logger.info(message)
+        return self.analysis_coverage
+
     def calculate_video_coverage(self, telemetry_objects: list):
-        num_frames = len(telemetry_objects)
+        # Deduplicated frames still cover the footage they stand in for
+        num_frames = sum(obj.represents_frames for obj in telemetry_objects)
         analysis_frames_per_second = self.analysis_frames_per_second
         seconds_analyzed = round(num_frames / analysis_frames_per_second)
         minutes_analyzed = seconds_analyzed // 60
@@ -725,6 +1074,450 @@ class Processor:
         else:
             logger.warning(f"Attempted to update an unknown stage: {stage_name}")
 
+    async def _run_stage(self, worker, in_queue, out_queue, concurrency=1):
+        """
+        Run ``concurrency`` copies of ``worker`` over ``in_queue`` until the end sentinel arrives.
+
+        ``worker`` is an async callable that takes one item and returns the item to pass
+        downstream (or None to drop it). Once every copy has finished, the end sentinel is
+        forwarded to ``out_queue`` so the next stage knows the stream is over.
+        """
+
+        async def _worker_loop():
+            while True:
+                item = await in_queue.get()
+                if item is _STAGE_DONE:
+                    await in_queue.put(_STAGE_DONE)  # Let sibling workers see it too
+                    return
+                result = await worker(item)
+                if result is not None and out_queue is not None:
+                    await out_queue.put(result)
+
+        await asyncio.gather(*[_worker_loop() for _ in range(max(1, concurrency))])
+        if out_queue is not None:
+            await out_queue.put(_STAGE_DONE)
+
+    async def run_overlapped_stages(
+        self,
+        video_path,
+        frame_rate=0.5,
+        max_frames=None,
+        batch_size=6,
+        on_batch_analyzed=None,
+        all_frames: list = None,
+    ) -> list:
+        """
+        Metadata, frame extraction, GPS join, upload and AI analysis as one queue pipeline.
+
+        Each stage hands work to the next through a bounded asyncio queue, so frame N+1 is
+        extracted while frame N uploads and batch K is with the model. Worker counts per stage
+        come from ``self.stage_concurrency``; queue depth from ``self.stage_queue_size``.
+
+        Timelapse frames always come from the streaming producer (``stream_telemetry_objects``),
+        whatever ``self.stream_frames`` says, so the first frame is queued as soon as FFmpeg
+        encodes it. Video mode has no streaming extractor: sampled frames are written to disk in
+        one FFmpeg run and only then queued, so extraction finishes before GPS join starts;
+        the stages after it still overlap each other.
+
+        Args:
+            video_path (str): Path to the video file.
+            frame_rate (float): Frames per second to extract (video mode).
+            max_frames (int): Maximum number of frames to extract (video mode).
+            batch_size (int): Number of telemetry objects per AI analysis batch.
+            on_batch_analyzed (callable): Called with each analyzed batch (and each cache
+                hit) as it completes, e.g. to feed the streaming checker.
+            all_frames (list): Filled with every extracted frame, near-duplicates included,
+                for ``restore_duplicate_frames``.
+
+        Returns:
+            list: Kept telemetry objects in frame order, with analysis results where
+                available.
+        """
+        loop = asyncio.get_running_loop()
+        frame_queue = asyncio.Queue(maxsize=self.stage_queue_size)
+        located_queue = asyncio.Queue(maxsize=self.stage_queue_size)
+        deduped_queue = asyncio.Queue(maxsize=self.stage_queue_size)
+        uploaded_queue = asyncio.Queue(maxsize=self.stage_queue_size)
+        analysis_queue = asyncio.Queue(maxsize=self.stage_queue_size)
+        stop_producing = threading.Event()
+        all_objects = [] if all_frames is None else all_frames
+        stage_seconds = {}
+
+        async def _load_telemetry():
+            # Metadata runs alongside extraction; only the GPS join has to wait for it
+            await asyncio.to_thread(self.extract_all_metadata, video_path)
+            await asyncio.to_thread(self.load_telemetry)
+
+        def _produce_frames():
+            start_time = time.time()
+            if self.mode == "timelapse":
+                frames = self.stream_telemetry_objects(
+                    video_path, output_folder=self.frames_folder, add_coords=False
+                )
+            else:
+                # No streaming extractor for sampled frames; they are queued once written
+                frames = self.create_telemetry_objects(
+                    self.extract_frames_ffmpeg(
+                        video_path=video_path,
+                        frame_rate=frame_rate,
+                        max_frames=max_frames,
+                    ),
+                    video_path,
+                )
+            try:
+                for telemetry_object in frames:
+                    if stop_producing.is_set():
+                        break
+                    all_objects.append(telemetry_object)
+                    # Blocks while the queue is full, which throttles FFmpeg
+                    asyncio.run_coroutine_threadsafe(
+                        frame_queue.put(telemetry_object), loop
+                    ).result()
+            finally:
+                if hasattr(frames, "close"):
+                    frames.close()  # Stops the FFmpeg pipe if we bailed out early
+                asyncio.run_coroutine_threadsafe(
+                    frame_queue.put(_STAGE_DONE), loop
+                ).result()
+                stage_seconds["Frame Extraction"] = time.time() - start_time
+
+        async def _add_coords(telemetry_object):
+            await telemetry_task
+            return self._add_coords_to_telemetry_object(telemetry_object)
+
+        async def _dedup(telemetry_object):
+            if not self.dedup_frames:
+                return telemetry_object
+            if await asyncio.to_thread(self.frame_deduplicator.keep, telemetry_object):
+                return telemetry_object
+            return None  # Kept in all_objects, skipped for upload and analysis
+
+        async def _upload(telemetry_object):
+            if await asyncio.to_thread(
+                self.ai.apply_cached_analysis, telemetry_object, "batch"
+            ):
+                if on_batch_analyzed is not None:
+                    on_batch_analyzed([telemetry_object])
+                return None  # Already analyzed on an earlier run
+            if inline_images:
+                return telemetry_object  # Encoded into the analysis request instead
+            try:
+                file = await self.ai.upload_image_async(
+                    telemetry_object.filepath, telemetry_object.image_bytes
+                )
+                telemetry_object.openai_file_id = file.id
+                telemetry_object.release_image_bytes()
+                return telemetry_object
+            except Exception as e:
+                logger.ai(f"Failed to upload {telemetry_object.filepath}: {e}")
+                return None  # Kept in all_objects, skipped for analysis
+
+        async def _batch_uploads():
+            batch = []
+            while True:
+                telemetry_object = await uploaded_queue.get()
+                if telemetry_object is _STAGE_DONE:
+                    break
+                batch.append(telemetry_object)
+                target_size = (
+                    self.ai.batch_sizer("batch").next_size()
+                    if self.adaptive_batch_size
+                    else batch_size
+                )
+                if len(batch) >= target_size:
+                    await analysis_queue.put(batch)
+                    batch = []
+            if batch:
+                await analysis_queue.put(batch)
+            await analysis_queue.put(_STAGE_DONE)
+
+        async def _analyze(batch):
+            await self.ai.get_n_analyses_async(batch, "batch", inline_images)
+            if on_batch_analyzed is not None:
+                on_batch_analyzed(batch)
+            return None
+
+        async def _timed(stage_name, coroutine):
+            start_time = time.time()
+            await coroutine
+            stage_seconds[stage_name] = time.time() - start_time
+
+        await asyncio.to_thread(self.ai.analysis_source_id, "batch")
+        inline_images = self.ai.use_inline_images(self.image_submission == "inline")
+        self.frame_deduplicator.reset()
+        pipeline_start = time.time()
+        telemetry_task = asyncio.create_task(_timed("Metadata", _load_telemetry()))
+        stage_tasks = [
+            telemetry_task,
+            asyncio.create_task(asyncio.to_thread(_produce_frames)),
+            asyncio.create_task(
+                _timed(
+                    "GPS Join",
+                    self._run_stage(
+                        _add_coords,
+                        frame_queue,
+                        located_queue,
+                        self.stage_concurrency.get("gps", 1),
+                    ),
+                )
+            ),
+            asyncio.create_task(
+                # One worker: dedup compares each frame with the previous kept one
+                _timed("Dedup", self._run_stage(_dedup, located_queue, deduped_queue))
+            ),
+            asyncio.create_task(
+                _timed(
+                    "Upload",
+                    self._run_stage(
+                        _upload,
+                        deduped_queue,
+                        uploaded_queue,
+                        self.stage_concurrency.get("upload", 8),
+                    ),
+                )
+            ),
+            asyncio.create_task(_batch_uploads()),
+            asyncio.create_task(
+                _timed(
+                    "AI Analysis",
+                    self._run_stage(
+                        _analyze,
+                        analysis_queue,
+                        None,
+                        self.stage_concurrency.get("analysis", 4),
+                    ),
+                )
+            ),
+        ]
+
+        try:
+            await asyncio.gather(*stage_tasks)
+        except Exception:
+            # Unblock the extraction thread and tear the other stages down
+            stop_producing.set()
+            for task in stage_tasks:
+                task.cancel()
+            while not frame_queue.empty():
+                frame_queue.get_nowait()
+            raise
+
+        for stage_name, seconds in stage_seconds.items():
+            logger.info(f"Overlapped stage '{stage_name}' finished after {seconds:.2f}s")
+        logger.info(
+            f"Overlapped stages processed {len(all_objects)} frames in {time.time() - pipeline_start:.2f}s"
+        )
+        kept = [obj for obj in all_objects if obj.duplicate_of is None]
+        if len(kept) < len(all_objects):
+            logger.info(
+                f"Skipped analysis of {len(all_objects) - len(kept)} near-duplicate frames."
+            )
+        return kept
+
+    def log_timing(self, stage, start_time):
+        """Log how long a pipeline step took and append it to the video's timing log."""
+        duration = time.time() - start_time
+        message = f"{stage} took {duration:.2f} seconds\n"
+        logger.info(message.strip())
+        with open(self.timing_log_file, "a") as log:
+            log.write(message)
+        return duration
+
+    async def run_checker(self, telemetry_objects: list):
+        """Step 6.5 after the first pass: re-check every positive and merge the verdicts."""
+        positive_detections = [i for i in telemetry_objects if self._is_positive(i)]
+        print(f"There are {len(positive_detections)} positive detections to re-check")
+        if positive_detections:
+            checked_objects = await self.get_checker_ai_analyses(positive_detections)
+            self.merge_checker_results(telemetry_objects, checked_objects)
+
+    async def finish_video_pipeline(
+        self, telemetry_objects: list, all_frames: list, video_path, total_start_time
+    ) -> list:
+        """
+        Steps 7-9 once analysis and the checker are done: save, archive to Box, clean up.
+
+        Args:
+            telemetry_objects (list): Analyzed kept frames.
+            all_frames (list): Every frame in order, near-duplicates included.
+            video_path (str): Path to the video file.
+            total_start_time (float): When processing started, for the timing log.
+
+        Returns:
+            list: Fully processed telemetry objects with analysis results.
+        """
+        # Near-duplicates were only skipped for analysis; keep them in what gets saved
+        telemetry_objects = self.restore_duplicate_frames(telemetry_objects, all_frames)
+
+        # Step 7: Save telemetry objects as individual JSON files
+        stage_start = time.time()
+        logger.info("Step 7: Save telemetry objects as individual JSON files")
+        await asyncio.to_thread(self.save_telemetry_objects, telemetry_objects)
+        self.log_timing("Step 7: Save telemetry objects", stage_start)
+
+        self.update_stage("AI Analysis", "Complete")
+        self.update_stage("Finalization", "In Progress")
+
+        # Step 8: Create and save an overview.json file
+        stage_start = time.time()
+        logger.info("Step 8: Create and save an overview.json file")
+        self.save_full_list(
+            telemetry_objects=telemetry_objects,
+            output_path=os.path.join(self.work_dir, "default_all_frames.json"),
+        )
+        self.log_timing(
+            "Step 8: Create and save overview.json and all_frame_analyses.json",
+            stage_start,
+        )
+
+        # Step 9: Cleanup files and archive data in Box
+        logger.info("Step 9: Cleanup files and archive data in Box")
+        self.cleanup_temp_files(self.temp_gpx_file)
+        archives_full_resolution = self.archive_frames_folder != self.frames_folder
+        telemetry_objects = await self.box.save_frames_to_long_term_storage(
+            source_normals_folder=self.archive_frames_folder,
+            source_wos_folder=self.work_order_folder,
+            telemetry_objects=telemetry_objects,
+            greenway_mode=False,
+            video_path=video_path,
+            archive_in_memory_frames=not archives_full_resolution,
+        )
+        if archives_full_resolution:
+            # Box clears the archive folder; the downscaled AI frames are no longer needed
+            shutil.rmtree(self.frames_folder, ignore_errors=True)
+
+        logger.info("Deleting any OpenAI files that were created.")
+        openai_file_ids = [
+            obj.openai_file_id for obj in telemetry_objects if obj.openai_file_id
+        ]
+        await self.ai.delete_files_async(openai_file_ids)
+
+        # Finalize
+        total_duration = time.time() - total_start_time
+        logger.info("Video processing pipeline completed successfully.")
+        self.calculate_video_coverage(telemetry_objects)
+        logger.info(
+            f"Analyzed {len(telemetry_objects)} frames, covering {self.minutes_analyzed} minutes of footage."
+        )
+        with open(self.timing_log_file, "a") as log:
+            log.write(f"Total pipeline duration: {total_duration:.2f} seconds\n")
+
+        self.update_stage("Finalization", "Complete")
+
+        return telemetry_objects
+
+    @staticmethod
+    def deferred_job_name(video_path) -> str:
+        return os.path.splitext(os.path.basename(video_path))[0]
+
+    @property
+    def deferred_state_file(self):
+        return os.path.join(self.work_dir, "deferred_frames.json")
+
+    async def submit_deferred_analyses(
+        self, telemetry_objects, batch_size, video_path, all_frames: list
+    ) -> tuple:
+        """
+        Step 6 in deferred mode: submit the frames to the Batch API without waiting.
+
+        While a batch is pending, every frame is saved to ``deferred_state_file`` so that
+        ``finish_deferred_video`` can run Steps 6.5-9 later, after a restart too.
+
+        Args:
+            telemetry_objects (iterable): Kept frames, with GPS joined.
+            batch_size (int): Images per request line.
+            video_path (str): Path to the video file.
+            all_frames (list): Every frame, near-duplicates included.
+
+        Returns:
+            tuple: (kept frames in order, cache hits analyzed; the batch job record, or
+                None when there is nothing to wait for)
+        """
+        if self.adaptive_batch_size:
+            batch_size = None
+        telemetry_objects, job = await self.ai.submit_images_deferred_async(
+            telemetry_objects,
+            batch_size=batch_size,
+            job_name=self.deferred_job_name(video_path),
+            inline_images=self.image_submission == "inline",
+            context={"video": os.path.basename(video_path), "mode": self.mode},
+        )
+        if job is not None:
+            await asyncio.to_thread(self.save_deferred_state, all_frames, video_path)
+        return telemetry_objects, job
+
+    def save_deferred_state(self, all_frames: list, video_path):
+        """Write the frames and settings Steps 6.5-9 need; in-memory frames go to disk."""
+        for obj in all_frames:
+            if obj.image_bytes is not None and not os.path.isfile(obj.filepath):
+                os.makedirs(os.path.dirname(obj.filepath) or ".", exist_ok=True)
+                with open(obj.filepath, "wb") as frame_file:
+                    frame_file.write(obj.image_bytes)
+            obj.release_image_bytes()
+        state = {
+            "video_path": video_path,
+            "frame_rate": self.analysis_frames_per_second,
+            "max_frames": self.analysis_max_frames,
+            "frames": [obj.to_state_dict() for obj in all_frames],
+        }
+        os.makedirs(self.work_dir, exist_ok=True)
+        with open(self.deferred_state_file, "w") as state_file:
+            json.dump(state, state_file)
+
+    def load_deferred_state(self) -> tuple:
+        """
+        Read back what ``save_deferred_state`` wrote.
+
+        Returns:
+            tuple: (video path, every frame in order with ``duplicate_of`` re-linked)
+        """
+        with open(self.deferred_state_file) as state_file:
+            state = json.load(state_file)
+        self.save_pipeline_settings(
+            frame_rate=state["frame_rate"], max_frames=state["max_frames"], batch_size=None
+        )
+        all_frames = []
+        by_filename = {}
+        for data in state["frames"]:
+            telemetry_object = TelemetryObject.from_state_dict(data)
+            # Duplicates always follow the frame they were folded into
+            telemetry_object.duplicate_of = by_filename.get(data.get("duplicate_of"))
+            by_filename[telemetry_object.filename] = telemetry_object
+            all_frames.append(telemetry_object)
+        return state["video_path"], all_frames
+
+    async def finish_deferred_video(self) -> list:
+        """
+        Steps 6.5-9 for a video whose frames were submitted to the Batch API earlier.
+
+        Checks the batch once and returns straight away while it is still running.
+
+        Returns:
+            list: Fully processed telemetry objects, or None while the batch is running.
+        """
+        video_path, all_frames = await asyncio.to_thread(self.load_deferred_state)
+        job_name = self.deferred_job_name(video_path)
+        telemetry_objects = await self.ai.collect_images_deferred_async(
+            job_name, [obj for obj in all_frames if obj.duplicate_of is None]
+        )
+        if telemetry_objects is None:
+            return None
+
+        try:
+            total_start_time = time.time()
+            self.update_stage("AI Analysis", "In Progress")
+            self.report_analysis_coverage(telemetry_objects)
+            await self.run_checker(telemetry_objects)
+            telemetry_objects = await self.finish_video_pipeline(
+                telemetry_objects, all_frames, video_path, total_start_time
+            )
+        except Exception as e:
+            logger.error(f"Error finishing deferred video {video_path}: {e}")
+            raise
+        # Only now: if Steps 7-9 fail, the next check collects the batch again
+        self.ai.batch_jobs.remove(job_name)
+        os.remove(self.deferred_state_file)
+        return telemetry_objects
+
     async def process_video_pipeline(
         self,
         video_path,
@@ -732,6 +1525,7 @@ class Processor:
         max_frames=None,
         batch_size=6,
         mode="timelapse",
+        stage_concurrency: dict = None,
     ):
         """
         Process a video end-to-end, extracting frames, creating telemetry objects,
@@ -742,29 +1536,28 @@ class Processor:
             frame_rate (int): Frames per second to extract.
             max_frames (int): Maximum number of frames to extract.
             batch_size (int): Number of telemetry objects per AI analysis batch.
+            stage_concurrency (dict): Per-stage worker limits for overlapped mode,
+                e.g. ``{"upload": 8, "analysis": 4}``. Merged into ``self.stage_concurrency``.
 
         Returns:
-            list: Fully processed telemetry objects with analysis results.
+            list: Fully processed telemetry objects with analysis results, or None when
+                deferred analysis was submitted and the video waits for its batch (see
+                ``finish_deferred_video``).
         """
 
         self.mode = mode
-        log_file = "pipeline_timing_log.txt"
+        if stage_concurrency:
+            self.stage_concurrency.update(stage_concurrency)
 
         # update the video path to pull from unprocessed_videos/ for Non-Greenway mode
         video_path = f"unprocessed_videos/{video_path}"
         # video_path = f"unprocessed_greenway_videos/{video_path}"
 
-        with open(log_file, "w") as log:
+        with open(self.timing_log_file, "w") as log:
             log.write("Stage Timing Log:\n")
 
-        def log_timing(stage, start_time):
-            duration = time.time() - start_time
-            message = f"{stage} took {duration:.2f} seconds\n"
-            logger.info(message.strip())
-            with open(log_file, "a") as log:
-                log.write(message)
-            return duration
-
+        checker_task = None
+        all_frames = []  # Every frame; near-duplicates rejoin after analysis
         try:
             self.update_stage("Metadata", "In Progress")
             total_start_time = time.time()
@@ -774,132 +1567,175 @@ class Processor:
             self.save_pipeline_settings(
                 frame_rate=frame_rate, max_frames=max_frames, batch_size=batch_size
             )
-            log_timing("Step 0: Save pipeline settings", stage_start)
+            if self.image_submission == "inline":
+                logger.info(
+                    f"Inline image submission: AI frames capped at {self.get_ai_input_profile().long_edge}px"
+                )
+            self.log_timing("Step 0: Save pipeline settings", stage_start)
 
             # Step 1: Validate the video file
 
             stage_start = time.time()
             logger.info("Step 1: Validate the video file")
             self.validate_video_file(video_path)
-            log_timing("Step 1: Validate the video file", stage_start)
-
-            # Step 2: Extract metadata and prepare GPX
-            stage_start = time.time()
-            logger.info("Step 2: Extract metadata and prepare GPX")
-            self.extract_all_metadata(video_path)
-            log_timing("Step 2: Extract metadata and prepare GPX", stage_start)
-
-            self.update_stage("Metadata", "Complete")
-            self.update_stage("Frame Extraction", "In Progress")
-
-            # Step 3: Extract frames from the video
+            self.log_timing("Step 1: Validate the video file", stage_start)
+
+            # Step 6.5 (checker) runs alongside Step 6 when streaming; deferred results
+            # arrive all at once, so the checker then runs afterwards
+            streaming_checker = self.stream_checker and self.analysis_mode != "deferred"
+            on_batch_analyzed = None
+            if streaming_checker:
+                checker_queue = asyncio.Queue()
+                on_batch_analyzed = functools.partial(
+                    self.queue_positives_for_checker,
+                    checker_queue,
+                    asyncio.get_running_loop(),
+                )
+                checker_task = asyncio.create_task(
+                    self.run_streaming_checker(checker_queue)
+                )
 
-            stage_start = time.time()
-            logger.info("Step 3: Extract frames from the video")
-            if self.mode == "timelapse":
-                extracted_frames = self.extract_all_frames_ffmpeg(
-                    video_path=video_path,
-                    output_folder="frames",
-                    crop_top=360,  # Crop top for GoPro videos
+            if self.overlap_stages and self.analysis_mode != "deferred":
+                # Steps 2-6 run concurrently, connected by bounded queues
+                stage_start = time.time()
+                logger.info(
+                    "Steps 2-6: Metadata, frames, GPS, upload and AI analysis (overlapped)"
                 )
-            elif self.mode == "video":
-                extracted_frames = self.extract_frames_ffmpeg(
-                    video_path=video_path, frame_rate=frame_rate, max_frames=max_frames
+                for stage_name in (
+                    "Metadata",
+                    "Frame Extraction",
+                    "Analysis Prep",
+                    "AI Analysis",
+                ):
+                    self.update_stage(stage_name, "In Progress")
+                telemetry_objects = await self.run_overlapped_stages(
+                    video_path,
+                    frame_rate=frame_rate,
+                    max_frames=max_frames,
+                    batch_size=batch_size,
+                    on_batch_analyzed=on_batch_analyzed,
+                    all_frames=all_frames,
                 )
-            log_timing("Step 3: Extract frames from the video", stage_start)
+                for stage_name in ("Metadata", "Frame Extraction", "Analysis Prep"):
+                    self.update_stage(stage_name, "Complete")
+                self.log_timing("Steps 2-6: Overlapped stages", stage_start)
+            else:
+                # Step 2: Extract metadata and prepare GPX
+                stage_start = time.time()
+                logger.info("Step 2: Extract metadata and prepare GPX")
+                await asyncio.to_thread(self.extract_all_metadata, video_path)
+                self.log_timing("Step 2: Extract metadata and prepare GPX", stage_start)
+
+                self.update_stage("Metadata", "Complete")
+                self.update_stage("Frame Extraction", "In Progress")
+
+                # Step 3: Extract frames from the video
+
+                stage_start = time.time()
+                logger.info("Step 3: Extract frames from the video")
+                if self.mode == "timelapse" and self.stream_frames:
+                    # Frames flow from FFmpeg into upload as they are decoded (see Step 6)
+                    self.load_telemetry()
+                    extracted_frames = None
+                    telemetry_objects = self.deduplicate_frames(
+                        self.stream_telemetry_objects(
+                            video_path=video_path,
+                            output_folder=self.frames_folder,
+                        ),
+                        all_frames,
+                    )
+                elif self.mode == "timelapse":
+                    extracted_frames = await asyncio.to_thread(
+                        self.extract_all_frames_ffmpeg,
+                        video_path=video_path,
+                        output_folder=self.frames_folder,
+                    )
+                elif self.mode == "video":
+                    extracted_frames = await asyncio.to_thread(
+                        self.extract_frames_ffmpeg,
+                        video_path=video_path,
+                        frame_rate=frame_rate,
+                        max_frames=max_frames,
+                    )
+                self.log_timing("Step 3: Extract frames from the video", stage_start)
 
-            self.update_stage("Frame Extraction", "Complete")
-            self.update_stage("Analysis Prep", "In Progress")
+                self.update_stage("Frame Extraction", "Complete")
+                self.update_stage("Analysis Prep", "In Progress")
 
-            # Step 4: Create telemetry objects for extracted frames
-            stage_start = time.time()
-            logger.info("Step 4: Create telemetry objects for extracted frames")
-            telemetry_objects = self.create_telemetry_objects(
-                extracted_frames, video_path
-            )
-            log_timing("Step 4: Create telemetry objects", stage_start)
+                if extracted_frames is not None:
+                    # Step 4: Create telemetry objects for extracted frames
+                    stage_start = time.time()
+                    logger.info("Step 4: Create telemetry objects for extracted frames")
+                    telemetry_objects = self.create_telemetry_objects(
+                        extracted_frames, video_path
+                    )
+                    self.log_timing("Step 4: Create telemetry objects", stage_start)
+
+                    # Step 5: Add GPS coordinates to telemetry objects
+                    stage_start = time.time()
+                    logger.info("Step 5: Add GPS coordinates to telemetry objects")
+                    self.load_telemetry()
+                    telemetry_objects = self.add_coords_to_telemetry_objects(
+                        telemetry_objects
+                    )
+                    self.log_timing("Step 5: Add GPS coordinates", stage_start)
 
-            # Step 5: Add GPS coordinates to telemetry objects
-            stage_start = time.time()
-            logger.info("Step 5: Add GPS coordinates to telemetry objects")
-            self.telemetry_data = self.preprocess_gpx_file()
-            telemetry_objects = self.add_coords_to_telemetry_objects(telemetry_objects)
-            log_timing("Step 5: Add GPS coordinates", stage_start)
+                    # Step 5.5: Keep near-duplicate frames out of analysis
+                    stage_start = time.time()
+                    logger.info("Step 5.5: Skip near-duplicate frames")
+                    telemetry_objects = await asyncio.to_thread(
+                        self.deduplicate_frames, telemetry_objects, all_frames
+                    )
+                    self.log_timing("Step 5.5: Skip near-duplicate frames", stage_start)
 
-            self.update_stage("Analysis Prep", "Complete")
-            self.update_stage("AI Analysis", "In Progress")
+                self.update_stage("Analysis Prep", "Complete")
+                self.update_stage("AI Analysis", "In Progress")
 
-            # Step 6: Perform AI analysis on telemetry objects
+                # Step 6: Perform AI analysis on telemetry objects
 
-            stage_start = time.time()
-            logger.info("Step 6: Perform AI analysis on telemetry objects")
-            telemetry_objects = self.get_ai_analyses(
-                telemetry_objects, batch_size=batch_size
-            )
-            log_timing("Step 6: Analyze files with AI", stage_start)
+                stage_start = time.time()
+                logger.info("Step 6: Perform AI analysis on telemetry objects")
+                if self.analysis_mode == "deferred":
+                    telemetry_objects, job = await self.submit_deferred_analyses(
+                        telemetry_objects, batch_size, video_path, all_frames
+                    )
+                    self.log_timing("Step 6: Submit frames to the Batch API", stage_start)
+                    if job is not None:
+                        # Don't hold a video slot for hours; the monitoring loop calls
+                        # finish_deferred_video for Steps 6.5-9 once the batch is done
+                        self.update_stage("AI Analysis", "Awaiting Batch")
+                        return None
+                else:
+                    telemetry_objects = await self.get_ai_analyses(
+                        telemetry_objects,
+                        batch_size=batch_size,
+                        on_batch_analyzed=on_batch_analyzed,
+                    )
+                    self.log_timing("Step 6: Analyze files with AI", stage_start)
+
+            self.report_analysis_coverage(telemetry_objects)
 
             # Step 6.5: Run additional AI analysis on positive pothole detections
             # Filter down to only those telemetry objects that have a pothole detection (telem_obj.get('pothole') == 'yes')
             # Send list of positive detections to a (new?) AI to ask if it's really a pothole.
             # Return a full re-assessment BUT with a more conservative and repair-based perspective.
-            positive_detections = [
-                i
-                for i in telemetry_objects
-                if i.analysis_results.get("pothole") == "yes"
-            ]
-            print(
-                f"There are {len(positive_detections)} positive detections to re-check"
-            )
-            if positive_detections:
-                telemetry_objects = self.get_checker_ai_analyses(positive_detections)
-
-            # Step 7: Save telemetry objects as individual JSON files
-            stage_start = time.time()
-            logger.info("Step 7: Save telemetry objects as individual JSON files")
-            self.save_telemetry_objects(telemetry_objects)
-            log_timing("Step 7: Save telemetry objects", stage_start)
-
-            self.update_stage("AI Analysis", "Complete")
-            self.update_stage("Finalization", "In Progress")
-
-            # Step 8: Create and save an overview.json file
-            stage_start = time.time()
-            logger.info("Step 8: Create and save an overview.json file")
-            self.save_full_list(telemetry_objects=telemetry_objects)
-            log_timing(
-                "Step 8: Create and save overview.json and all_frame_analyses.json",
-                stage_start,
-            )
-
-            # Step 9: Cleanup files and archive data in Box
-            logger.info("Step 9: Cleanup files and archive data in Box")
-            self.cleanup_temp_files(Processor.TEMP_GPX_FILE)
-            telemetry_objects = await self.box.save_frames_to_long_term_storage(
-                telemetry_objects=telemetry_objects,
-                greenway_mode=False,
-                video_path=video_path,
-            )
-
-            logger.info("Deleting any OpenAI files that were created.")
-            openai_file_ids = [obj.openai_file_id for obj in telemetry_objects]
-            self.ai.delete_files(openai_file_ids)
+            if streaming_checker:
+                stage_start = time.time()
+                checker_queue.put_nowait(_STAGE_DONE)
+                checked_objects = await checker_task
+                self.merge_checker_results(telemetry_objects, checked_objects)
+                self.log_timing("Step 6.5: Finish streaming checker", stage_start)
+            else:
+                await self.run_checker(telemetry_objects)
 
-            # Finalize
-            total_duration = time.time() - total_start_time
-            logger.info("Video processing pipeline completed successfully.")
-            self.calculate_video_coverage(telemetry_objects)
-            logger.info(
-                f"Analyzed {len(telemetry_objects)} frames, covering {self.minutes_analyzed} minutes of footage."
+            return await self.finish_video_pipeline(
+                telemetry_objects, all_frames, video_path, total_start_time
             )
-            with open(log_file, "a") as log:
-                log.write(f"Total pipeline duration: {total_duration:.2f} seconds\n")
-
-            self.update_stage("Finalization", "Complete")
-
-            return telemetry_objects
 
         except Exception as e:
             logger.error(f"Error in video processing pipeline: {e}")
+            if checker_task is not None:
+                checker_task.cancel()  # Otherwise it waits forever for more positives
             raise
 
 
@@ -923,6 +1759,12 @@ class TelemetryObject:
         self.box_file_url: str = None
         self.analysis_results: dict = {}
         self.source_video: str = source_video
+        self.image_bytes: bytes = None  # Set when frames are streamed instead of saved
+        self.content_hash: str = None
+        self.speed: float = None  # m/s from GPS
+        self.represents_frames: int = 1  # This frame plus near-duplicates dropped after it
+        self.duplicate_of: "TelemetryObject" = None  # Kept frame this one was folded into
+        self.first_pass_analysis: dict = None  # Set when the checker re-assesses the frame
 
     def to_dict(self):
         return {
@@ -935,26 +1777,58 @@ class TelemetryObject:
             "openai_file_id": self.openai_file_id,
             "box_file_id": self.box_file_id,
             "box_file_url": self.box_file_url,
+            "represents_frames": self.represents_frames,
+            "duplicate_of": self.duplicate_of_filename(),
             "analysis_results": self.analysis_results,
+            "first_pass_analysis": self.first_pass_analysis,
         }
 
+    def to_state_dict(self):
+        """``to_dict`` plus the fields needed to rebuild the frame with ``from_state_dict``."""
+        return {**self.to_dict(), "speed": self.speed, "content_hash": self.content_hash}
+
+    @classmethod
+    def from_state_dict(cls, data: dict):
+        """Rebuild a frame from ``to_state_dict``; ``duplicate_of`` is left for the caller to link."""
+        telemetry_object = cls(
+            filename=data["filename"],
+            filepath=data["filepath"],
+            timestamp=data["timestamp"],
+            lat=data["lat"],
+            lon=data["lon"],
+            source_video=data["source_video"],
+        )
+        telemetry_object.openai_file_id = data["openai_file_id"]
+        telemetry_object.box_file_id = data["box_file_id"]
+        telemetry_object.box_file_url = data["box_file_url"]
+        telemetry_object.represents_frames = data["represents_frames"]
+        telemetry_object.analysis_results = data["analysis_results"] or {}
+        telemetry_object.first_pass_analysis = data["first_pass_analysis"]
+        telemetry_object.speed = data["speed"]
+        telemetry_object.content_hash = data["content_hash"]
+        return telemetry_object
+
+    def duplicate_of_filename(self):
+        return self.duplicate_of.filename if self.duplicate_of is not None else None
+
+    def has_analysis(self) -> bool:
+        return bool(self.analysis_results)
+
     def to_metadata_dict(self):
+        # Frames the AI never analyzed still get valid (neutral) metadata
+        analysis = self.analysis_results or {}
         return {
             "filename": self.filename,
             "timestamp": f"{self.timestamp}",
             "lat1": f"{self.lat}",
             "lon1": f"{self.lon}",
-            "pothole": [
-                self.analysis_results["pothole"].capitalize()
-            ],  # must be a list
-            "potholeConfidence": str(self.analysis_results["pothole_confidence"]),
-            "alligatorCracking": [
-                self.analysis_results["alligator_cracking"].capitalize()
-            ],
-            "lineCracking": [self.analysis_results["line_cracking"].capitalize()],
-            "raveling": [self.analysis_results["raveling"].capitalize()],
-            "summary": self.analysis_results["summary"],
-            "estimatedPCR": str(self.analysis_results["estimated_pcr"]),
+            "pothole": [analysis.get("pothole", "no").capitalize()],  # must be a list
+            "potholeConfidence": str(analysis.get("pothole_confidence", 0)),
+            "alligatorCracking": [analysis.get("alligator_cracking", "none").capitalize()],
+            "lineCracking": [analysis.get("line_cracking", "none").capitalize()],
+            "raveling": [analysis.get("raveling", "none").capitalize()],
+            "summary": analysis.get("summary", "Not analyzed"),
+            "estimatedPCR": str(analysis.get("estimated_pcr", "")),
         }
 
     def add_openai_file_id(self, file_id):
@@ -963,6 +1837,24 @@ class TelemetryObject:
     def add_analysis_results(self, analysis):
         self.analysis_results = analysis
 
+    def read_image_bytes(self) -> bytes:
+        """Return the frame's JPEG bytes, from memory when streamed or from disk otherwise."""
+        if self.image_bytes is not None:
+            return self.image_bytes
+        with open(self.filepath, "rb") as image_file:
+            return image_file.read()
+
+    def release_image_bytes(self):
+        """Drop the in-memory JPEG when the frame is also on disk; reads fall back to the file."""
+        if self.image_bytes is not None and os.path.isfile(self.filepath):
+            self.image_bytes = None
+
+    def get_content_hash(self) -> str:
+        """SHA-256 of the frame's JPEG bytes, computed once; keys the analysis cache."""
+        if self.content_hash is None:
+            self.content_hash = hashlib.sha256(self.read_image_bytes()).hexdigest()
+        return self.content_hash
+
     def add_box_file_id(self, file_id):
         self.box_file_id = file_id
 
@@ -988,6 +1880,9 @@ class TelemetryObject:
             "openai_file_id": self.openai_file_id,
             "box_file_id": self.box_file_id,
             "box_file_url": self.box_file_url,
+            "represents_frames": self.represents_frames,
+            "duplicate_of": self.duplicate_of_filename(),
+            "checker_reviewed": self.first_pass_analysis is not None,
         }
         if self.analysis_results:
             props.update(self.analysis_results)  # Merge analysis_results into props
@@ -0,0 +1,235 @@
+# request_scheduler.py
+"""
+One background event loop that every OpenAI request runs on.
+
+The AsyncOpenAI client (and its connection pool) lives on this loop, and each kind of
+request (upload, run, delete) is capped by its own semaphore, so the limits hold across
+every video being processed at once. Callers on other loops await the result; sync callers
+block on it, without tying up the FastAPI loop either way.
+
+Vision runs also draw from request- and token-per-minute buckets sized just under the
+account limits, and failed requests are retried with Retry-After or jittered backoff.
+"""
+
+import re
+import time
+import random
+import asyncio
+import threading
+from logging_config import logger
+
+# "checker" runs have their own slots so re-checks never starve first-pass "run"s
+DEFAULT_REQUEST_LIMITS = {"upload": 16, "run": 8, "checker": 2, "delete": 16}
+
+# "try again in 6.5s" / "try again in 820ms" in rate-limit error messages
+RETRY_IN_PATTERN = re.compile(r"try again in ([\d.]+)\s*(ms|s)", re.IGNORECASE)
+TOKENS_USED_PATTERN = re.compile(r"Tokens Used: (\d+)(?:, Images: (\d+))?")
+
+
+class RetryableError(Exception):
+    """A request that failed in a way worth retrying, e.g. a run ended by a rate limit."""
+
+    def __init__(self, message, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Continuously refilling bucket holding up to ``per_minute`` units.
+
+    Only used on the scheduler loop, so it needs no lock.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.available = per_minute
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(
+            self.capacity, self.available + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    async def acquire(self, amount: float):
+        """Wait until ``amount`` units are available, then take them."""
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.available >= amount:
+                self.available -= amount
+                return
+            await asyncio.sleep((amount - self.available) / self.rate)
+
+    def adjust(self, amount: float):
+        """Take (positive) or return (negative) units after the fact; may go into debt."""
+        self._refill()
+        self.available = min(self.capacity, self.available - amount)
+
+
+class TokenUsageEstimator:
+    """
+    Running estimate of tokens per image, used to reserve TPM budget before a run.
+
+    Seeded from the run usage already written to ``logs/token_usage.log`` and updated with
+    an exponential moving average as runs finish.
+    """
+
+    def __init__(self, default_tokens_per_image: float, smoothing: float = 0.2):
+        self.tokens_per_image = default_tokens_per_image
+        self.smoothing = smoothing
+
+    def seed_from_log(self, log_path, max_entries=200):
+        try:
+            with open(log_path) as log_file:
+                lines = log_file.readlines()[-max_entries:]
+        except OSError:
+            return
+        samples = [
+            int(match.group(1)) / int(match.group(2))
+            for match in map(TOKENS_USED_PATTERN.search, lines)
+            if match and match.group(2) and int(match.group(2)) > 0
+        ]
+        if samples:
+            self.tokens_per_image = sum(samples) / len(samples)
+            logger.info(
+                f"Seeded token estimate from {len(samples)} logged runs: {self.tokens_per_image:.0f} tokens/image"
+            )
+
+    def estimate(self, image_count: int) -> int:
+        return int(self.tokens_per_image * max(image_count, 1))
+
+    def record(self, total_tokens: int, image_count: int):
+        if total_tokens and image_count:
+            per_image = total_tokens / image_count
+            self.tokens_per_image += self.smoothing * (per_image - self.tokens_per_image)
+
+
+def retry_after_seconds(error) -> float:
+    """Server-suggested wait from Retry-After headers or the error text, if any."""
+    if getattr(error, "retry_after", None) is not None:
+        return error.retry_after
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # HTTP-date form; fall back to backoff
+    match = RETRY_IN_PATTERN.search(str(error))
+    if match:
+        value = float(match.group(1))
+        return value / 1000 if match.group(2).lower() == "ms" else value
+    return None
+
+
+class RequestScheduler:
+    def __init__(
+        self,
+        limits: dict = None,
+        requests_per_minute: float = None,
+        tokens_per_minute: float = None,
+        max_attempts: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        retryable_errors: tuple = (),
+    ):
+        self.limits = dict(DEFAULT_REQUEST_LIMITS)
+        self.limits.update(limits or {})
+        self._semaphores = {}
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable_errors = (RetryableError, *retryable_errors)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="openai-requests", daemon=True
+        )
+        self._thread.start()
+
+    def limit(self, kind: str) -> asyncio.Semaphore:
+        """
+        Semaphore that caps in-flight requests of ``kind``. Only use it on the scheduler loop.
+
+        Usage:
+            async with scheduler.limit("upload"):
+                await client.files.create(...)
+        """
+        if kind not in self._semaphores:
+            self._semaphores[kind] = asyncio.Semaphore(self.limits.get(kind, 8))
+        return self._semaphores[kind]
+
+    async def throttle(self, tokens: int = 0):
+        """Wait for one request and ``tokens`` tokens of per-minute budget."""
+        if self.request_bucket:
+            await self.request_bucket.acquire(1)
+        if self.token_bucket and tokens:
+            await self.token_bucket.acquire(tokens)
+
+    def settle(self, reserved_tokens: int, used_tokens: int):
+        """Correct the token bucket once a run reports what it actually used."""
+        if self.token_bucket and used_tokens:
+            self.token_bucket.adjust(used_tokens - reserved_tokens)
+
+    def refund(self, reserved_tokens: int):
+        """Return a reservation whose request failed before it reported any usage."""
+        if self.token_bucket and reserved_tokens:
+            self.token_bucket.adjust(-reserved_tokens)
+
+    def backoff_delay(self, attempt: int, retry_after: float = None) -> float:
+        """Retry-After when the server gave one, otherwise full-jitter exponential backoff."""
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    async def with_retries(self, request_factory, description="request"):
+        """
+        Await ``request_factory()``, retrying retryable failures with backoff.
+
+        Args:
+            request_factory (callable): Returns a fresh coroutine for each attempt.
+            description (str): What is being retried, for the logs.
+
+        Returns:
+            The result of the first successful attempt. The last error is raised once
+            ``max_attempts`` is used up or for errors that are not retryable.
+        """
+        for attempt in range(self.max_attempts):
+            try:
+                return await request_factory()
+            except self.retryable_errors as e:
+                if attempt == self.max_attempts - 1:
+                    raise
+                delay = self.backoff_delay(attempt, retry_after_seconds(e))
+                logger.warning(
+                    f"{description} failed ({e}); retry {attempt + 1}/{self.max_attempts - 1} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    def _submit(self, coroutine):
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise RuntimeError(
+                "Already on the request loop; await the coroutine instead of scheduling it."
+            )
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    async def run(self, coroutine):
+        """Run ``coroutine`` on the scheduler loop and await its result from any other loop."""
+        return await asyncio.wrap_future(self._submit(coroutine))
+
+    def run_sync(self, coroutine):
+        """Run ``coroutine`` on the scheduler loop and block until it finishes."""
+        return self._submit(coroutine).result()
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        logger.info("OpenAI request scheduler stopped.")
@@ -7,6 +7,12 @@ import dotenv
 import logging
 import io
 import re
+import asyncio
+import threading
+from pothole_index import ReportedPotholeIndex, cluster_detections
+from geo_index import has_fix
+from geo_cache import GeohashCache
+from location_index import SalesforceLocationIndex
 
 
 dotenv.load_dotenv()
@@ -72,26 +78,64 @@ class WorkOrderCreator:
         )
         print(f"Authenticated successfully with Salesforce (sandbox={sandbox}).")
 
-        self.coordinate_variance = 0.0002
-        self.coordinate_variance_growth_factor = 0.001
         self.base_query = "SELECT Id, Name, Geolocation__latitude__s, Geolocation__longitude__s FROM Location__c"
 
+        # Detections closer than this are one pothole: one AI event per physical defect
+        self.pothole_confidence_threshold = 0.9
+        self.pothole_cluster_radius_m = 8.0
+        self.reported_potholes = ReportedPotholeIndex(
+            radius_m=self.pothole_cluster_radius_m
+        )
+        # Videos finish concurrently; one engine run at a time keeps find() and add() on
+        # reported_potholes from interleaving into two events for one pothole
+        self._ai_event_lock = asyncio.Lock()
+        self.last_geo_cache_stats = None  # geo_cache hit rates of the latest engine run
+
+        # Road owners by geohash cell; routes repeat every night
+        self.geo_cache = GeohashCache()
+
+        # Local copy of the Location__c street segments for nearest-location lookups
+        self._location_index = None
+
+        # One road-ownership finder for every event, built on first use
+        self._road_owner_finder = None
+        self._road_owner_finder_lock = threading.Lock()
+
+    @property
+    def road_owner_finder(self):
+        """Shared RoadOwnerFinder answering from the local road snapshot."""
+        with self._road_owner_finder_lock:
+            if self._road_owner_finder is None:
+                from geospatial import RoadOwnerFinder
+
+                self._road_owner_finder = RoadOwnerFinder(
+                    api_key=os.getenv("ARCGIS_API_KEY"), cache=self.geo_cache
+                )
+            return self._road_owner_finder
+
+    @property
+    def location_index(self):
+        """Shared SalesforceLocationIndex, loaded from its snapshot on first use."""
+        with self._road_owner_finder_lock:
+            if self._location_index is None:
+                self._location_index = SalesforceLocationIndex(self.sf)
+            return self._location_index
+
     def create_ai_event(
         self,
         metadata_item=None,
         subject="Default",
         description="Default",
         box_file_url="https://upload.wikimedia.org/wikipedia/commons/c/c7/Pothole_Big.jpg",
+        owner=None,
     ):
-        from geospatial import RoadOwnerFinder
-
         record_id = None
         lat_str = metadata_item.get("lat", 0)
         lon_str = metadata_item.get("lon", 0)
         lat = float(lat_str)
         lon = float(lon_str)
-        road_owner_finder = RoadOwnerFinder(api_key=os.getenv("ARCGIS_API_KEY"))
-        owner = road_owner_finder.get_pothole_owner(lat=lat, lon=lon)
+        if owner is None:
+            owner = self.road_owner_finder.get_pothole_owner(lat=lat, lon=lon)
 
         ai_event = {
             "Subject__c": subject,
@@ -135,27 +179,96 @@ class WorkOrderCreator:
         )
 
     async def ai_event_engine(self, box_client, telemetry_objects: list = None):
+        """
+        Create one AI event per physical pothole among a video's detections.
+
+        Detections within ``pothole_cluster_radius_m`` of each other are collapsed into one
+        event (for the most confident frame), and potholes already in
+        ``reported_potholes`` are skipped.
+
+        Returns:
+            int: Number of AI events created, or None on error.
+        """
+        async with self._ai_event_lock:
+            counters_before = self.geo_cache.counters()
+            ai_events_created = await self._ai_event_engine(box_client, telemetry_objects)
+            # Runs are serialized, so this delta is this video's lookups alone
+            self.last_geo_cache_stats = self.geo_cache.stats(since=counters_before)
+            return ai_events_created
+
+    async def _ai_event_engine(self, box_client, telemetry_objects: list = None):
         try:
             ai_events_created = 0
-
+            detections = []
             for object in telemetry_objects:
-                analysis_results = object.analysis_results
+                if getattr(object, "duplicate_of", None) is not None:
+                    continue  # Same view as its kept frame, which is counted already
+                analysis_results = object.analysis_results or {}
                 pothole = analysis_results.get("pothole", "no")
                 pothole_confidence = analysis_results.get("pothole_confidence", 0)
+                if (
+                    pothole == "yes"
+                    and pothole_confidence > self.pothole_confidence_threshold
+                ):
+                    detections.append(object)
 
-                if pothole == "yes" and pothole_confidence > 0.9:
-                    description = self.create_description_package(object.to_dict())
-                    box_url = object.box_file_url
-                    subject = (
-                        f"Pothole Detected - Confidence {pothole_confidence * 100:.1f}%"
-                    )
+            clusters = cluster_detections(detections, self.pothole_cluster_radius_m)
+            print(
+                f"{len(detections)} pothole detections collapsed into {len(clusters)} potholes"
+            )
 
-                    record_id = self.create_ai_event(
-                        object.to_dict(), subject, description, box_url
+            pending = []
+            for cluster in clusters:
+                if has_fix(cluster.lat, cluster.lon):
+                    reported = self.reported_potholes.find(cluster.lat, cluster.lon)
+                    if reported is not None:
+                        self.reported_potholes.touch(reported, len(cluster.detections))
+                        print(
+                            f"Pothole at ({cluster.lat}, {cluster.lon}) already reported as {reported['record_id']}"
+                        )
+                        continue
+                pending.append(cluster)
+
+            # Resolve road ownership for the whole video in one bulk lookup
+            located = [
+                i for i, cluster in enumerate(pending) if has_fix(cluster.lat, cluster.lon)
+            ]
+            owners = ["UNKNOWN"] * len(pending)
+            if located:
+                # Resolve the finder in the worker too: first use logs in, downloads the
+                # roads snapshot and builds the index, which must not block the event loop
+                located_owners = await asyncio.to_thread(
+                    lambda points: self.road_owner_finder.get_owners(points),
+                    [(float(pending[i].lat), float(pending[i].lon)) for i in located],
+                )
+                for i, owner in zip(located, located_owners):
+                    owners[i] = owner
+
+            for cluster, owner in zip(pending, owners):
+                object = cluster.representative
+                description = self.create_description_package(object.to_dict())
+                if len(cluster.detections) > 1:
+                    description += f"\nSeen in {len(cluster.detections)} frames of this video.\n"
+                box_url = object.box_file_url
+                subject = f"Pothole Detected - Confidence {cluster.confidence * 100:.1f}%"
+
+                record_id = await asyncio.to_thread(
+                    self.create_ai_event,
+                    object.to_dict(),
+                    subject,
+                    description,
+                    box_url,
+                    owner,
+                )
+                ai_events_created += 1
+                if has_fix(cluster.lat, cluster.lon):
+                    self.reported_potholes.add(
+                        cluster.lat, cluster.lon, record_id, len(cluster.detections)
                     )
-                    ai_events_created += 1
 
-                    print(f"Created AI Event with ID {record_id}")
+                print(f"Created AI Event with ID {record_id}")
+
+            return ai_events_created
 
         except Exception as e:
             logging.error(f"An error occurred in the AI Event Engine: {e}")
@@ -200,74 +313,15 @@ class WorkOrderCreator:
 
         return in_excluded_area
 
-    def get_nearby_street_segments(self, metadata_item):  # Subprocess
-        print("DEBUG: Running get_nearby_street_segments")
-        # starts a get_street_segments() run to get records from SF where:
-        #   latitude is within +- coordinate variance
-        #   longitude is within +- coordinate variance
-        # If no segments returned, expand the coordinate variance and try again
-        # Returns list of street segments and their coordinates when any are returned
-        segments = []
-        while not segments:
-            results = self.get_street_segments(metadata_item)
-            segments = results
-            self.coordinate_variance += self.coordinate_variance_growth_factor
-
-        simplified_locations = []
-        for segment in segments:
-            location = {
-                "Id": segment.get("Id"),
-                "Name": segment.get("Name"),
-                "Latitude": segment.get("Geolocation__Latitude__s"),
-                "Longitude": segment.get("Geolocation__Longitude__s"),
-            }
-            simplified_locations.append(location)
-
-        return simplified_locations
-
-    def get_street_segments(self, metadata_item):  # Subprocesses
-        # Prep a query by adding the variance coordinates as +- conditions including WHERE
-        # Run a query for street segments with the WHERE conditions added
-        meta = metadata_item
-
-        meta_lat_str = meta.get("lat", None)
-        meta_lon_str = meta.get("lon", None)
-
-        meta_lat = round(float(meta_lat_str), 4)
-        meta_lon = round(float(meta_lon_str), 4)
-
-        # Calculate lower and upper values for latitude and longitude searching
-        lat_min = meta_lat - self.coordinate_variance
-        lat_max = meta_lat + self.coordinate_variance
-        lon_min = meta_lon - self.coordinate_variance
-        lon_max = meta_lon + self.coordinate_variance
-        conditions = f"WHERE (RecordTypeId = '0124u000000ciJTAAY' OR RecordTypeId = '0124u000000ciJSAAY') AND Geolocation__latitude__s >= {lat_min} AND Geolocation__latitude__s <= {lat_max} AND Geolocation__longitude__s >= {lon_min} AND Geolocation__longitude__s <= {lon_max}"
-
-        results = self.sf.query(
-            f"SELECT Id, Name, Geolocation__latitude__s, Geolocation__longitude__s FROM Location__c {conditions}"
-        )
-        results = results["records"]
-        if len(results) == 0:
-            results = None
-        return results
-
-    def expand_coordinate_variance(self):
-        self.coordinate_variance += 0.0005
-
     def remove_timestamp(self, filename):
         return re.sub(r"^\d{8}_\d{2}_\d{2}_", "", filename)
 
     def get_closest_location(self, metadata_item):  # Main Process
-        locations = self.get_nearby_street_segments(metadata_item)
-        closest_location = None
-        min_distance = float("inf")
-        for loc in locations:
-            distance = self.calculate_distance(metadata_item, loc)
-            if distance < min_distance:
-                min_distance = distance
-                closest_location = loc
-
-        return closest_location, min_distance
+        # Nearest street segment from the synced local copy of Location__c
+        # Returns (location, distance in km); (None, inf) when no segments are known
+        return self.location_index.nearest(
+            metadata_item.get("lat", 0), metadata_item.get("lon", 0)
+        )
 
     def create_description_package(
         self, metadata_item, closest_sf_location=None, closest_sf_location_distance=None
@@ -445,29 +499,6 @@ class WorkOrderCreator:
             print(f"An error occurred while uploading the file: {e}")
             return None
 
-    def calculate_distance(
-        self, metadata_item, location
-    ):  # Subprocess, returns est distance in km
-        print("DEBUG: Running calculate_distance...")
-        print(f"DEBUG: {location = }")
-        meta = metadata_item
-
-        meta_lat_str = meta.get("lat", None)
-        meta_lon_str = meta.get("lon", None)
-
-        meta_lat = round(float(meta_lat_str), 4)
-        meta_lon = round(float(meta_lon_str), 4)
-
-        loc_lat = location["Latitude"]
-        loc_lon = location["Longitude"]
-
-        print(f"DEBUG: {loc_lat = }")
-        print(f"DEBUG: {loc_lon = }")
-
-        lat_diff = loc_lat - meta_lat
-        lon_diff = loc_lon - meta_lon
-        return round(((lat_diff**2 + lon_diff**2) ** 0.5) * 110, 3)
-
     def post_image_to_chatter(
         self, work_order_id, image_content_document_id, message=None
     ):
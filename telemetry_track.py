@@ -0,0 +1,103 @@
+# telemetry_track.py
+import datetime
+import numpy as np
+
+
+def to_epoch_seconds(timestamp: datetime.datetime) -> float:
+    """Naive GPX datetimes are UTC; convert one to float epoch seconds."""
+    return timestamp.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+class TelemetryTrack:
+    """
+    Columnar GPS track for one video: sorted epoch-second times plus lat/lon/ele/speed arrays.
+
+    Built once per video so every frame can be joined with a single ``np.searchsorted``
+    instead of rebuilding and bisecting a list of dicts per frame.
+    """
+
+    def __init__(self, times, lat, lon, elevation=None, speed=None):
+        # Sort by time and drop repeated timestamps so interpolation sees increasing times
+        times = np.asarray(times, dtype=np.float64)
+        _, order = np.unique(times, return_index=True)
+        self.times = times[order]
+        self.lat = np.asarray(lat, dtype=np.float64)[order]
+        self.lon = np.asarray(lon, dtype=np.float64)[order]
+        self.elevation = self._column(elevation, order)
+        self.speed = self._column(speed, order)
+
+    def _column(self, values, order):
+        if values is None:
+            return np.full(len(self.times), np.nan)
+        return np.asarray(values, dtype=np.float64)[order]
+
+    def __len__(self):
+        return len(self.times)
+
+    @staticmethod
+    def _to_float(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return np.nan  # GPX fields default to "N/A"
+
+    @classmethod
+    def from_telemetry_data(cls, telemetry_data: list) -> "TelemetryTrack":
+        """Build a track from ``Processor.preprocess_gpx_file`` output."""
+        return cls(
+            times=[to_epoch_seconds(entry["timestamp"]) for entry in telemetry_data],
+            lat=[entry["lat"] for entry in telemetry_data],
+            lon=[entry["lon"] for entry in telemetry_data],
+            elevation=[cls._to_float(entry.get("elevation")) for entry in telemetry_data],
+            speed=[cls._to_float(entry.get("speed")) for entry in telemetry_data],
+        )
+
+    def lookup(self, target_times, interpolate=False) -> dict:
+        """
+        Find telemetry for many epoch-second times at once.
+
+        Args:
+            target_times (array-like): Epoch seconds to look up (sub-second precision is kept).
+            interpolate (bool): Linearly interpolate between the surrounding fixes instead
+                of taking the nearest one (ties go to the earlier fix). Times outside the
+                track are clamped to its first/last fix either way.
+
+        Returns:
+            dict: ``lat``, ``lon``, ``elevation`` and ``speed`` arrays, one entry per target.
+        """
+        target_times = np.atleast_1d(np.asarray(target_times, dtype=np.float64))
+        columns = {
+            "lat": self.lat,
+            "lon": self.lon,
+            "elevation": self.elevation,
+            "speed": self.speed,
+        }
+
+        if len(self.times) == 0:
+            return {name: np.zeros(len(target_times)) for name in columns}
+
+        if interpolate:
+            return {
+                name: np.interp(target_times, self.times, values)
+                for name, values in columns.items()
+            }
+
+        after = np.clip(np.searchsorted(self.times, target_times), 0, len(self.times) - 1)
+        before = np.clip(after - 1, 0, len(self.times) - 1)
+        use_before = np.abs(target_times - self.times[before]) <= np.abs(
+            self.times[after] - target_times
+        )
+        nearest = np.where(use_before, before, after)
+        return {name: values[nearest] for name, values in columns.items()}
+
+    @staticmethod
+    def offsets_to_epoch(offsets, base_timestamp: datetime.datetime) -> np.ndarray:
+        """Turn frame offsets (seconds from ``base_timestamp``) into epoch seconds."""
+        return to_epoch_seconds(base_timestamp) + np.asarray(offsets, dtype=np.float64)
+
+    @staticmethod
+    def format_gpx_timestamps(epoch_times) -> list:
+        """Format epoch seconds as ISO 8601 strings in ms, e.g. '2024-09-26T16:37:34.500Z'."""
+        milliseconds = np.round(np.asarray(epoch_times, dtype=np.float64) * 1000)
+        as_datetimes = milliseconds.astype(np.int64).astype("datetime64[ms]")
+        return [f"{value}Z" for value in np.datetime_as_string(as_datetimes, unit="ms")]
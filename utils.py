@@ -1,4 +1,5 @@
 # utils.py
+import math
 
 instructions = """
     You are a road condition analysis expert.
@@ -163,6 +164,26 @@ checker_model = "gpt-4.1-mini-2025-04-14"
 
 model = "gpt-4o-mini"
 
+# "assistants" (thread + polled run per batch) or "responses" (one Responses API call per batch)
+analysis_backend = "assistants"
+
+# Bump when assistant instructions or response formats change on the OpenAI side, so
+# cached analyses from the old prompt are no longer reused
+analysis_prompt_version = 1
+
+# OpenAI account limits for `model` (Settings > Limits). The scheduler paces vision runs
+# at `rate_limit_headroom` of these so bursts stay under the limit instead of hitting 429s.
+openai_requests_per_minute = 5000
+openai_tokens_per_minute = 4000000
+rate_limit_headroom = 0.9
+
+# Vision token costs per model: (base tokens, tokens per 512px tile) at "high" detail
+image_token_costs = {
+    "gpt-4o": (85, 170),
+    "gpt-4o-mini": (2833, 5667),
+    "gpt-4.1-mini-2025-04-14": (85, 170),
+}
+
 response_format = {
     "type": "json_schema",
     "json_schema": {
@@ -293,90 +314,17 @@ batch_response_format = {
 }
 
 
-resp_api_batch_format = {
-    "format": {
-        "type": "json_schema",
-        "name": "road_condition_batch",
-        "schema": {
-            "type": "object",
-            "properties": {
-                "analyses": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "file_id": {
-                                "type": "string",
-                                "description": "The openai file id or unique identifier of the analyzed image",
-                            },
-                            "pothole": {
-                                "type": "string",
-                                "enum": ["yes", "no"],
-                                "description": "Indicates the presence of potholes on the road",
-                            },
-                            "pothole_confidence": {
-                                "type": "number",
-                                "description": "Indicates the confidence in the pothole detection, ranging from 0 to 1",
-                            },
-                            "alligator_cracking": {
-                                "type": "string",
-                                "enum": ["yes", "no"],
-                                "description": "Indicates the presence of alligator cracking on the road",
-                            },
-                            "alligator_cracking_confidence": {
-                                "type": "number",
-                                "description": "Indicates the confidence in the alligator cracking detection, ranging from 0 to 1",
-                            },
-                            "line_cracking": {
-                                "type": "string",
-                                "enum": ["yes", "no"],
-                                "description": "Indicates the presence of line cracking on the road",
-                            },
-                            "line_cracking_confidence": {
-                                "type": "number",
-                                "description": "Indicates the confidence in the line cracking detection, ranging from 0 to 1",
-                            },
-                            "debris": {
-                                "type": "string",
-                                "enum": ["yes", "no"],
-                                "description": "Indicates the presence of debris on the road",
-                            },
-                            "debris_confidence": {
-                                "type": "number",
-                                "description": "Indicates the confidence in the debris detection, ranging from 0 to 1",
-                            },
-                            "summary": {
-                                "type": "string",
-                                "description": "A brief summary of the road condition, a few sentences tops",
-                            },
-                            "road_health_index": {
-                                "type": "integer",
-                                "description": "The overall health of the road represented as a percentage from 1 to 100",
-                            },
-                        },
-                        "required": [
-                            "file_id",
-                            "pothole",
-                            "pothole_confidence",
-                            "alligator_cracking",
-                            "alligator_cracking_confidence",
-                            "line_cracking",
-                            "line_cracking_confidence",
-                            "debris",
-                            "debris_confidence",
-                            "summary",
-                            "road_health_index",
-                        ],
-                        "additionalProperties": False,
-                    },
-                }
-            },
-            "required": ["analyses"],
-            "additionalProperties": False,
-        },
-        "strict": True,
-    }
-}
+def responses_text_format(chat_response_format):
+    """
+    Convert a Chat/Assistants ``response_format`` into the Responses API ``text`` parameter.
+
+    The Responses API takes the same JSON schema, flattened into ``text.format``.
+    """
+    json_schema = chat_response_format["json_schema"]
+    return {"format": {"type": "json_schema", **json_schema}}
+
+
+resp_api_batch_format = responses_text_format(batch_response_format)
 
 
 greenway_user_message = "Please analyze these images and share your expert greenway condition analyses, adhering to the JSON schema provided."
@@ -500,5 +448,21 @@ def set_batch_assistant(batch_assistant_id):
     batch_assistant = batch_assistant_id
 
 
+def estimate_image_tokens(width, height, model_name=model):
+    """
+    Estimate the input tokens one high-detail image costs.
+
+    The image is fit inside 2048x2048, its short side is scaled down to 768, and it is
+    billed per 512px tile on top of a base cost.
+    """
+    base_tokens, tile_tokens = image_token_costs.get(model_name, image_token_costs["gpt-4o"])
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return base_tokens + tile_tokens * tiles
+
+
 def read_config(file_path):
     pass